@@ -0,0 +1,367 @@
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets: CGPA in 0.5 steps over 0-10, attendance in 10% steps over 0-100
+CGPA_BUCKET_WIDTH = 0.5
+CGPA_BUCKETS = 20
+ATTENDANCE_BUCKET_WIDTH = 10
+ATTENDANCE_BUCKETS = 10
+
+COHORT_FIELDS = ('college', 'course', 'batch')
+METRICS = ('cgpa', 'attendance')
+
+_SLUG_RE = re.compile(r'[^a-z0-9]+')
+_FLUSH = object()
+
+
+def _slug(value):
+    return _SLUG_RE.sub('-', str(value or '').strip().lower()).strip('-') or 'unknown'
+
+
+def cohort_of(profile):
+    """(key, labels) of the cohort a profile belongs to: its college, course and batch (graduation) year"""
+    profile = profile or {}
+    labels = {
+        'college': str(profile.get('college') or '').strip() or 'unknown',
+        'course': str(profile.get('course') or '').strip() or 'unknown',
+        'batch': str(profile.get('to_year') or '').strip() or 'unknown'
+    }
+    return cohort_key(**labels), labels
+
+
+def cohort_key(college, course, batch):
+    return '__'.join(_slug(value) for value in (college, course, batch))
+
+
+def cohort_matches(key, **labels):
+    """Whether a cohort key has every given (non-empty) college / course / batch label"""
+    parts = dict(zip(COHORT_FIELDS, key.split('__')))
+    return all(parts.get(field) == _slug(value) for field, value in labels.items() if value)
+
+
+def _bucket(value, width, count):
+    return str(min(max(int(value // width), 0), count - 1))
+
+
+def contribution(state):
+    """Nested increments one student's latest results add to their cohort's aggregate"""
+    state = state or {}
+    deltas = {}
+    cgpa = state.get('cgpa')
+    if cgpa is not None:
+        deltas['cgpa'] = {'count': 1, 'sum': cgpa, 'sum_sq': cgpa * cgpa,
+                          'buckets': {_bucket(cgpa, CGPA_BUCKET_WIDTH, CGPA_BUCKETS): 1}}
+    attendance = state.get('attendance')
+    if attendance is not None:
+        percent = attendance['percent']
+        deltas['attendance'] = {'count': 1, 'sum': percent, 'at_risk': int(bool(attendance['at_risk'])),
+                                'buckets': {_bucket(percent, ATTENDANCE_BUCKET_WIDTH, ATTENDANCE_BUCKETS): 1}}
+    return deltas
+
+
+def merge_deltas(target, deltas, sign=1):
+    """Add (or with sign=-1, subtract) nested deltas into target, dropping leaves that cancel out"""
+    for key, value in deltas.items():
+        if isinstance(value, dict):
+            child = merge_deltas(target.get(key, {}), value, sign)
+            if child:
+                target[key] = child
+            else:
+                target.pop(key, None)
+        else:
+            total = target.get(key, 0) + sign * value
+            if abs(total) < 1e-9:
+                target.pop(key, None)
+            else:
+                target[key] = total
+    return target
+
+
+def state_change(previous, current):
+    """{cohort key: (labels, deltas)} that moves a student's contribution from previous to current"""
+    changes = {}
+    for state, sign in ((previous, -1), (current, 1)):
+        if not state or not state.get('cohort'):
+            continue
+        labels, deltas = changes.setdefault(state['cohort'], (state.get('labels') or {}, {}))
+        merge_deltas(deltas, contribution(state), sign)
+    return {key: (labels, deltas) for key, (labels, deltas) in changes.items() if deltas}
+
+
+def summarize(document):
+    """API view of a cohort aggregate: means, spread, at-risk rate and labelled histograms"""
+    document = document or {}
+    cgpa = document.get('cgpa') or {}
+    attendance = document.get('attendance') or {}
+    cgpa_count = round(cgpa.get('count', 0))
+    attendance_count = round(attendance.get('count', 0))
+    cgpa_mean = cgpa.get('sum', 0.0) / cgpa_count if cgpa_count else None
+    variance = cgpa.get('sum_sq', 0.0) / cgpa_count - cgpa_mean ** 2 if cgpa_count else None
+
+    def histogram(buckets, width, count, digits):
+        return [{'from': round(i * width, digits), 'to': round((i + 1) * width, digits),
+                 'count': round((buckets or {}).get(str(i), 0))} for i in range(count)]
+
+    return {
+        **{field: document.get(field) for field in COHORT_FIELDS},
+        'cgpa': {
+            'students': cgpa_count,
+            'mean': round(cgpa_mean, 2) if cgpa_mean is not None else None,
+            'stddev': round(max(variance, 0.0) ** 0.5, 2) if variance is not None else None,
+            'histogram': histogram(cgpa.get('buckets'), CGPA_BUCKET_WIDTH, CGPA_BUCKETS, 1)
+        },
+        'attendance': {
+            'students': attendance_count,
+            'mean_percent': round(attendance.get('sum', 0.0) / attendance_count, 2) if attendance_count else None,
+            'at_risk': round(attendance.get('at_risk', 0)),
+            'at_risk_rate': round(attendance.get('at_risk', 0) / attendance_count, 4) if attendance_count else None,
+            'histogram': histogram(attendance.get('buckets'), ATTENDANCE_BUCKET_WIDTH, ATTENDANCE_BUCKETS, 0)
+        },
+        'updated_at': document.get('updated_at')
+    }
+
+
+def cgpa_metric(result):
+    """CGPA a calculation contributes, or None; only 10-point results share the cohort histogram"""
+    if result.get('cgpa') is None or result.get('max_points', 10) != 10:
+        return None
+    return float(result['cgpa'])
+
+
+def attendance_metric(subjects):
+    """Attendance one calculation contributes: overall percent and whether any subject is at risk"""
+    attended = sum(subject.get('attended', 0) for subject in subjects)
+    total = sum(subject.get('total', 0) for subject in subjects)
+    if not total:
+        return None
+    return {
+        'percent': round(100 * attended / total, 2),
+        'at_risk': any(subject.get('status') != 'safe' for subject in subjects)
+    }
+
+
+def latest_results(storage, username, max_subjects=100):
+    """(cgpa, attendance) from a student's newest history records, for rebuilds"""
+    cgpa = None
+    for record in storage.list_history(username, 'cgpa', limit=1):
+        cgpa = cgpa_metric(record.get('result') or {})
+    records = storage.list_history(username, 'attendance', limit=max_subjects)
+    # A batch calculation is stored as one record per subject, sharing a batch id; records
+    # written before batch ids existed shared their timestamp instead
+    batch = _batch_of(records[0]) if records else None
+    latest = [r.get('result') or {} for r in records if _batch_of(r) == batch]
+    return cgpa, attendance_metric(latest) if latest else None
+
+
+def _batch_of(record):
+    return record.get('batch') or record.get('timestamp')
+
+
+def student_state(profile, cgpa=None, attendance=None):
+    """A student's analytics document data from their profile and latest results"""
+    key, labels = cohort_of(profile)
+    return {'cohort': key, 'labels': labels, 'cgpa': cgpa, 'attendance': attendance}
+
+
+class CohortAnalytics:
+    """Keeps per-cohort aggregates current as students record results
+
+    record() queues a student's latest CGPA or attendance figure and
+    returns.  A background thread swaps it into the student's `analytics`
+    data document (which remembers what the student last contributed),
+    turns the difference into increments for the old and new cohort, and
+    merges increments per cohort, writing each dirty cohort at most once
+    per `interval` seconds.  Increments commute, so cohort writes need no
+    read and never conflict with each other.
+    """
+
+    def __init__(self, get_storage, interval=2.0, maxsize=10000):
+        self.get_storage = get_storage
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._thread = None
+        self._closed = False
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+        self.counters = {
+            'recorded': 0,
+            'dropped': 0,
+            'student_updates': 0,
+            'cohort_writes': 0,
+            'failed': 0
+        }
+
+    def record(self, username, profile, metric, value):
+        """Queue a student's latest value of metric (a CGPA, or {'percent', 'at_risk'}); False if dropped"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(METRICS)}")
+        if self._closed:
+            return False
+        self._ensure_started()
+        with self._lock:
+            self._pending += 1
+        try:
+            self._queue.put_nowait((username, profile, metric, value))
+        except queue.Full:
+            self._done(1)
+            with self._lock:
+                self.counters['dropped'] += 1
+            logger.warning('Analytics queue full, dropped update', extra={'username': username, 'metric': metric})
+            return False
+        with self._lock:
+            self.counters['recorded'] += 1
+        return True
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='cohort-analytics', daemon=True)
+                    self._thread.start()
+
+    def _reset_after_fork(self):
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+
+    def _update_student(self, username, profile, metric, value):
+        """Store the student's new state and return the cohort increments it implies"""
+        previous = {}
+
+        def modify(data):
+            previous.clear()
+            previous.update(data or {})
+            current = student_state(profile, (data or {}).get('cgpa'), (data or {}).get('attendance'))
+            current[metric] = value
+            return current
+
+        _, current = self.get_storage().update_data(
+            username, 'analytics', modify, updated_at=datetime.now().isoformat()
+        )
+        with self._lock:
+            self.counters['student_updates'] += 1
+        return state_change(previous, current)
+
+    def _run(self):
+        dirty = {}
+        handled = 0
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+            if item is not None and item is not _FLUSH:
+                try:
+                    for key, (labels, deltas) in self._update_student(*item).items():
+                        entry = dirty.setdefault(key, (labels, {}))
+                        merge_deltas(entry[1], deltas)
+                except Exception as e:
+                    with self._lock:
+                        self.counters['failed'] += 1
+                    logger.error('Error updating student analytics: %s', e, extra={'username': item[0]})
+                handled += 1
+            if item is None or item is _FLUSH or time.monotonic() >= deadline:
+                self._write(dirty)
+                dirty = {}
+                self._done(handled)
+                handled = 0
+                deadline = time.monotonic() + self.interval
+
+    def _write(self, dirty):
+        storage = self.get_storage()
+        updated_at = datetime.now().isoformat()
+        for key, (labels, deltas) in dirty.items():
+            if not deltas:
+                continue
+            try:
+                storage.increment_cohort(key, labels, deltas, updated_at=updated_at)
+            except Exception as e:
+                with self._lock:
+                    self.counters['failed'] += 1
+                logger.error('Error writing cohort aggregate: %s', e, extra={'cohort': key})
+                continue
+            with self._lock:
+                self.counters['cohort_writes'] += 1
+
+    def _done(self, count):
+        with self._lock:
+            self._pending -= count
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every recorded update has reached its cohort; False on timeout"""
+        if self._thread is not None:
+            # Wake the thread so it writes now instead of at the end of its interval
+            try:
+                self._queue.put_nowait(_FLUSH)
+            except queue.Full:
+                pass  # Busy; it writes when the interval runs out
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout=timeout)
+
+    def close(self, timeout=10.0):
+        """Write outstanding updates; later record() calls are dropped"""
+        self._closed = True
+        if self._thread is None:
+            return True
+        return self.flush(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending'] = self._pending
+        stats['depth'] = self._queue.qsize()
+        stats['interval'] = self.interval
+        return stats
+
+
+def rebuild_cohorts(storage, page_size=500):
+    """Recompute every cohort aggregate and student analytics document from profiles and history
+
+    Each student contributes their newest history records.  Cohort sums are
+    accumulated in memory (one entry per cohort, not per student); student
+    documents are written in batches as profiles are paged through.
+    Returns (students, cohorts).
+    """
+    from storage import MAX_BATCH_WRITES
+
+    cohorts = {}
+    documents = []
+    students = 0
+    updated_at = datetime.now().isoformat()
+    start_after = None
+    while True:
+        count = 0
+        for username, profile in storage.list_profiles(['college', 'course', 'to_year'], start_after, page_size):
+            count += 1
+            start_after = username
+            cgpa, attendance = latest_results(storage, username)
+            state = student_state(profile, cgpa, attendance)
+            labels, deltas = cohorts.setdefault(state['cohort'], (state['labels'], {}))
+            merge_deltas(deltas, contribution(state))
+            documents.append((username, 'analytics', state))
+            students += 1
+            if len(documents) == MAX_BATCH_WRITES:
+                storage.bulk_write(documents=documents, updated_at=updated_at)
+                documents = []
+        if count < page_size:
+            break
+    if documents:
+        storage.bulk_write(documents=documents, updated_at=updated_at)
+    storage.replace_cohorts({key: dict(labels, **deltas, updated_at=updated_at)
+                             for key, (labels, deltas) in cohorts.items()})
+    return students, len(cohorts)
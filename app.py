@@ -1,163 +1,648 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
-import firebase_admin
-from firebase_admin import credentials, firestore
+from flask import Flask, render_template, make_response, send_from_directory, abort, request, jsonify, redirect, url_for, flash, session, stream_with_context, g, Blueprint, has_request_context, Response
 from datetime import datetime, timedelta
 import json
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+import logging
+import time
+import gzip
+import mimetypes
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import csv
+import io
+import hashlib
+import random
+from functools import wraps, partial
 import uuid
+import contextvars
+import click
 from dotenv import load_dotenv
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-this-in-production'
+from werkzeug.middleware.proxy_fix import ProxyFix
+from storage import get_storage, configure_storage, storage_status, VersionConflict, UsernameTaken, EmailTaken
+from cache import TTLCache, MISSING
+from history_writer import HistoryWriter
+from passwords import PasswordHasher, HasherBusy, DEFAULT_METHOD, DEFAULT_SALT_LENGTH
+from timetable import DAYS, EntryNotFound, with_entry_ids, add_entry, update_entry, delete_entry, replace_schedule
+from holiday_calendar import CALENDAR_VERSION, list_holidays, upcoming_holidays
+from calculators import attendance_result, attendance_batch, cgpa_result, cgpa_plan
+from attendance import MARK_STATUSES, OccurrenceIndex, validate_term, occurrence_id, index_fingerprint, apply_mark, rebase_subjects, project_subject, projection
+from grading import SCALES, get_scale, transcript_result, build_transcript, apply_course_change, transcript_summary, semester_key, check_course_id
+from assets import DIST_DIR, IMMUTABLE_CACHE_CONTROL, build_assets, load_manifest, pick_encoding
+from metrics import REGISTRY, COUNT_BUCKETS, render_stats
+from limits import SingleFlight, RateLimiter, retry_after_header
+from resilience import StorageUnavailable, set_deadline
+from log_config import configure_logging
+from analytics import CohortAnalytics, cohort_key, cohort_matches, cgpa_metric, attendance_metric, summarize, rebuild_cohorts
+from bulk import IMPORT_KINDS, FORMATS, import_upload, iter_export, read_checkpoint, write_checkpoint
 
 load_dotenv()  # Loads .env variables into environment
 
-# Session configuration
-app.config['SESSION_PERMANENT'] = False
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-
-# Initialize Firebase (REQUIRED - no local storage fallback)
-db = None
-firebase_config = {
-    "type": os.getenv("FIREBASE_TYPE"),
-    "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-    "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace("\\n", "\n"),
-    "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-    "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-    "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
-    "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
-    "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_CERT_URL"),
-    "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_CERT_URL"),
-    "universe_domain": os.getenv("FIREBASE_UNIVERSE_DOMAIN")
+# Leveled logging, written by a background thread (LOG_FORMAT is text or json)
+configure_logging(os.getenv('LOG_LEVEL', 'INFO'), os.getenv('LOG_FORMAT', 'text'))
+logger = logging.getLogger(__name__)
+
+# Routes, request hooks and CLI commands; create_app() registers them on an app
+bp = Blueprint('main', __name__, cli_group=None)
+
+# Storage backend is chosen with STORAGE_BACKEND (firestore or sqlite), see storage.py.
+# The client is created on first use in each process, so pre-fork servers connect per worker.
+
+# Holiday calendar region, passed to the holidays package
+HOLIDAY_COUNTRY = os.getenv('HOLIDAY_COUNTRY', 'IN')
+HOLIDAY_SUBDIVISION = os.getenv('HOLIDAY_SUBDIVISION', 'KL')
+
+# Calculation history is append-only; older records are trimmed in the background
+HISTORY_KEEP = 50
+HISTORY_TRIM_EVERY = 10
+HISTORY_PAGE_SIZE = 10
+HISTORY_TYPES = ('cgpa', 'attendance')
+
+# Total time a request may spend on storage calls; later calls fail fast with a 503 instead
+# of running past the point where the client has given up.  0 disables the budget.
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', '8'))
+
+# Embed the dashboard's initial data in the index page so first paint needs no API calls
+INLINE_BOOTSTRAP = os.getenv('INLINE_BOOTSTRAP', '1') == '1'
+
+# Read-through cache for profiles and data documents, keyed by (username, data_type)
+user_cache = TTLCache(
+    maxsize=int(os.getenv('CACHE_MAXSIZE', '2048')),
+    ttl=float(os.getenv('CACHE_TTL', '300'))
+)
+
+# Each worker process has its own cache and only sees its own writes.  With more than one
+# worker, a cached data document is checked against the stored version before it is served,
+# and profiles and history pages, which have no version, are only kept for a few seconds.
+CACHE_REVALIDATE = os.getenv('CACHE_REVALIDATE', '1' if int(os.getenv('WEB_CONCURRENCY', '1')) > 1 else '0') == '1'
+UNVERSIONED_TTL = float(os.getenv('CACHE_UNVERSIONED_TTL', '5')) if CACHE_REVALIDATE else None
+
+# Class meeting indexes behind attendance projections; read-only once built, so not copied
+projection_indexes = TTLCache(
+    maxsize=int(os.getenv('PROJECTION_CACHE_SIZE', '512')),
+    ttl=float(os.getenv('CACHE_TTL', '300')),
+    copy=False
+)
+
+# Concurrent identical storage reads (duplicate requests from tab switches and re-renders)
+# share one backend call instead of each going to storage
+single_flight = SingleFlight()
+
+# Token-bucket limits as '<requests>/<seconds>' per (route group, scope); empty or 0 turns
+# one off.  Buckets live in each worker process, so a client's allowance is per worker.
+RATE_LIMITS = {
+    ('calculate', 'user'): os.getenv('RATE_LIMIT_CALCULATE_USER', '30/60'),
+    ('calculate', 'ip'): os.getenv('RATE_LIMIT_CALCULATE_IP', '120/60'),
+    ('login', 'ip'): os.getenv('RATE_LIMIT_LOGIN_IP', '20/60'),
+    ('login', 'account'): os.getenv('RATE_LIMIT_LOGIN_ACCOUNT', '10/300'),
+    ('register', 'ip'): os.getenv('RATE_LIMIT_REGISTER_IP', '10/3600'),
+}
+rate_limiters = {
+    (name, scope): RateLimiter(f'{name}_{scope}', rule, maxsize=int(os.getenv('RATE_LIMIT_MAX_CLIENTS', '10000')))
+    for (name, scope), rule in RATE_LIMITS.items()
 }
 
+# Request and storage helper metrics, served at /metrics in Prometheus text format
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+http_request_seconds = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time to build the response', ('method', 'route', 'status'))
+http_request_storage_calls = REGISTRY.histogram(
+    'http_request_storage_calls', 'Storage helper calls made by one request', ('route',), buckets=COUNT_BUCKETS)
+http_request_storage_seconds = REGISTRY.histogram(
+    'http_request_storage_seconds', 'Time one request spent in storage helpers', ('route',))
+storage_helper_seconds = REGISTRY.histogram(
+    'storage_helper_duration_seconds', 'Time per storage helper call', ('helper',))
+storage_helper_calls = REGISTRY.counter(
+    'storage_helper_calls', 'Storage helper calls by outcome', ('helper', 'outcome'))
+coalesced_reads = REGISTRY.counter(
+    'coalesced_reads', 'Reads answered by an identical storage call already in flight', ('helper',))
+rate_limit_rejections = REGISTRY.counter(
+    'rate_limit_rejections', 'Requests rejected by a rate limit', ('limit', 'scope'))
+
+def instrumented(f):
+    """Count and time a storage helper, globally and for the current request"""
+    helper = f.__name__
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        in_request = has_request_context()
+        # Helpers call each other; only the outermost call counts towards the request
+        outermost = in_request and not g.get('storage_depth')
+        if in_request:
+            g.storage_depth = g.get('storage_depth', 0) + 1
+        outcome = 'error'
+        start = time.perf_counter()
+        try:
+            result = f(*args, **kwargs)
+            outcome = 'ok'
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            storage_helper_seconds.observe(elapsed, helper=helper)
+            storage_helper_calls.inc(helper=helper, outcome=outcome)
+            if in_request:
+                g.storage_depth -= 1
+                if outermost:
+                    g.storage_calls = g.get('storage_calls', 0) + 1
+                    g.storage_seconds = g.get('storage_seconds', 0.0) + elapsed
+    return decorated_function
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    set_deadline(REQUEST_DEADLINE)
+
+@bp.teardown_app_request
+def clear_request_deadline(error=None):
+    # Sync workers reuse the thread, so the budget must not leak into the next request
+    set_deadline(None)
+
+@bp.after_app_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    storage_calls = g.get('storage_calls', 0)
+    http_request_seconds.observe(elapsed, method=request.method, route=route, status=response.status_code)
+    http_request_storage_calls.observe(storage_calls, route=route)
+    http_request_storage_seconds.observe(g.get('storage_seconds', 0.0), route=route)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Request handled', extra={
+            'method': request.method, 'route': route, 'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 3), 'storage_calls': storage_calls
+        })
+    return response
+
+# Independent storage reads in one request run side by side on a shared pool.  Under
+# gunicorn's gevent worker (see gunicorn.conf.py) these threads are greenlets.
+IO_CONCURRENCY = int(os.getenv('IO_CONCURRENCY', '8'))
+_io_pool = None
+_io_pool_lock = threading.Lock()
+
+def run_concurrently(*calls):
+    """Run independent zero-argument calls at the same time and return their results in order"""
+    global _io_pool
+    if len(calls) < 2 or IO_CONCURRENCY < 2:
+        return [call() for call in calls]
+    if _io_pool is None:
+        with _io_pool_lock:
+            if _io_pool is None:
+                _io_pool = ThreadPoolExecutor(max_workers=IO_CONCURRENCY, thread_name_prefix='storage-io')
+    start = time.perf_counter()
+    # Each call runs in a copy of this context, so it shares the request's deadline budget
+    results = [future.result() for future in [_io_pool.submit(contextvars.copy_context().run, call) for call in calls]]
+    if has_request_context():
+        # The pool threads have no request context, so count the calls for the request here
+        g.storage_calls = g.get('storage_calls', 0) + len(calls)
+        g.storage_seconds = g.get('storage_seconds', 0.0) + time.perf_counter() - start
+    return results
 
-cred = credentials.Certificate(firebase_config)
-firebase_admin.initialize_app(cred)
+def _reset_io_pool():
+    global _io_pool, _io_pool_lock
+    _io_pool = None
+    _io_pool_lock = threading.Lock()
 
-def get_user_profile_ref(username):
-    """Get Firebase reference for user profile"""
-    return db.collection('users').document('students').collection('profiles').document(username)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_io_pool)
 
-def get_user_data_ref(username):
-    """Get Firebase reference for user data (cgpa, attendance, timetable)"""
-    return db.collection('users').document('students').collection('profiles').document(username).collection('data')
+def coalesced(helper, key, load):
+    """load() for key, or the result of an identical load already in flight"""
+    result, shared = single_flight.do((helper,) + key, load)
+    if shared:
+        coalesced_reads.inc(helper=helper)
+    return result
 
+# Password KDF runs in a process pool; changing the method upgrades stored hashes on next login
+password_hasher = PasswordHasher(
+    method=os.getenv('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+    salt_length=int(os.getenv('PASSWORD_SALT_LENGTH', str(DEFAULT_SALT_LENGTH))),
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+    max_pending=int(os.getenv('PASSWORD_HASH_QUEUE', '64')),
+    queue_timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', '5'))
+)
+atexit.register(password_hasher.close)
+
+def load_profile(username):
+    # Unknown usernames are not cached so a signup on another worker is seen immediately
+    return user_cache.fill((username, 'profile'), partial(get_storage().get_profile, username),
+                           ttl=UNVERSIONED_TTL, skip=lambda user_data: user_data is None)
+
+@instrumented
 def find_user_by_username(username):
-    """Find user by username in Firebase"""
-    try:
-        user_ref = get_user_profile_ref(username)
-        user_doc = user_ref.get()
-        if user_doc.exists:
-            return user_doc.to_dict()
-        return None
-    except Exception as e:
-        print(f"Error finding user {username}: {e}")
-        return None
+    """Find user by username in storage; None if there is no such user"""
+    key = (username, 'profile')
+    user_data = user_cache.get(key)
+    if user_data is MISSING:
+        user_data = coalesced('find_user_by_username', key, partial(load_profile, username))
+    return user_data
 
+@instrumented
 def find_user_by_email(email):
-    """Find user by email in Firebase"""
-    try:
-        users_ref = db.collection('users').document('students').collection('profiles')
-        query = users_ref.where('email', '==', email).limit(1)
-        docs = query.get()
-        
-        for doc in docs:
-            return doc.id, doc.to_dict()
-        return None, None
-    except Exception as e:
-        print(f"Error finding user by email {email}: {e}")
-        return None, None
+    """Find user by email in storage; (None, None) if there is no such user"""
+    return get_storage().find_profile_by_email(email)
 
+@instrumented
 def create_user_profile(username, user_data):
-    """Create user profile in Firebase"""
+    """Create user profile in storage, claiming username and email atomically
+
+    Raises UsernameTaken or EmailTaken if either is already registered.
+    """
     try:
-        user_ref = get_user_profile_ref(username)
-        user_ref.set(user_data)
-        print(f"User profile '{username}' created in Firebase")
-        return True
-    except Exception as e:
-        print(f"Error creating user profile {username}: {e}")
-        return False
+        get_storage().create_profile_unique(username, user_data)
+    except Exception:
+        user_cache.pop((username, 'profile'))
+        raise
+    user_cache.set((username, 'profile'), user_data, ttl=UNVERSIONED_TTL)
+    logger.info('User profile created', extra={'username': username, 'storage': get_storage().name})
 
-def save_user_data(username, data_type, data):
-    """Save user data (cgpa, attendance, timetable) to Firebase"""
+@instrumented
+def save_user_data(username, data_type, data, expected_version=None):
+    """Save user data (cgpa, attendance, timetable) to storage; returns the new version"""
+    key = (username, data_type)
+    updated_at = datetime.now().isoformat()
     try:
-        data_ref = get_user_data_ref(username).document(data_type)
-        data_ref.set({
-            'data': data,
-            'updated_at': datetime.now().isoformat()
-        })
-        return True
-    except Exception as e:
-        print(f"Error saving {data_type} data for {username}: {e}")
-        return False
+        version, _ = get_storage().update_data(
+            username, data_type, lambda current: data,
+            expected_version=expected_version, updated_at=updated_at
+        )
+    except Exception:
+        user_cache.pop(key)
+        raise
+    # A read already in flight may predate this write; later readers must not join it
+    for helper in ('get_user_document', 'get_user_data_version'):
+        single_flight.forget((helper,) + key)
+    user_cache.set(key, {'data': data, 'updated_at': updated_at, 'version': version})
+    return version
 
-def get_user_data(username, data_type):
-    """Get user data (cgpa, attendance, timetable) from Firebase"""
+@instrumented
+def update_user_data_fields(username, data_type, keys, modify, expected_version=None):
+    """Atomically rewrite only the given keys of a data document; returns (version, values)
+
+    keys=None hands modify the whole data dict and stores what it returns.
+    """
+    key = (username, data_type)
+    updated_at = datetime.now().isoformat()
     try:
-        data_ref = get_user_data_ref(username).document(data_type)
-        doc = data_ref.get()
-        if doc.exists:
-            return doc.to_dict().get('data', {})
-        return {}
-    except Exception as e:
-        print(f"Error getting {data_type} data for {username}: {e}")
-        return {}
+        version, values = get_storage().update_data(
+            username, data_type, modify, keys=keys,
+            expected_version=expected_version, updated_at=updated_at
+        )
+    except Exception:
+        user_cache.pop(key)
+        raise
+    for helper in ('get_user_document', 'get_user_data_version'):
+        single_flight.forget((helper,) + key)
+
+    # Patch a cached copy that is exactly one version behind, otherwise drop it
+    document = user_cache.get(key, None)
+    if document and document.get('version', 0) + 1 == version:
+        if keys is None:
+            document['data'] = values
+        else:
+            document['data'].update(values)
+        document.update({'updated_at': updated_at, 'version': version})
+        user_cache.set(key, document)
+    else:
+        user_cache.pop(key)
+    return version, values
+
+def load_user_document(username, data_type):
+    # Missing documents are cached as None so new users don't hit storage on every poll.
+    # A write landing while the read runs wins: the read's older copy is not cached over it.
+    return user_cache.fill((username, data_type), partial(get_storage().get_data, username, data_type))
+
+@instrumented
+def get_user_document(username, data_type):
+    """Get user data document ({'data', 'updated_at', 'version'}) from storage, or None"""
+    key = (username, data_type)
+    document = user_cache.get(key)
+    if document is not MISSING and CACHE_REVALIDATE:
+        # Another worker may have written since; a version-only read is enough to tell
+        if get_user_data_version(username, data_type) != (document or {}).get('version', 0):
+            user_cache.pop(key)
+            document = MISSING
+    if document is MISSING:
+        document = coalesced('get_user_document', key, partial(load_user_document, username, data_type))
+    return document
+
+@instrumented
+def get_user_data(username, data_type):
+    """Get user data (cgpa, attendance, timetable) from storage; {} only if none is stored"""
+    document = get_user_document(username, data_type)
+    if document:
+        return document.get('data', {})
+    return {}
+
+@instrumented
+def get_user_data_version(username, data_type):
+    """Stored version of a data document (0 if there is none), read without its data"""
+    meta = coalesced('get_user_data_version', (username, data_type),
+                     partial(get_storage().get_data_fields, username, data_type, []))
+    return (meta or {}).get('version', 0)
+
+# History pages use a record's timestamp as their cursor (?before=), so no two records may
+# share one: a page ending inside a run of equal timestamps would skip the rest of the run
+_last_timestamp = datetime.min
+_timestamp_lock = threading.Lock()
+
+def history_timestamps(count):
+    """count distinct, increasing ISO timestamps, later than any this process handed out before"""
+    global _last_timestamp
+    with _timestamp_lock:
+        first = max(datetime.now(), _last_timestamp + timedelta(microseconds=1))
+        _last_timestamp = first + timedelta(microseconds=count - 1)
+    return [(first + timedelta(microseconds=i)).isoformat(timespec='microseconds') for i in range(count)]
 
 def add_user_calculation(username, calc_type, calculation_data):
-    """Add calculation record to user's data"""
+    """Queue calculation record for user's history"""
+    return add_user_calculations(username, calc_type, [calculation_data])
+
+def add_user_calculations(username, calc_type, results):
+    """Queue several calculation records for user's history as one batch"""
     try:
-        # Get existing calculations
-        calculations = get_user_data(username, 'calculations')
-        if not calculations:
-            calculations = {'cgpa': [], 'attendance': []}
-        
-        # Add new calculation
-        if calc_type not in calculations:
-            calculations[calc_type] = []
-        
-        calculation_record = {
+        # In batch order, so the last record is the newest.  Every record gets its own timestamp;
+        # 'batch' (the first of them) tells which records were calculated together.
+        timestamps = history_timestamps(len(results))
+        calculation_records = [{
             'result': calculation_data,
-            'timestamp': datetime.now().isoformat()
-        }
-        calculations[calc_type].append(calculation_record)
-        
-        # Keep only last 50 records
-        calculations[calc_type] = calculations[calc_type][-50:]
-        
-        # Save back to Firebase
-        return save_user_data(username, 'calculations', calculations)
-    except Exception as e:
-        print(f"Error adding {calc_type} calculation for {username}: {e}")
+            'timestamp': timestamp,
+            'batch': timestamps[0]
+        } for calculation_data, timestamp in zip(results, timestamps)]
+
+        # Keep a cached first page current so the user sees the records before they are persisted
+        key = (username, f'history:{calc_type}')
+        page = user_cache.get(key)
+        if page is not MISSING:
+            page['records'] = (calculation_records[::-1] + page['records'])[:page['limit']]
+            user_cache.set(key, page, ttl=UNVERSIONED_TTL)
+        else:
+            # A first page being read right now predates these records; don't let it be cached
+            user_cache.pop(key)
+
+        return history_writer.submit_many(username, calc_type, calculation_records)
+    except Exception:
+        logger.exception('Error adding calculation', extra={'username': username, 'calc_type': calc_type})
         return False
 
+def write_user_history(username, calc_type, records):
+    """Persist a batch of history records for one user"""
+    get_storage().append_history_many(username, calc_type, records)
+
+def history_written(username, calc_type, records):
+    """Keep only the last HISTORY_KEEP records, trimmed on the writer thread"""
+    if random.random() < len(records) / HISTORY_TRIM_EVERY:
+        trim_user_history(username, calc_type)
+
+def history_write_failed(username, calc_type, records):
+    """Drop the cached page that already shows records that never reached storage"""
+    user_cache.pop((username, f'history:{calc_type}'))
+
+def trim_user_history(username, calc_type):
+    """Delete history records beyond the newest HISTORY_KEEP"""
+    try:
+        get_storage().trim_history(username, calc_type, HISTORY_KEEP)
+    except Exception:
+        logger.exception('Error trimming history', extra={'username': username, 'calc_type': calc_type})
+
+def upgrade_password_hash(username, user_data, password_hash):
+    """Store a password hash made with the current KDF parameters"""
+    try:
+        profile = dict(user_data, password_hash=password_hash)
+        get_storage().create_profile(username, profile)
+        user_cache.set((username, 'profile'), profile, ttl=UNVERSIONED_TTL)
+        logger.info('Upgraded password hash', extra={'username': username})
+    except Exception:
+        # The old hash still verifies, so the upgrade is retried on the next login
+        logger.exception('Error upgrading password hash', extra={'username': username})
+
+# History writes are queued and batched per user off the request thread
+history_writer = HistoryWriter(
+    write_user_history,
+    mode=os.getenv('HISTORY_WRITE_MODE', 'async'),
+    maxsize=int(os.getenv('HISTORY_QUEUE_SIZE', '1000')),
+    batch_size=int(os.getenv('HISTORY_BATCH_SIZE', '100')),
+    overflow=os.getenv('HISTORY_QUEUE_FULL', 'sync'),
+    on_written=history_written,
+    on_failed=history_write_failed
+)
+atexit.register(history_writer.close)
+
+# Per-cohort CGPA / attendance aggregates, kept current in the background (see analytics.py)
+cohort_analytics = CohortAnalytics(
+    get_storage,
+    interval=float(os.getenv('ANALYTICS_FLUSH_INTERVAL', '2')),
+    maxsize=int(os.getenv('ANALYTICS_QUEUE_SIZE', '10000'))
+)
+atexit.register(cohort_analytics.close)
+
+def record_cohort_result(username, metric, value):
+    """Fold a student's latest result into their cohort's aggregate; never fails the request"""
+    if value is None:
+        return
+    try:
+        cohort_analytics.record(username, find_user_by_username(username), metric, value)
+    except Exception:
+        logger.exception('Error recording cohort result', extra={'username': username, 'metric': metric})
+
+@instrumented
+def get_user_history(username, calc_type, before=None, limit=HISTORY_PAGE_SIZE):
+    """Get one page of calculation records older than before, newest first"""
+    if before is None:
+        key = (username, f'history:{calc_type}')
+        page = user_cache.get(key)
+        if page is not MISSING and page['limit'] >= limit:
+            return page['records'][:limit]
+    return coalesced('get_user_history', (username, calc_type, before, limit),
+                     partial(load_user_history, username, calc_type, before, limit))
+
+def load_user_history(username, calc_type, before, limit):
+    if before is not None:
+        return read_user_history(username, calc_type, before, limit)
+    page = user_cache.fill((username, f'history:{calc_type}'),
+                           lambda: {'limit': limit, 'records': read_user_history(username, calc_type, None, limit)},
+                           ttl=UNVERSIONED_TTL)
+    return page['records']
+
+def read_user_history(username, calc_type, before, limit):
+    records = get_storage().list_history(username, calc_type, before=before, limit=limit)
+    if len(records) < limit:
+        # Fill from the legacy whole-document history written before records were append-only
+        legacy = get_user_data(username, 'calculations').get(calc_type, [])
+        cutoff = records[-1]['timestamp'] if records else before
+        older = [r for r in reversed(legacy) if cutoff is None or r.get('timestamp', '') < cutoff]
+        records = records + older[:limit - len(records)]
+    return records
+
 # Login required decorator
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not session.get('logged_in') or not session.get('username'):
-            print(f"Access denied. Session: {dict(session)}")
-            return redirect(url_for('login'))
+            logger.debug('Access denied', extra={'path': request.path})
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route('/')
+# Usernames that are admins whatever their profile says, for bootstrapping the first admin
+ADMIN_USERNAMES = frozenset(name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip())
+
+def is_admin(username):
+    """Whether username is in ADMIN_USERNAMES or its stored profile has role admin"""
+    if username in ADMIN_USERNAMES:
+        return True
+    user_data = find_user_by_username(username)
+    return bool(user_data) and user_data.get('role') == 'admin'
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Checked against storage on every request, never against what the client sent
+        try:
+            admin = is_admin(session.get('username'))
+        except StorageUnavailable as e:
+            return storage_unavailable_response(e)
+        if not admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return login_required(decorated_function)
+
+def rate_limit_identity(scope):
+    if scope == 'ip':
+        return request.remote_addr
+    if scope == 'user':
+        return session.get('username')
+    # 'account': the account a login form names, so one password can't be guessed at from many IPs
+    return (request.form.get('username') or '').strip().lower() or None
+
+def rate_limit_response(retry_after):
+    headers = {'Retry-After': retry_after_header(retry_after)}
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Too many requests, please slow down', 'retry_after': int(headers['Retry-After'])}), 429, headers
+    flash('Too many attempts. Please wait a moment and try again.', 'error')
+    return render_template('login.html'), 429, headers
+
+def storage_unavailable_response(e):
+    """503 with Retry-After when storage is failing or the request's budget for it ran out"""
+    logger.warning('Storage unavailable: %s', e, extra={'path': request.path, 'username': session.get('username')})
+    headers = {'Retry-After': retry_after_header(e.retry_after)}
+    if request.path.startswith(('/api/', '/admin/')):
+        return jsonify({'error': 'Service temporarily unavailable, please try again shortly'}), 503, headers
+    flash('The service is temporarily unavailable. Please try again in a moment.', 'error')
+    return render_template('login.html'), 503, headers
+
+def rate_limited(name):
+    """Answer POSTs with 429 once any of the group's buckets (per user, per IP, ...) is empty"""
+    limiters = [(scope, limiter) for (group, scope), limiter in rate_limiters.items() if group == name and limiter.enabled]
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'POST':
+                retry_after = 0
+                for scope, limiter in limiters:
+                    wait = limiter.take(rate_limit_identity(scope))
+                    if wait:
+                        rate_limit_rejections.inc(limit=name, scope=scope)
+                        retry_after = max(retry_after, wait)
+                if retry_after:
+                    logger.info('Rate limited', extra={'limit': name, 'path': request.path, 'username': session.get('username')})
+                    return rate_limit_response(retry_after)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# Conditional GET helpers
+API_CACHE_CONTROL = 'private, no-cache'
+
+def user_etag(username, *parts):
+    """Strong ETag scoped to one user, so a shared browser cache never crosses accounts"""
+    fingerprint = hashlib.sha1(username.encode('utf-8')).hexdigest()[:8]
+    return '.'.join([fingerprint] + [str(part) for part in parts])
+
+def not_modified(etag, cache_control=API_CACHE_CONTROL):
+    """304 response when If-None-Match already holds etag, otherwise None"""
+    if request.if_none_match and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        return response
+    return None
+
+def with_etag(response, etag, cache_control=API_CACHE_CONTROL):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+# Fingerprinted CSS/JS bundles built by `flask build-assets` (see assets.py)
+asset_manifest = load_manifest()
+
+def asset_url(name):
+    """URL of the built bundle for a static/src file, or of the source itself when nothing is built"""
+    if name in asset_manifest:
+        return url_for('main.asset', filename=asset_manifest[name])
+    return url_for('static', filename=f'src/{name}')
+
+@bp.app_context_processor
+def asset_helpers():
+    return {'asset_url': asset_url}
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    """Serve a bundle, precompressed when the client accepts it, cached for good"""
+    if filename not in asset_manifest.values():
+        abort(404)
+    encoding, variant = pick_encoding(request.accept_encodings, os.path.join(DIST_DIR, filename))
+    response = send_from_directory(DIST_DIR, os.path.basename(variant), mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+# JSON responses of at least COMPRESS_MIN_SIZE bytes are gzipped for clients that accept it
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+
+@bp.after_app_request
+def compress_json(response):
+    if (response.mimetype != 'application/json' or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.status_code < 200 or response.status_code == 204):
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.accept_encodings or (response.content_length or 0) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(response.get_data(), compresslevel=COMPRESS_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    # The gzipped bytes differ from the identity ones, so the validator can only be weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+@bp.route('/')
 @login_required
 def index():
-    print(f"Index accessed by user: {session.get('username', 'Unknown')}")
-    return render_template('index.html')
+    bootstrap = None
+    if INLINE_BOOTSTRAP:
+        try:
+            bootstrap = bootstrap_payload(session['username'])
+        except Exception:
+            # The page fetches /api/bootstrap itself when nothing is inlined
+            logger.exception('Error inlining dashboard data')
+    response = make_response(render_template('index.html', bootstrap=bootstrap))
+    response.headers['Cache-Control'] = API_CACHE_CONTROL
+    return response
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
+@rate_limited('login')
 def login():
     # Prevent redirect loops
     if session.get('logged_in') and session.get('username'):
-        print(f"User {session.get('username')} already logged in, redirecting to index")
-        return redirect(url_for('index'))
+        logger.debug('Already logged in, redirecting to index', extra={'username': session.get('username')})
+        return redirect(url_for('main.index'))
         
     if request.method == 'POST':
         username = request.form.get('username')
@@ -169,31 +654,42 @@ def login():
                 
         try:
             user_data = find_user_by_username(username)
-            
-            if user_data and check_password_hash(user_data.get('password_hash', ''), password):
+            valid = False
+            if user_data:
+                valid, new_hash = password_hasher.verify_and_upgrade(user_data.get('password_hash', ''), password)
+                if new_hash:
+                    upgrade_password_hash(username, user_data, new_hash)
+
+            if valid:
                 # Clear session first
                 session.clear()
                                 
                 # Set session data
                 session['username'] = str(username)
                 session['student_name'] = str(user_data.get('student_name', username))
-                session['role'] = str(user_data.get('role', 'student'))
+                session['role'] = 'admin' if is_admin(username) else 'student'
                 session['logged_in'] = True
                                 
-                print(f"User {username} logged in successfully")
+                logger.info('User logged in', extra={'username': username})
                 flash('Login successful!', 'success')
-                return redirect(url_for('index'))
+                return redirect(url_for('main.index'))
             else:
-                print(f"Authentication failed for user: {username}")
+                logger.info('Authentication failed', extra={'username': username})
                 flash('Invalid username or password!', 'error')
                             
-        except Exception as e:
-            print(f"Login error: {e}")
+        except HasherBusy:
+            logger.warning('Password hashing queue full, rejected login', extra={'username': username})
+            flash('The server is busy right now. Please try again in a moment.', 'error')
+        except StorageUnavailable as e:
+            return storage_unavailable_response(e)
+        except Exception:
+            logger.exception('Login error')
             flash('An error occurred during login. Please try again.', 'error')
                 
     return render_template('login.html')
 
-@app.route('/register', methods=['POST'])
+@bp.route('/register', methods=['POST'])
+@rate_limited('register')
 def register():
     try:
         # Get form data
@@ -208,7 +704,6 @@ def register():
         to_year = request.form.get('to_year')
         password = request.form.get('password')
         confirm_password = request.form.get('confirm_password')
-        role = request.form.get('role', 'student')
                 
         # Basic validation
         if not all([student_name, username, email, student_id, phone, college, course, from_year, to_year, password, confirm_password]):
@@ -227,20 +722,12 @@ def register():
             flash('To Year must be after From Year!', 'error')
             return render_template('login.html')
                 
-        # Check if username already exists
-        existing_user = find_user_by_username(username)
-        if existing_user:
-            flash('Username already exists!', 'error')
-            return render_template('login.html')
-        
-        # Check if email already exists
-        existing_email_id, existing_email_user = find_user_by_email(email)
-        if existing_email_user:
-            flash('Email already registered!', 'error')
-            return render_template('login.html')
-                
         # Hash password
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = password_hasher.hash(password)
+        except HasherBusy:
+            flash('The server is busy right now. Please try again in a moment.', 'error')
+            return render_template('login.html')
                 
         user_data = {
             'user_id': str(uuid.uuid4()),
@@ -254,52 +741,132 @@ def register():
             'from_year': from_year,
             'to_year': to_year,
             'password_hash': password_hash,
-            'role': role,
+            # Self-registered accounts are always students; see grant-admin
+            'role': 'student',
             'created_at': datetime.now().isoformat()
         }
                 
-        # Create user profile in Firebase
-        if create_user_profile(username, user_data):
-            flash('Account created successfully! Please login with your credentials.', 'success')
-            return redirect(url_for('login'))
-        else:
-            flash('Error saving user data. Please try again.', 'error')
+        # Create user profile in storage; username and email uniqueness are checked in the same write
+        try:
+            create_user_profile(username, user_data)
+        except UsernameTaken:
+            flash('Username already exists!', 'error')
+            return render_template('login.html')
+        except EmailTaken:
+            flash('Email already registered!', 'error')
             return render_template('login.html')
+
+        flash('Account created successfully! Please login with your credentials.', 'success')
+        return redirect(url_for('main.login'))
                 
-    except Exception as e:
-        print(f"Registration error: {e}")
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Registration error')
         flash('An error occurred during registration. Please try again.', 'error')
         return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     username = session.get('username', 'Unknown')
     session.clear()
-    print(f"User {username} logged out successfully")
+    logger.info('User logged out', extra={'username': username})
     flash('You have been logged out successfully.', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # Timetable API Routes
-@app.route('/api/timetable', methods=['GET'])
+def if_match_version():
+    """Version the client last saw, from If-Match; None when the request is unconditional"""
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    tags = request.if_match.as_set()
+    # Accept both the bare version and the user-scoped ETag ("<user>.<version>")
+    tag = next(iter(tags)).rsplit('.', 1)[-1] if len(tags) == 1 else ''
+    if not tag.isdigit():
+        raise ValueError('If-Match must carry a single document version')
+    return int(tag)
+
+def version_conflict_response(e, document='Timetable'):
+    return jsonify({
+        'error': f'{document} was changed elsewhere. Reload it and try again.',
+        'version': e.current_version
+    }), 412
+
+def timetable_day_response(day, schedule, version, status=200):
+    response = jsonify({'success': True, 'day': day, 'schedule': schedule, 'version': version})
+    response.status_code = status
+    return with_etag(response, user_etag(session['username'], 'timetable', version))
+
+def modify_timetable_day(day, change, status=200):
+    """Apply change(schedule) to one day under optimistic concurrency, writing only that day"""
+    username = session.get('username')
+    if not username:
+        return jsonify({'error': 'User not found in session'}), 401
+    day = day.lower()
+    if day not in DAYS:
+        return jsonify({'error': f"Unknown day '{day}'"}), 404
+
+    try:
+        version, values = update_user_data_fields(
+            username, 'timetable', [day],
+            lambda current: {day: change(current[day])},
+            expected_version=if_match_version()
+        )
+    except VersionConflict as e:
+        return version_conflict_response(e)
+    except EntryNotFound:
+        return jsonify({'error': 'Class not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return timetable_day_response(day, values[day], version, status)
+
+def timetable_payload(document):
+    """Timetable response body for a stored document (or None), every slot carrying its id"""
+    document = document or {}
+    timetable_data = document.get('data') or {}
+    return {
+        'timetable': {day: with_entry_ids(schedule) for day, schedule in timetable_data.items()},
+        'version': document.get('version', 0)
+    }
+
+@bp.route('/api/timetable', methods=['GET'])
 @login_required
 def get_timetable():
-    """Get user's timetable from Firebase"""
+    """Get user's timetable from storage; answers 304 while the stored version is unchanged"""
     try:
         username = session.get('username')
         if not username:
             return jsonify({'error': 'User not found in session'}), 401
-        
-        timetable_data = get_user_data(username, 'timetable')
-        return jsonify({'timetable': timetable_data})
+
+        # A revalidated cached copy costs a version read anyway, so revalidate it straight away
+        document = MISSING if CACHE_REVALIDATE else user_cache.get((username, 'timetable'))
+        if document is MISSING and request.if_none_match:
+            # Revalidation only needs the version, not the document
+            cached = not_modified(user_etag(username, 'timetable', get_user_data_version(username, 'timetable')))
+            if cached:
+                return cached
+        if document is MISSING:
+            document = get_user_document(username, 'timetable')
+
+        document = document or {}
+        version = document.get('version', 0)
+        etag = user_etag(username, 'timetable', version)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        return with_etag(jsonify(timetable_payload(document)), etag)
             
-    except Exception as e:
-        print(f"Error retrieving timetable: {e}")
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error retrieving timetable')
         return jsonify({'error': 'Error retrieving timetable'}), 500
 
-@app.route('/api/timetable', methods=['POST'])
+@bp.route('/api/timetable', methods=['POST'])
 @login_required
 def save_timetable():
-    """Save user's timetable to Firebase"""
+    """Save user's whole timetable to storage; prefer the per-day endpoints for edits"""
     try:
         username = session.get('username')
         if not username:
@@ -310,17 +877,26 @@ def save_timetable():
             return jsonify({'error': 'No data provided'}), 400
         
         timetable_data = data.get('timetable', {})
+        if not isinstance(timetable_data, dict):
+            return jsonify({'error': 'Timetable must be an object keyed by day'}), 400
+
+        try:
+            version = save_user_data(username, 'timetable', timetable_data, expected_version=if_match_version())
+        except VersionConflict as e:
+            return version_conflict_response(e)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        response = jsonify({'success': True, 'message': 'Timetable saved successfully', 'version': version})
+        return with_etag(response, user_etag(username, 'timetable', version))
         
-        if save_user_data(username, 'timetable', timetable_data):
-            return jsonify({'success': True, 'message': 'Timetable saved successfully'})
-        else:
-            return jsonify({'error': 'Error saving timetable'}), 500
-        
-    except Exception as e:
-        print(f"Error saving timetable: {e}")
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error saving timetable')
         return jsonify({'error': 'Error saving timetable'}), 500
 
-@app.route('/api/timetable/day/<day>', methods=['GET'])
+@bp.route('/api/timetable/day/<day>', methods=['GET'])
 @login_required
 def get_day_timetable(day):
     """Get timetable for a specific day"""
@@ -328,18 +904,87 @@ def get_day_timetable(day):
         username = session.get('username')
         if not username:
             return jsonify({'error': 'User not found in session'}), 401
-        
-        timetable_data = get_user_data(username, 'timetable')
-        day_schedule = timetable_data.get(day.lower(), [])
-        return jsonify({'day': day, 'schedule': day_schedule})
+        if day.lower() not in DAYS:
+            return jsonify({'error': f"Unknown day '{day}'"}), 404
+
+        document = get_user_document(username, 'timetable') or {}
+        version = document.get('version', 0)
+        etag = user_etag(username, 'timetable', version)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        day_schedule = with_entry_ids((document.get('data') or {}).get(day.lower()))
+        response = jsonify({'day': day, 'schedule': day_schedule, 'version': version})
+        return with_etag(response, etag)
             
-    except Exception as e:
-        print(f"Error retrieving day timetable: {e}")
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error retrieving day timetable')
         return jsonify({'error': 'Error retrieving day timetable'}), 500
 
+@bp.route('/api/timetable/day/<day>', methods=['PUT'])
+@login_required
+def replace_day_timetable(day):
+    """Replace one day's schedule"""
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'No data provided'}), 400
+        return modify_timetable_day(day, lambda schedule: replace_schedule(data.get('schedule')))
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error replacing day timetable')
+        return jsonify({'error': 'Error saving timetable'}), 500
+
+@bp.route('/api/timetable/day/<day>/entries', methods=['POST'])
+@login_required
+def add_timetable_entry(day):
+    """Add a class to one day"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        return modify_timetable_day(day, lambda schedule: add_entry(schedule, data), status=201)
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error adding timetable entry')
+        return jsonify({'error': 'Error saving timetable'}), 500
+
+@bp.route('/api/timetable/day/<day>/entries/<entry_id>', methods=['PATCH'])
+@login_required
+def update_timetable_entry(day, entry_id):
+    """Update fields of one class"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        return modify_timetable_day(day, lambda schedule: update_entry(schedule, entry_id, data))
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error updating timetable entry')
+        return jsonify({'error': 'Error saving timetable'}), 500
+
+@bp.route('/api/timetable/day/<day>/entries/<entry_id>', methods=['DELETE'])
+@login_required
+def delete_timetable_entry(day, entry_id):
+    """Remove one class"""
+    try:
+        return modify_timetable_day(day, lambda schedule: delete_entry(schedule, entry_id))
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error deleting timetable entry')
+        return jsonify({'error': 'Error saving timetable'}), 500
+
 # CGPA API Routes
-@app.route('/api/calculate_cgpa', methods=['POST'])
+@bp.route('/api/calculate_cgpa', methods=['POST'])
 @login_required
+@rate_limited('calculate')
 def calculate_cgpa():
     try:
         username = session.get('username')
@@ -351,254 +996,942 @@ def calculate_cgpa():
                 
         if not semesters:
             return jsonify({'error': 'No semester data provided'}), 400
+
+        try:
+            # Course-level rows are graded with the university's scale, SGPA rows are used as given
+            if any(isinstance(semester, dict) and 'courses' in semester for semester in semesters):
+                result = transcript_result(semesters, data.get('scale'))
+            else:
+                result = cgpa_result(semesters)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
                 
-        total_credits = 0
-        total_grade_points = 0
-        semester_results = []
-                
-        for i, semester in enumerate(semesters):
-            sgpa = float(semester.get('sgpa', 0))
-            credits = float(semester.get('credits', 0))
-                        
-            if sgpa > 0 and credits > 0:
-                grade_points = sgpa * credits
-                total_credits += credits
-                total_grade_points += grade_points
-                                
-                semester_results.append({
-                    'semester': f"Semester {i + 1}",
-                    'sgpa': sgpa,
-                    'credits': credits,
-                    'grade_points': grade_points
-                })
-                
-        if total_credits == 0:
-            return jsonify({'error': 'No valid semester data found'}), 400
-                
-        cgpa = total_grade_points / total_credits
-        gpa_4_scale = max(0, ((cgpa - 5) * 4) / 5)
-        gpa_5_scale = cgpa / 2
-                
-        result = {
-            'cgpa': round(cgpa, 2),
-            'gpa_4_scale': round(gpa_4_scale, 2),
-            'gpa_5_scale': round(gpa_5_scale, 2),
-            'total_credits': total_credits,
-            'total_grade_points': round(total_grade_points, 2),
-            'semesters': semester_results,
-            'calculated_at': datetime.now().isoformat()
-        }
-                
-        # Save calculation to Firebase
+        # Save calculation to storage
         add_user_calculation(username, 'cgpa', result)
+        record_cohort_result(username, 'cgpa', cgpa_metric(result))
                 
         return jsonify(result)
             
-    except Exception as e:
-        print(f"CGPA calculation error: {e}")
+    except Exception:
+        logger.exception('CGPA calculation error')
         return jsonify({'error': 'Error calculating CGPA'}), 500
 
-@app.route('/api/calculate_attendance', methods=['POST'])
+@bp.route('/api/cgpa/plan', methods=['POST'])
 @login_required
+@rate_limited('calculate')
+def plan_cgpa():
+    """What-if planning: SGPA needed for a target CGPA and hypothetical scenario grids"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        try:
+            plan = cgpa_plan(
+                data.get('semesters', []),
+                target_cgpa=data.get('target_cgpa'),
+                remaining_credits=data.get('remaining_credits'),
+                scenarios=data.get('scenarios'),
+                grid=data.get('grid')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify(plan)
+
+    except Exception:
+        logger.exception('CGPA planning error')
+        return jsonify({'error': 'Error planning CGPA'}), 500
+
+# Course-level transcript with per-semester running sums
+@bp.route('/api/grade-scales')
+def get_grade_scales():
+    """Supported university grade scales and their grade points"""
+    response = jsonify([scale.describe() for scale in SCALES.values()])
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+def transcript_response(document, status=200):
+    document = document or {}
+    version = document.get('version', 0)
+    payload = transcript_summary(document.get('data') or {})
+    payload['version'] = version
+    response = jsonify(payload)
+    response.status_code = status
+    return with_etag(response, user_etag(session['username'], 'transcript', version))
+
+@bp.route('/api/transcript', methods=['GET'])
+@login_required
+def get_transcript():
+    """Stored transcript with SGPA/CGPA read from its running sums"""
+    try:
+        username = session.get('username')
+        if not username:
+            return jsonify({'error': 'User not found in session'}), 401
+        document = get_user_document(username, 'transcript')
+        cached = not_modified(user_etag(username, 'transcript', (document or {}).get('version', 0)))
+        if cached:
+            return cached
+        return transcript_response(document)
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error retrieving transcript')
+        return jsonify({'error': 'Error retrieving transcript'}), 500
+
+@bp.route('/api/transcript', methods=['PUT'])
+@login_required
+def replace_transcript():
+    """Replace the whole transcript ({scale, semesters: [{courses: [...]}]}), recomputing every sum"""
+    try:
+        username = session.get('username')
+        if not username:
+            return jsonify({'error': 'User not found in session'}), 401
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        try:
+            transcript = build_transcript(data.get('semesters'), data.get('scale'))
+            version = save_user_data(username, 'transcript', transcript, expected_version=if_match_version())
+        except VersionConflict as e:
+            return version_conflict_response(e, 'Transcript')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return transcript_response({'data': transcript, 'version': version})
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error saving transcript')
+        return jsonify({'error': 'Error saving transcript'}), 500
+
+def modify_transcript_course(semester, course_id, course, status=200):
+    """Set or remove one course, rewriting only its semester and the totals; responds with those"""
+    username = session.get('username')
+    if not username:
+        return jsonify({'error': 'User not found in session'}), 401
+    try:
+        key = semester_key(semester)
+        check_course_id(course_id)
+        requested_scale = get_scale(request.args.get('scale')).key if request.args.get('scale') else None
+
+        def change(current):
+            scale = get_scale(current['scale'] or requested_scale)
+            if requested_scale and requested_scale != scale.key:
+                raise ValueError(f"Transcript uses the '{scale.key}' scale; replace it to change scales")
+            values = dict(zip((key, 'totals'), apply_course_change(scale, current[key], current['totals'], course_id, course)))
+            values['scale'] = scale.key
+            return values
+
+        version, values = update_user_data_fields(
+            username, 'transcript', ['scale', 'totals', key], change, expected_version=if_match_version()
+        )
+    except VersionConflict as e:
+        return version_conflict_response(e, 'Transcript')
+    except KeyError:
+        return jsonify({'error': 'Course not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # From what this write stored, not a re-read that could show another writer's later state:
+    # CGPA from the new totals, and only the changed semester
+    return transcript_response({'data': values, 'version': version}, status)
+
+@bp.route('/api/transcript/semesters/<int:semester>/courses/<course_id>', methods=['PUT'])
+@login_required
+def put_transcript_course(semester, course_id):
+    """Add or edit one course; SGPA and CGPA are updated from the sums without a full recompute"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        return modify_transcript_course(semester, course_id, data)
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error saving transcript course')
+        return jsonify({'error': 'Error saving course'}), 500
+
+@bp.route('/api/transcript/semesters/<int:semester>/courses/<course_id>', methods=['DELETE'])
+@login_required
+def delete_transcript_course(semester, course_id):
+    try:
+        return modify_transcript_course(semester, course_id, None)
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error deleting transcript course')
+        return jsonify({'error': 'Error deleting course'}), 500
+
+@bp.route('/api/calculate_attendance', methods=['POST'])
+@login_required
+@rate_limited('calculate')
 def calculate_attendance():
     try:
         username = session.get('username')
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
-                    
-        attended = int(data.get('attended', 0))
-        total = int(data.get('total', 0))
-        min_required = float(data.get('min_required', 75))
-        subject_name = data.get('subject_name', 'Subject')
-                
-        if total <= 0:
-            return jsonify({'error': 'Total classes must be greater than 0'}), 400
-                
-        if attended > total:
-            return jsonify({'error': 'Attended classes cannot exceed total classes'}), 400
-                
-        current_percent = (attended / total) * 100
-                
-        # Calculate future requirements
-        future_classes = 0
-        can_skip = 0
-                
-        if current_percent < min_required:
-            # Calculate classes needed
-            while True:
-                future_total = total + future_classes
-                future_attended = attended + future_classes
-                future_percent = (future_attended / future_total) * 100
-                                
-                if future_percent >= min_required:
-                    break
-                future_classes += 1
-        else:
-            # Calculate classes that can be skipped
-            temp_total = total
-            while True:
-                temp_total += 1
-                if (attended / temp_total) * 100 >= min_required:
-                    can_skip += 1
-                else:
-                    break
-                
-        status = 'safe' if current_percent >= min_required else 'at_risk'
-        message = f"Your attendance is {'above' if status == 'safe' else 'below'} the required {min_required}%"
-                
-        if status == 'safe':
-            recommendation = f"You can skip up to {can_skip} classes and still maintain {min_required}% attendance." if can_skip > 0 else "Keep maintaining your good attendance!"
-        else:
-            recommendation = f"You need to attend the next {future_classes} classes consecutively to reach {min_required}% attendance."
-                
-        result = {
-            'current_percent': round(current_percent, 2),
-            'attended': attended,
-            'total': total,
-            'min_required': min_required,
-            'status': status,
-            'message': message,
-            'recommendation': recommendation,
-            'future_classes': future_classes,
-            'can_skip': can_skip,
-            'subject_name': subject_name,
-            'calculated_at': datetime.now().isoformat()
-        }
+
+        try:
+            result = attendance_result(
+                data.get('attended', 0),
+                data.get('total', 0),
+                data.get('min_required', 75),
+                data.get('subject_name', 'Subject')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
                 
-        # Save calculation to Firebase
+        # Save calculation to storage
         add_user_calculation(username, 'attendance', result)
+        record_cohort_result(username, 'attendance', attendance_metric([result]))
                 
         return jsonify(result)
             
-    except Exception as e:
-        print(f"Attendance calculation error: {e}")
+    except Exception:
+        logger.exception('Attendance calculation error')
         return jsonify({'error': 'Error calculating attendance'}), 500
 
-@app.route('/api/holidays')
+@bp.route('/api/calculate_attendance/batch', methods=['POST'])
+@login_required
+@rate_limited('calculate')
+def calculate_attendance_batch():
+    """Calculate attendance for all of a student's subjects in one request"""
+    try:
+        username = session.get('username')
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        try:
+            result = attendance_batch(data.get('subjects') or [], data.get('min_required', 75))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # One history record per subject, handed to the writer as a single batch
+        add_user_calculations(username, 'attendance', result['subjects'])
+        record_cohort_result(username, 'attendance', attendance_metric(result['subjects']))
+
+        return jsonify(result)
+
+    except Exception:
+        logger.exception('Batch attendance calculation error')
+        return jsonify({'error': 'Error calculating attendance'}), 500
+
+# Attendance projected from the timetable over the term, minus holidays
+def occurrence_index(username, term, timetable_document):
+    """Class meeting index for the user's term and timetable, built once per timetable version"""
+    timetable_document = timetable_document or {}
+    key = (username, index_fingerprint(term, timetable_document.get('version', 0),
+                                       HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION, CALENDAR_VERSION))
+    index = projection_indexes.get(key)
+    if index is MISSING:
+        index = OccurrenceIndex(timetable_document.get('data'), term, HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION)
+        projection_indexes.set(key, index)
+    return index
+
+def attendance_documents(username):
+    """(attendance document, timetable document), read concurrently"""
+    attendance_document, timetable_document = run_concurrently(
+        partial(get_user_document, username, 'attendance'),
+        partial(get_user_document, username, 'timetable')
+    )
+    return attendance_document or {}, timetable_document or {}
+
+@bp.route('/api/attendance/term', methods=['GET'])
+@login_required
+def get_attendance_term():
+    try:
+        username = session.get('username')
+        if not username:
+            return jsonify({'error': 'User not found in session'}), 401
+        document = get_user_document(username, 'attendance') or {}
+        return jsonify({'term': (document.get('data') or {}).get('term'), 'version': document.get('version', 0)})
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error retrieving attendance term')
+        return jsonify({'error': 'Error retrieving term'}), 500
+
+@bp.route('/api/attendance/term', methods=['PUT'])
+@login_required
+def save_attendance_term():
+    """Set the term dates ({start, end, min_required, no_class_dates, assume_attended}); marks outside them are dropped"""
+    try:
+        username = session.get('username')
+        if not username:
+            return jsonify({'error': 'User not found in session'}), 401
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        try:
+            term = validate_term(data)
+            version, values = update_user_data_fields(
+                username, 'attendance', None,
+                lambda current: dict(rebase_subjects(current, term), term=term),
+                expected_version=if_match_version()
+            )
+        except VersionConflict as e:
+            return version_conflict_response(e, 'Attendance')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'success': True, 'term': values['term'], 'version': version})
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error saving attendance term')
+        return jsonify({'error': 'Error saving term'}), 500
+
+@bp.route('/api/attendance/projection')
+@login_required
+def get_attendance_projection():
+    """Per-subject attendance, classes remaining, skippable classes and risk; ?until=YYYY-MM-DD adds a by-date view"""
+    try:
+        username = session.get('username')
+        if not username:
+            return jsonify({'error': 'User not found in session'}), 401
+        today = datetime.now().date()
+        until = request.args.get('until')
+        try:
+            until = datetime.strptime(until, '%Y-%m-%d').date() if until else None
+        except ValueError:
+            return jsonify({'error': 'until must be a date (YYYY-MM-DD)'}), 400
+
+        attendance_document, timetable_document = attendance_documents(username)
+        data = attendance_document.get('data') or {}
+        if not data.get('term'):
+            return jsonify({'error': 'Set the term dates first'}), 404
+
+        etag = user_etag(username, 'projection', attendance_document.get('version', 0),
+                         timetable_document.get('version', 0), today.isoformat(), until or '')
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        index = occurrence_index(username, data['term'], timetable_document)
+        return with_etag(jsonify(projection(index, data, today, until)), etag)
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error projecting attendance')
+        return jsonify({'error': 'Error projecting attendance'}), 500
+
+def mark_class(day, slot_id, status):
+    """Set or clear the mark of one class meeting, updating only that subject's counters"""
+    username = session.get('username')
+    if not username:
+        return jsonify({'error': 'User not found in session'}), 401
+    today = datetime.now().date()
+    try:
+        day = datetime.strptime(day, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Date must be YYYY-MM-DD'}), 400
+    if day > today:
+        return jsonify({'error': 'Classes can only be marked once they are held'}), 400
+
+    attendance_document, timetable_document = attendance_documents(username)
+    term = (attendance_document.get('data') or {}).get('term')
+    if not term:
+        return jsonify({'error': 'Set the term dates first'}), 404
+    index = occurrence_index(username, term, timetable_document)
+    try:
+        key = index.slot_subject(day, slot_id)
+    except KeyError:
+        return jsonify({'error': 'No such class on that date'}), 404
+
+    occurrence = occurrence_id(day, slot_id)
+    try:
+        version, values = update_user_data_fields(
+            username, 'attendance', [key],
+            lambda current: {key: apply_mark(current[key], index.names[key], occurrence, status)}
+        )
+    except KeyError:
+        return jsonify({'error': 'Class is not marked'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result = project_subject(index, key, values[key], term, today)
+    result['version'] = version
+    return jsonify(result)
+
+@bp.route('/api/attendance/marks/<day>/<slot_id>', methods=['PUT'])
+@login_required
+def put_attendance_mark(day, slot_id):
+    """Mark one class meeting {"status": "attended" | "missed"}"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        if data.get('status') not in MARK_STATUSES:
+            return jsonify({'error': f"Status must be one of {', '.join(MARK_STATUSES)}"}), 400
+        return mark_class(day, slot_id, data['status'])
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error marking class')
+        return jsonify({'error': 'Error saving attendance'}), 500
+
+@bp.route('/api/attendance/marks/<day>/<slot_id>', methods=['DELETE'])
+@login_required
+def delete_attendance_mark(day, slot_id):
+    try:
+        return mark_class(day, slot_id, None)
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error clearing class mark')
+        return jsonify({'error': 'Error saving attendance'}), 500
+
+@bp.route('/api/holidays')
 @login_required
 def get_holidays():
+    """Holidays for a year, filtered by ?month=&type=&search=; ?upcoming=N returns the next N instead"""
     try:
-        year = request.args.get('year', datetime.now().year, type=int)
-        month = request.args.get('month')
-        holiday_type = request.args.get('type')
-        search = request.args.get('search', '').lower()
-                
-        # Kerala holidays for 2025
-        kerala_holidays_2025 = [
-            {'date': '2025-01-01', 'name': "New Year's Day", 'type': 'national', 'description': 'The first day of the Gregorian calendar year, celebrated worldwide.'},
-            {'date': '2025-01-14', 'name': 'Makar Sankranti', 'type': 'religious', 'description': 'Hindu festival marking the transition of the sun into Capricorn.'},
-            {'date': '2025-01-26', 'name': 'Republic Day', 'type': 'national', 'description': 'Commemorates the adoption of the Constitution of India.'},
-            {'date': '2025-02-26', 'name': 'Maha Shivratri', 'type': 'religious', 'description': 'Hindu festival dedicated to Lord Shiva.'},
-            {'date': '2025-03-13', 'name': 'Holi', 'type': 'festival', 'description': 'Festival of colors, celebrating the arrival of spring.'},
-            {'date': '2025-04-13', 'name': 'Vishu', 'type': 'state', 'description': 'Malayalam New Year, celebrated with traditional rituals and feasts.'},
-            {'date': '2025-05-01', 'name': 'Labour Day', 'type': 'national', 'description': 'International Workers Day, celebrating laborers and the working class.'},
-            {'date': '2025-08-15', 'name': 'Independence Day', 'type': 'national', 'description': 'Commemorates Indias independence from British rule in 1947.'},
-            {'date': '2025-09-05', 'name': 'Onam (Thiruvonam)', 'type': 'state', 'description': 'Keralas most important festival, celebrating King Mahabalis return.'},
-            {'date': '2025-10-02', 'name': 'Gandhi Jayanti', 'type': 'national', 'description': 'Birthday of Mahatma Gandhi, the Father of the Nation.'},
-            {'date': '2025-11-09', 'name': 'Diwali', 'type': 'festival', 'description': 'Festival of lights, one of the most important Hindu festivals.'},
-            {'date': '2025-12-25', 'name': 'Christmas Day', 'type': 'religious', 'description': 'Christian festival celebrating the birth of Jesus Christ.'},
-        ]
-                
-        holidays_list = kerala_holidays_2025
-                
-        # Apply filters
-        if month:
-            holidays_list = [h for h in holidays_list if datetime.strptime(h['date'], '%Y-%m-%d').month == int(month)]
-                
-        if holiday_type:
-            holidays_list = [h for h in holidays_list if h['type'] == holiday_type]
-                
-        if search:
-            holidays_list = [h for h in holidays_list if search in h['name'].lower() or search in h['description'].lower()]
-                
-        # Add status and countdown
         today = datetime.now().date()
-        for holiday in holidays_list:
-            holiday_date = datetime.strptime(holiday['date'], '%Y-%m-%d').date()
-                        
-            if holiday_date == today:
-                holiday['status'] = 'today'
-                holiday['countdown'] = 'Today!'
-            elif holiday_date < today:
-                holiday['status'] = 'past'
-                holiday['countdown'] = ''
-            else:
-                holiday['status'] = 'upcoming'
-                diff_days = (holiday_date - today).days
-                holiday['countdown'] = 'Tomorrow' if diff_days == 1 else f'In {diff_days} days'
-                
-        return jsonify(holidays_list)
+        year = request.args.get('year', today.year, type=int)
+        month = request.args.get('month', type=int)
+        holiday_type = request.args.get('type') or None
+        search = request.args.get('search', '').strip().lower() or None
+        upcoming = request.args.get('upcoming', type=int)
+
+        if not 1900 <= year <= 2100:
+            return jsonify({'error': 'Year must be between 1900 and 2100'}), 400
+        if month is not None and not 1 <= month <= 12:
+            return jsonify({'error': 'Month must be between 1 and 12'}), 400
+
+        # The list only changes when the day rolls over, so clients may reuse it until midnight
+        params = (year, month, holiday_type, search, upcoming, today, HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION, CALENDAR_VERSION)
+        etag = hashlib.sha1(repr(params).encode('utf-8')).hexdigest()[:16]
+        midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        cache_control = f'private, max-age={max(int((midnight - datetime.now()).total_seconds()), 0)}'
+        cached = not_modified(etag, cache_control)
+        if cached:
+            return cached
+
+        if upcoming:
+            holidays_list = upcoming_holidays(today, min(upcoming, 50), HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION)
+        else:
+            holidays_list = list_holidays(year, month, holiday_type, search, today, HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION)
+        return with_etag(jsonify(holidays_list), etag, cache_control)
             
-    except Exception as e:
-        print(f"Holidays error: {e}")
+    except Exception:
+        logger.exception('Holidays error')
         return jsonify({'error': 'Error fetching holidays'}), 500
 
-@app.route('/api/history')
+def history_fingerprint(before, limit, pages):
+    """Records are append-only, so a page is identified by its timestamps"""
+    return hashlib.sha1(repr((before, limit, [
+        (history_type, [record.get('timestamp') for record in records])
+        for history_type, records in pages.items()
+    ])).encode('utf-8')).hexdigest()[:16]
+
+def history_payload(pages, limit):
+    """History response body for {calc_type: records newest first}"""
+    response = {'next_before': {}}
+    for history_type, records in pages.items():
+        # Cursor for the next (older) page, None once history is exhausted
+        response['next_before'][history_type] = records[-1]['timestamp'] if len(records) == limit else None
+        # Oldest first, as the dashboard renders it
+        response[history_type] = records[::-1]
+    return response
+
+@bp.route('/api/history')
 @login_required
 def get_history():
+    """Get a page of calculation history; ?type=&before=&limit= page through older records"""
     try:
         username = session.get('username')
         if not username:
             return jsonify({'error': 'User not found in session'}), 401
-        
-        calculations = get_user_data(username, 'calculations')
-        if not calculations:
-            calculations = {'cgpa': [], 'attendance': []}
-                
-        # Return last 10 records for each type
-        user_cgpa = calculations.get('cgpa', [])[-10:]
-        user_attendance = calculations.get('attendance', [])[-10:]
-                
-        return jsonify({
-            'cgpa': user_cgpa,
-            'attendance': user_attendance
-        })
+
+        calc_type = request.args.get('type')
+        before = request.args.get('before') or None
+        limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+
+        if calc_type and calc_type not in HISTORY_TYPES:
+            return jsonify({'error': f"Unknown history type '{calc_type}'"}), 400
+        if not 1 <= limit <= HISTORY_KEEP:
+            return jsonify({'error': f'limit must be between 1 and {HISTORY_KEEP}'}), 400
+
+        history_types = [calc_type] if calc_type else list(HISTORY_TYPES)
+        pages = dict(zip(history_types, run_concurrently(*[
+            partial(get_user_history, username, history_type, before=before, limit=limit)
+            for history_type in history_types
+        ])))
+
+        etag = user_etag(username, 'history', history_fingerprint(before, limit, pages))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        return with_etag(jsonify(history_payload(pages, limit)), etag)
             
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
     except Exception as e:
-        print(f"History error: {e}")
+        logger.exception('History error')
         return jsonify({'error': 'Error fetching history', 'details': str(e)}), 500
 
-# Admin route to view all users
-@app.route('/admin/users')
+# Everything the dashboard shows on first paint, in one response
+BOOTSTRAP_UPCOMING_HOLIDAYS = 5
+
+def bootstrap_payload(username):
+    """Timetable, today's schedule, recent history and upcoming holidays for the dashboard"""
+    today = datetime.now().date()
+    document, *history_pages = run_concurrently(
+        partial(get_user_document, username, 'timetable'),
+        *[partial(get_user_history, username, history_type) for history_type in HISTORY_TYPES]
+    )
+    timetable = timetable_payload(document)
+    upcoming = upcoming_holidays(today, BOOTSTRAP_UPCOMING_HOLIDAYS, HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION)
+    day = DAYS[today.weekday()]
+    return {
+        'user': {
+            'username': username,
+            'student_name': session.get('student_name', username),
+            'role': session.get('role', 'student')
+        },
+        'timetable': timetable,
+        'today': {
+            'date': today.isoformat(),
+            'day': day,
+            'schedule': sorted(timetable['timetable'].get(day, []), key=lambda entry: entry.get('startTime', '')),
+            'holiday': next((holiday for holiday in upcoming if holiday['status'] == 'today'), None)
+        },
+        'history': history_payload(dict(zip(HISTORY_TYPES, history_pages)), HISTORY_PAGE_SIZE),
+        'holidays': {'upcoming': upcoming}
+    }
+
+@bp.route('/api/bootstrap')
 @login_required
+def get_bootstrap():
+    """Initial dashboard data in one request; the storage reads run concurrently"""
+    try:
+        username = session.get('username')
+        if not username:
+            return jsonify({'error': 'User not found in session'}), 401
+
+        payload = bootstrap_payload(username)
+        fingerprint = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+        etag = user_etag(username, 'bootstrap', fingerprint)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        return with_etag(jsonify(payload), etag)
+
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Bootstrap error')
+        return jsonify({'error': 'Error loading dashboard'}), 500
+
+# Admin route to view all users
+ADMIN_USER_FIELDS = ('username', 'student_name', 'email', 'college', 'course', 'role', 'created_at')
+ADMIN_PAGE_SIZE = 100
+ADMIN_MAX_PAGE_SIZE = 1000
+ADMIN_EXPORT_FORMATS = ('json', 'ndjson', 'csv')
+
+def admin_user_row(username, user_data):
+    row = {field: user_data.get(field) for field in ADMIN_USER_FIELDS}
+    row['username'] = row['username'] or username
+    row['role'] = row['role'] or 'student'
+    return row
+
+def iter_admin_users(start_after=None, limit=None, page_size=500):
+    """Yield projected user rows page by page, so memory stays flat however many users exist"""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        count = 0
+        for username, user_data in get_storage().list_profiles(ADMIN_USER_FIELDS, start_after, size):
+            count += 1
+            start_after = user_data.get('username') or username
+            yield admin_user_row(username, user_data)
+        if remaining is not None:
+            remaining -= count
+        if count < size:
+            return
+
+def stream_admin_users(export_format, start_after, limit):
+    """Export rows; a failure ends the body with an error line naming where to resume"""
+    # The response outlives the request's storage budget; each call keeps its own timeout
+    set_deadline(None)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(ADMIN_USER_FIELDS)
+    try:
+        for row in iter_admin_users(start_after, limit):
+            if export_format == 'csv':
+                writer.writerow([row[field] for field in ADMIN_USER_FIELDS])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield json.dumps(row) + '\n'
+            start_after = row['username']
+        yield buffer.getvalue()
+    except Exception as e:
+        logger.exception('User export failed', extra={'start_after': start_after})
+        if export_format == 'csv':
+            writer.writerow([f'#error: export incomplete ({e}); resume with start_after={start_after or ""}'])
+            yield buffer.getvalue()
+        else:
+            yield json.dumps({'error': f'Export incomplete: {e}', 'start_after': start_after}) + '\n'
+
+@bp.route('/admin/users')
+@admin_required
 def admin_users():
-    """Admin route to view all users"""
+    """Admin route to view users; ?start_after=&limit= pages, ?format=ndjson|csv streams an export"""
     try:
-        users_ref = db.collection('users').document('students').collection('profiles')
-        docs = users_ref.order_by('username').get()
-        
-        users_list = []
-        for doc in docs:
-            user_data = doc.to_dict()
-            user_data['id'] = doc.id
-            # Remove password for security
-            user_data.pop('password_hash', None)
-            users_list.append(user_data)
-        
+        export_format = request.args.get('format', 'json')
+        start_after = request.args.get('start_after') or None
+        limit = request.args.get('limit', type=int)
+
+        if export_format not in ADMIN_EXPORT_FORMATS:
+            return jsonify({'error': f"format must be one of {', '.join(ADMIN_EXPORT_FORMATS)}"}), 400
+        # Exports may stream any number of rows; JSON pages are capped
+        if limit is not None and (limit < 1 or (export_format == 'json' and limit > ADMIN_MAX_PAGE_SIZE)):
+            return jsonify({'error': f'limit must be between 1 and {ADMIN_MAX_PAGE_SIZE}'}), 400
+
+        if export_format != 'json':
+            mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+            response = Response(
+                stream_with_context(stream_admin_users(export_format, start_after, limit)),
+                mimetype=mimetype
+            )
+            response.headers['Content-Disposition'] = f'attachment; filename=users.{export_format}'
+            return response
+
+        users = list(iter_admin_users(start_after, limit or ADMIN_PAGE_SIZE))
         return jsonify({
-            'total_users': len(users_list),
-            'users': [{
-                'username': user.get('username'),
-                'student_name': user.get('student_name'),
-                'email': user.get('email'),
-                'college': user.get('college'),
-                'course': user.get('course'),
-                'role': user.get('role', 'student'),
-                'created_at': user.get('created_at')
-            } for user in users_list]
+            'count': len(users),
+            'users': users,
+            # Pass back as ?start_after= for the next page; None on the last page
+            'next_start_after': users[-1]['username'] if len(users) == (limit or ADMIN_PAGE_SIZE) else None
         })
-    except Exception as e:
-        print(f"Error retrieving users: {e}")
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error retrieving users')
         return jsonify({'error': 'Error retrieving users'}), 500
 
+# Bulk import and export of student records (see bulk.py)
+IMPORT_CONCURRENCY = int(os.getenv('IMPORT_CONCURRENCY', '4'))
+# Data documents an import may replace, whose cached copies are dropped as batches land
+USER_DATA_TYPES = ('timetable', 'transcript', 'attendance')
+
+def forget_users(usernames):
+    for username in usernames:
+        user_cache.pop((username, 'profile'))
+        for data_type in USER_DATA_TYPES:
+            user_cache.pop((username, data_type))
+
+def upload_format(filename, fmt=None):
+    """Upload format from an explicit name or the file extension"""
+    fmt = (fmt or os.path.splitext(filename or '')[1].lstrip('.') or 'csv').lower()
+    if fmt == 'jsonl':
+        fmt = 'ndjson'
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+def stream_import(stream, kind, fmt, skip_rows, overwrite):
+    """Run an import on a worker thread and yield an NDJSON progress line per batch, then the summary"""
+    updates = queue.SimpleQueue()
+
+    def run():
+        # Imports run for as long as the upload takes, not within the request's storage budget
+        set_deadline(None)
+        try:
+            summary = import_upload(
+                get_storage(), stream, kind, fmt, skip_rows=skip_rows,
+                concurrency=IMPORT_CONCURRENCY, overwrite=overwrite, hasher=password_hasher,
+                on_batch=forget_users, progress=lambda summary: updates.put(('progress', summary))
+            )
+            updates.put(('done', summary))
+        except Exception as e:
+            logger.exception('Import failed', extra={'kind': kind})
+            updates.put(('failed', str(e)))
+
+    threading.Thread(target=run, name='bulk-import', daemon=True).start()
+    while True:
+        status, value = updates.get()
+        if status == 'progress':
+            yield json.dumps({key: value[key] for key in ('rows', 'checkpoint', 'profiles_written', 'documents_written', 'error_count')}) + '\n'
+        elif status == 'done':
+            logger.info('Import finished', extra={'kind': kind, 'rows': value['rows'], 'errors': value['error_count']})
+            yield json.dumps(dict(value, done=True)) + '\n'
+            return
+        else:
+            yield json.dumps({'done': False, 'error': value}) + '\n'
+            return
+
+@bp.route('/admin/import', methods=['POST'])
+@admin_required
+def admin_import():
+    """Import ?kind=profiles|semesters|timetables|backup from an uploaded file or the raw body
+
+    Streams NDJSON progress; a failed import is resumed by posting the same
+    upload again with ?skip_rows= set to the last reported checkpoint.
+    """
+    try:
+        kind = request.args.get('kind', '')
+        skip_rows = request.args.get('skip_rows', 0, type=int)
+        overwrite = request.args.get('overwrite') == '1'
+        if kind not in IMPORT_KINDS:
+            return jsonify({'error': f"kind must be one of {', '.join(IMPORT_KINDS)}"}), 400
+        upload = request.files.get('file')
+        try:
+            fmt = upload_format(upload.filename if upload else None, request.args.get('format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        stream = upload.stream if upload else request.stream
+        return Response(stream_with_context(stream_import(stream, kind, fmt, max(skip_rows, 0), overwrite)),
+                        mimetype='application/x-ndjson')
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error starting import')
+        return jsonify({'error': 'Error importing records'}), 500
+
+def stream_export(start_after):
+    """NDJSON backup rows; a failure ends the stream with an error row naming where to resume"""
+    # The response outlives the request's storage budget; each call keeps its own timeout
+    set_deadline(None)
+    # Resuming after `done` repeats the user whose rows were cut off, never skips one
+    done = current = start_after
+    try:
+        for row in iter_export(get_storage(), start_after):
+            if row['type'] == 'profile':
+                done, current = current, row['username']
+            yield json.dumps(row) + '\n'
+    except Exception as e:
+        logger.exception('Export failed', extra={'start_after': done})
+        yield json.dumps({'type': 'error', 'error': f'Export incomplete: {e}', 'start_after': done}) + '\n'
+
+@bp.route('/admin/export')
+@admin_required
+def admin_export():
+    """Stream every profile and data document as NDJSON backup rows; ?start_after= resumes after a username"""
+    try:
+        start_after = request.args.get('start_after') or None
+        response = Response(stream_with_context(stream_export(start_after)), mimetype='application/x-ndjson')
+        response.headers['Content-Disposition'] = 'attachment; filename=backup.ndjson'
+        return response
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error exporting records')
+        return jsonify({'error': 'Error exporting records'}), 500
+
+@bp.route('/admin/analytics')
+@admin_required
+def admin_analytics():
+    """Cohort CGPA and attendance aggregates; ?college=&course=&batch= picks one, fewer filter the list"""
+    try:
+        filters = {field: request.args.get(field, '').strip() for field in ('college', 'course', 'batch')}
+        if all(filters.values()):
+            # One document read, however many students the cohort has
+            aggregate = get_storage().get_cohort(cohort_key(**filters))
+            if aggregate is None:
+                return jsonify({'error': 'No results recorded for this cohort yet'}), 404
+            return jsonify(summarize(aggregate))
+        cohorts = [summarize(aggregate) for key, aggregate in get_storage().list_cohorts()
+                   if cohort_matches(key, **filters)]
+        return jsonify({'count': len(cohorts), 'cohorts': cohorts})
+    except StorageUnavailable as e:
+        return storage_unavailable_response(e)
+    except Exception:
+        logger.exception('Error reading analytics')
+        return jsonify({'error': 'Error reading analytics'}), 500
+
 # Health check route
-@app.route('/health')
+@bp.route('/health')
 def health_check():
-    return jsonify({'status': 'ok', 'message': 'Server is running with Firebase-only storage'})
+    """Liveness: answers without touching storage, so it never connects a worker"""
+    status = storage_status()
+    return jsonify({
+        'status': 'ok',
+        'message': f"Server is running with {status['backend']} storage",
+        'storage': status,
+        'cache': user_cache.stats(),
+        'history_writer': history_writer.stats(),
+        'password_hasher': password_hasher.stats(),
+        'cohort_analytics': cohort_analytics.stats(),
+        'single_flight': single_flight.stats(),
+        'rate_limits': {limiter.name: limiter.stats() for limiter in rate_limiters.values()}
+    })
+
+@bp.route('/ready')
+def readiness_check():
+    """Readiness: connects to storage if needed and makes one round trip"""
+    start = time.perf_counter()
+    try:
+        get_storage().ping()
+    except Exception as e:
+        logger.warning('Readiness check failed: %s', e)
+        return jsonify({'status': 'unavailable', 'storage': storage_status(), 'error': str(e)}), 503
+    return jsonify({
+        'status': 'ready',
+        'storage': storage_status(),
+        'latency_ms': round((time.perf_counter() - start) * 1000, 3)
+    })
+
+@bp.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    body = (REGISTRY.render()
+            + render_stats('cache', user_cache.stats(), 'Profile and data cache')
+            + render_stats('history_writer', history_writer.stats(), 'History write-behind queue')
+            + render_stats('password_hasher', password_hasher.stats(), 'Password hashing pool')
+            + render_stats('cohort_analytics', cohort_analytics.stats(), 'Cohort aggregate updates')
+            + render_stats('single_flight', single_flight.stats(), 'Coalesced storage reads')
+            + render_stats('storage_guard', storage_status()['circuit'] or {}, 'Storage retries and circuit breaker'))
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+    """Minify, fingerprint and precompress static/src into static/dist"""
+    manifest = build_assets()
+    asset_manifest.clear()
+    asset_manifest.update(manifest)
+    for name, built in manifest.items():
+        print(f"{name} -> {built}")
+
+@bp.cli.command('backfill-email-index')
+def backfill_email_index_command():
+    """Claim emails of profiles registered before the email index existed"""
+    try:
+        claimed = get_storage().backfill_email_index()
+    except Exception as e:
+        raise click.ClickException(f'Backfill did not finish: {e}. Emails claimed so far stay claimed; run it again to continue')
+    print(f"Claimed {claimed} email addresses")
+
+@bp.cli.command('grant-admin')
+@click.argument('username')
+@click.option('--revoke', is_flag=True, help='Make the user a student again')
+def grant_admin_command(username, revoke):
+    """Give a registered user the admin role (or take it away with --revoke)"""
+    profile = get_storage().get_profile(username)
+    if profile is None:
+        raise click.UsageError(f"No user named '{username}'")
+    profile['role'] = 'student' if revoke else 'admin'
+    get_storage().create_profile(username, profile)
+    user_cache.pop((username, 'profile'))
+    print(f"{username} is now {'a student' if revoke else 'an admin'}")
+
+@bp.cli.command('import-data')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False))
+@click.option('--kind', type=click.Choice(IMPORT_KINDS), required=True)
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension')
+@click.option('--concurrency', default=IMPORT_CONCURRENCY, show_default=True, help='Batches written at once')
+@click.option('--batch-size', default=500, show_default=True, help='Storage writes per batch (at most 500)')
+@click.option('--overwrite', is_flag=True, help='Replace profiles that already exist instead of skipping them')
+@click.option('--checkpoint', 'checkpoint_path', help='Progress file, default SOURCE.checkpoint.json')
+@click.option('--resume', is_flag=True, help='Continue after the rows the checkpoint says are done')
+def import_data_command(source, kind, fmt, concurrency, batch_size, overwrite, checkpoint_path, resume):
+    """Stream-import profiles, semesters or timetables from a CSV, NDJSON or JSON file"""
+    checkpoint_path = checkpoint_path or f'{source}.checkpoint.json'
+    skip_rows = 0
+    if resume:
+        saved = read_checkpoint(checkpoint_path)
+        if saved and (saved.get('source'), saved.get('kind')) != (os.path.abspath(source), kind):
+            raise click.UsageError(f'{checkpoint_path} belongs to a different import')
+        skip_rows = saved.get('checkpoint', 0)
+    last_report = [0.0]
+
+    def progress(summary):
+        write_checkpoint(checkpoint_path, {
+            'source': os.path.abspath(source), 'kind': kind,
+            'checkpoint': summary['checkpoint'], 'updated_at': datetime.now().isoformat()
+        })
+        if time.monotonic() - last_report[0] >= 2:
+            last_report[0] = time.monotonic()
+            print(f"rows {summary['checkpoint']}: {summary['profiles_written']} profiles, "
+                  f"{summary['documents_written']} documents, {summary['error_count']} errors")
+
+    with open(source, 'rb') as stream:
+        summary = import_upload(
+            get_storage(), stream, kind, upload_format(source, fmt), skip_rows=skip_rows,
+            batch_size=batch_size, concurrency=concurrency, overwrite=overwrite,
+            hasher=password_hasher, progress=progress
+        )
+    for error in summary['errors']:
+        print(f"row {error['row']} ({error['username']}): {error['error']}")
+    if summary['rows'] == skip_rows:
+        print(f"Nothing to import after row {skip_rows}")
+        return
+    print(f"Imported {summary['profiles_written']} profiles and {summary['documents_written']} documents "
+          f"from rows {skip_rows + 1}-{summary['rows']}; {summary['skipped_existing']} existing profiles skipped, "
+          f"{summary['error_count']} errors")
+
+@bp.cli.command('export-data')
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--checkpoint', 'checkpoint_path', help='Progress file, default OUTPUT.checkpoint.json')
+@click.option('--resume', is_flag=True, help='Append to OUTPUT after the last user the checkpoint says is complete')
+def export_data_command(output, checkpoint_path, resume):
+    """Stream every profile and data document to an NDJSON backup that import-data --kind backup reads"""
+    checkpoint_path = checkpoint_path or f'{output}.checkpoint.json'
+    saved = read_checkpoint(checkpoint_path) if resume else {}
+    exported = 0
+    with open(output, 'r+b' if saved else 'wb') as f:
+        # Rows after the checkpoint may belong to a user that was only partly written
+        f.truncate(saved.get('offset', 0))
+        f.seek(0, os.SEEK_END)
+        previous = saved.get('start_after')
+        for row in iter_export(get_storage(), previous):
+            if row['type'] == 'profile':
+                if exported and exported % 500 == 0:
+                    f.flush()
+                    write_checkpoint(checkpoint_path, {'start_after': previous, 'offset': f.tell()})
+                    print(f"{exported} users exported")
+                previous = row['username']
+                exported += 1
+            f.write(json.dumps(row).encode('utf-8') + b'\n')
+        f.flush()
+        write_checkpoint(checkpoint_path, {'start_after': previous, 'offset': f.tell()})
+    print(f"Exported {exported} users to {output}")
+
+@bp.cli.command('rebuild-analytics')
+def rebuild_analytics_command():
+    """Recompute every cohort aggregate from profiles and their newest history records"""
+    history_writer.flush(30)
+    cohort_analytics.flush(30)
+    students, cohorts = rebuild_cohorts(get_storage())
+    print(f"Rebuilt {cohorts} cohorts from {students} students")
+
+def create_app(config=None):
+    """Build the Flask app
+
+    config overrides Flask settings and STORAGE_BACKEND / SQLITE_* (which
+    otherwise come from the environment).  Nothing connects to storage
+    here; each process creates its client on first use, after any fork.
+    The module builds one as `app` on import, which is what servers should
+    load (app:app); call this for apps with other config, such as tests.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY=os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production'),
+        SESSION_PERMANENT=False,
+        SESSION_COOKIE_HTTPONLY=True,
+        SESSION_COOKIE_SECURE=False,  # Set to True in production with HTTPS
+        SESSION_COOKIE_SAMESITE='Lax',
+        # Unfingerprinted files under /static; built bundles are served from /assets for a year
+        SEND_FILE_MAX_AGE_DEFAULT=int(os.getenv('STATIC_MAX_AGE', '300'))
+    )
+    if config:
+        app.config.update(config)
+    # Behind a reverse proxy, take the client address (used for per-IP rate limits) from
+    # X-Forwarded-For; PROXY_FIX_X_FOR is the number of proxies that append to it
+    proxies = int(os.getenv('PROXY_FIX_X_FOR', '0'))
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+    configure_storage(app.config)
+    app.register_blueprint(bp)
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
-    print("Starting Flask server with Firebase-only storage...")
-    print("Firebase structure: /users/students/profiles/username")
-    print("User data stored in: /users/students/profiles/username/data/")
+    logger.info('Starting Flask server', extra={'storage': storage_status()['backend']})
     app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
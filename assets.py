@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only gzip variants are built
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(ROOT, 'static', 'src')
+DIST_DIR = os.path.join(ROOT, 'static', 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Fingerprinted files never change, so clients may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Compressed variants by Content-Encoding, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCT_RE = re.compile(r'\s*([{};,>])\s*')
+_CSS_COLON_RE = re.compile(r':\s+')
+
+
+def minify_css(source):
+    """Drop comments and collapse whitespace; keeps the space before ':' so descendant pseudo-selectors survive"""
+    css = _CSS_COMMENT_RE.sub('', source)
+    css = _CSS_SPACE_RE.sub(' ', css)
+    css = _CSS_PUNCT_RE.sub(r'\1', css)
+    css = _CSS_COLON_RE.sub(':', css)
+    return css.replace(';}', '}').strip() + '\n'
+
+
+def _backticks(line):
+    return len(re.findall(r'(?<!\\)`', line))
+
+
+def minify_js(source):
+    """Line-based JS minifier that only removes what cannot change behaviour
+
+    Strips indentation, blank lines and whole-line // comments, but keeps
+    line breaks (so automatic semicolon insertion is unaffected) and leaves
+    lines inside multi-line template literals alone apart from indentation.
+    """
+    lines = []
+    in_template = False
+    for line in source.splitlines():
+        stripped = line.strip()
+        if not in_template and (not stripped or stripped.startswith('//')):
+            continue
+        lines.append(stripped)
+        if _backticks(line) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+def _write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def build_assets(source_dir=SOURCE_DIR, dist_dir=DIST_DIR):
+    """Minify every source asset into <name>.<hash>.<ext> with .gz/.br variants and write the manifest
+
+    Returns the manifest, {source name: fingerprinted name}.
+    """
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    for name in sorted(os.listdir(source_dir)):
+        base, ext = os.path.splitext(name)
+        if ext not in MINIFIERS:
+            continue
+        with open(os.path.join(source_dir, name), encoding='utf-8') as f:
+            content = MINIFIERS[ext](f.read()).encode('utf-8')
+        fingerprinted = f'{base}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+        path = os.path.join(dist_dir, fingerprinted)
+        _write(path, content)
+        _write(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(path + '.br', brotli.compress(content, quality=11))
+        manifest[name] = fingerprinted
+
+    # Remove bundles from earlier builds that the new manifest no longer points to
+    current = set(manifest.values())
+    for name in os.listdir(dist_dir):
+        if name != 'manifest.json' and name.removesuffix('.gz').removesuffix('.br') not in current:
+            os.remove(os.path.join(dist_dir, name))
+
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Return the build manifest, or {} when assets have not been built"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def pick_encoding(accept_encoding, path):
+    """Best precompressed variant of path the client accepts, as (encoding, path) or (None, path)"""
+    for encoding, suffix in ENCODINGS:
+        if encoding in accept_encoding and os.path.exists(path + suffix):
+            return encoding, path + suffix
+    return None, path
@@ -0,0 +1,245 @@
+import hashlib
+import json
+from datetime import date
+
+import numpy as np
+
+from calculators import classes_skippable_within
+from holiday_calendar import get_holiday_index
+from timetable import DAYS, with_entry_ids
+
+# Longest term a projection is expanded over
+MAX_TERM_DAYS = 366
+MAX_NO_CLASS_DATES = 400
+
+MARK_STATUSES = ('attended', 'missed')
+
+# Stored attendance data: {'term': {...}, 'subject_<digest>': subject state}, where a subject
+# state is {'name', 'attended', 'missed', 'marks': {occurrence id: status}}.  The counters
+# are kept next to the marks so one mark changes them without a recount.
+
+
+def _date(value, name):
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+
+def validate_term(term):
+    """Cleaned {'start', 'end', 'min_required', 'no_class_dates', 'assume_attended'}; raises ValueError"""
+    if not isinstance(term, dict):
+        raise ValueError('Term must be an object')
+    start = _date(term.get('start'), 'start')
+    end = _date(term.get('end'), 'end')
+    if end < start:
+        raise ValueError('end must not be before start')
+    if (end - start).days >= MAX_TERM_DAYS:
+        raise ValueError(f'A term can span at most {MAX_TERM_DAYS} days')
+    try:
+        min_required = float(term.get('min_required', 75))
+    except (TypeError, ValueError):
+        raise ValueError('Minimum required attendance must be a number')
+    if not 0 < min_required <= 100:
+        raise ValueError('Minimum required attendance must be between 0 and 100')
+    no_class_dates = term.get('no_class_dates') or []
+    if not isinstance(no_class_dates, list) or len(no_class_dates) > MAX_NO_CLASS_DATES:
+        raise ValueError(f'no_class_dates must be a list of at most {MAX_NO_CLASS_DATES} dates')
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'min_required': min_required,
+        'no_class_dates': sorted({_date(day, 'no_class_dates').isoformat() for day in no_class_dates}),
+        'assume_attended': bool(term.get('assume_attended', True))
+    }
+
+
+def subject_key(name):
+    """Data key for a subject; names differing only in case or surrounding spaces share one"""
+    return 'subject_' + hashlib.sha1(name.strip().lower().encode('utf-8')).hexdigest()[:12]
+
+
+def occurrence_id(day, slot_id):
+    return f'{day.isoformat()}.{slot_id}'
+
+
+def index_fingerprint(term, timetable_version, country, subdiv, calendar_version):
+    """Cache key part covering everything an OccurrenceIndex is built from"""
+    return hashlib.sha1(json.dumps(
+        [term['start'], term['end'], term['no_class_dates'], timetable_version, country, subdiv, calendar_version]
+    ).encode('utf-8')).hexdigest()[:16]
+
+
+class OccurrenceIndex:
+    """Every meeting of every subject in a term, as sorted date ordinals per subject
+
+    Built once per (term, timetable version, holiday calendar): each weekday's
+    dates are an arange with holidays and no-class dates masked out, shared by
+    all slots on that day.  Counts up to or between dates are then bisects of
+    a subject's array, and whether a slot meets on a date is a set lookup.
+    """
+
+    def __init__(self, timetable, term, country='IN', subdiv='KL'):
+        self.start = date.fromisoformat(term['start'])
+        self.end = date.fromisoformat(term['end'])
+        closed = {date.fromisoformat(day).toordinal() for day in term['no_class_dates']}
+        for year in range(self.start.year, self.end.year + 1):
+            holidays = get_holiday_index(year, country, subdiv)
+            closed.update(holidays.ordinals[i] for i in holidays.range(self.start, self.end))
+        self.closed = frozenset(closed)
+        closed_array = np.fromiter(self.closed, dtype=np.int64, count=len(self.closed))
+
+        # slot id -> (subject key, weekday); subject key -> name and meeting ordinals
+        self.slots = {}
+        self.names = {}
+        meetings = {}
+        first, last = self.start.toordinal(), self.end.toordinal()
+        for weekday, day in enumerate(DAYS):
+            schedule = with_entry_ids((timetable or {}).get(day))
+            if not schedule:
+                continue
+            offset = (weekday - self.start.weekday()) % 7
+            days = np.arange(first + offset, last + 1, 7, dtype=np.int64)
+            days = days[~np.isin(days, closed_array)]
+            for entry in schedule:
+                name = (entry.get('subjectName') or '').strip()
+                if not name:
+                    continue
+                key = subject_key(name)
+                self.slots[entry['id']] = (key, weekday)
+                self.names.setdefault(key, name)
+                meetings.setdefault(key, []).append(days)
+        self.meetings = {key: np.sort(np.concatenate(arrays)) for key, arrays in meetings.items()}
+
+    def total(self, key):
+        meetings = self.meetings.get(key)
+        return 0 if meetings is None else int(meetings.size)
+
+    def held(self, key, day):
+        """Meetings on or before day"""
+        meetings = self.meetings.get(key)
+        if meetings is None:
+            return 0
+        return int(np.searchsorted(meetings, day.toordinal(), side='right'))
+
+    def between(self, key, after, until):
+        """Meetings after `after` up to and including `until`"""
+        return max(self.held(key, until) - self.held(key, after), 0)
+
+    def slot_subject(self, day, slot_id):
+        """Subject key of the slot meeting on day; raises KeyError if it does not meet then"""
+        key, weekday = self.slots[slot_id]
+        if not self.start <= day <= self.end or day.weekday() != weekday or day.toordinal() in self.closed:
+            raise KeyError(slot_id)
+        return key
+
+
+def apply_mark(subject, name, occurrence, status):
+    """Set (or with status=None, clear) one mark, adjusting the subject's counters in O(1)
+
+    Returns the new subject state.  Raises KeyError when clearing a mark that does not exist.
+    """
+    if status is not None and status not in MARK_STATUSES:
+        raise ValueError(f"Status must be one of {', '.join(MARK_STATUSES)}")
+    subject = dict(subject or {'name': name, 'attended': 0, 'missed': 0, 'marks': {}})
+    subject['marks'] = dict(subject.get('marks') or {})
+    previous = subject['marks'].pop(occurrence, None)
+    if previous is None and status is None:
+        raise KeyError(occurrence)
+    if previous:
+        subject[previous] = subject.get(previous, 0) - 1
+    if status:
+        subject['marks'][occurrence] = status
+        subject[status] = subject.get(status, 0) + 1
+    return subject
+
+
+def rebase_subjects(data, term):
+    """Subject states with marks outside the term's dates dropped and counters recounted"""
+    subjects = {}
+    for key, subject in data.items():
+        if not key.startswith('subject_') or not subject:
+            continue
+        marks = {occurrence: status for occurrence, status in (subject.get('marks') or {}).items()
+                 if term['start'] <= occurrence.split('.', 1)[0] <= term['end']}
+        subjects[key] = {
+            'name': subject.get('name'),
+            'attended': sum(1 for status in marks.values() if status == 'attended'),
+            'missed': sum(1 for status in marks.values() if status == 'missed'),
+            'marks': marks
+        }
+    return subjects
+
+
+def project_subject(index, key, subject, term, as_of, until=None):
+    """Attendance so far and what is left of the term for one subject, from index lookups"""
+    subject = subject or {}
+    min_required = term['min_required']
+    total = index.total(key)
+    held = index.held(key, as_of)
+    missed = subject.get('missed', 0)
+    marked = subject.get('attended', 0) + missed
+    if term['assume_attended']:
+        # Usually only absences are recorded; unmarked past meetings count as attended
+        attended, counted = max(held - missed, 0), max(held, marked)
+    else:
+        attended, counted = subject.get('attended', 0), marked
+    remaining = total - held
+    can_skip = classes_skippable_within(attended, counted, remaining, min_required)
+    below = 100 * attended < min_required * counted
+
+    if can_skip is None:
+        risk = 'cannot_recover'
+    elif below or (remaining > 0 and can_skip == 0):
+        # Once the term is over nothing is left to skip, which is no risk at or above the minimum
+        risk = 'at_risk'
+    else:
+        risk = 'safe'
+
+    result = {
+        'subject': index.names.get(key) or subject.get('name'),
+        'key': key,
+        'attended': attended,
+        'missed': missed,
+        'held': counted,
+        'unmarked': max(held - marked, 0),
+        'current_percent': round(100 * attended / counted, 2) if counted else None,
+        'scheduled': total,
+        'remaining': remaining,
+        'can_skip': can_skip,
+        'must_attend': remaining - can_skip if can_skip is not None else remaining,
+        'best_percent': round(100 * (attended + remaining) / (counted + remaining), 2) if counted + remaining else None,
+        'risk': risk
+    }
+    if until is not None:
+        upcoming = index.between(key, as_of, until)
+        result['by_date'] = {
+            'date': until.isoformat(),
+            'classes': upcoming,
+            'can_skip': classes_skippable_within(attended, counted, upcoming, min_required)
+        }
+    return result
+
+
+def projection(index, data, as_of, until=None):
+    """Projection for every subject in the timetable or with marks, plus an aggregate"""
+    term = data['term']
+    keys = sorted(set(index.meetings) | {key for key, value in data.items() if key.startswith('subject_') and value},
+                  key=lambda key: (index.names.get(key) or data[key].get('name') or '').lower())
+    subjects = [project_subject(index, key, data.get(key), term, as_of, until) for key in keys]
+
+    attended = sum(s['attended'] for s in subjects)
+    held = sum(s['held'] for s in subjects)
+    remaining = sum(s['remaining'] for s in subjects)
+    return {
+        'term': term,
+        'as_of': as_of.isoformat(),
+        'subjects': subjects,
+        'aggregate': {
+            'attended': attended,
+            'held': held,
+            'current_percent': round(100 * attended / held, 2) if held else None,
+            'remaining': remaining,
+            'at_risk_subjects': [s['subject'] for s in subjects if s['risk'] != 'safe']
+        }
+    }
@@ -0,0 +1,188 @@
+import copy
+import random
+import threading
+import time
+from collections import Counter
+
+from storage import MAX_BATCH_WRITES, StorageBackend, VersionConflict, UsernameTaken, EmailTaken, add_nested, batch_writes, normalize_email
+
+
+class MemoryStorage(StorageBackend):
+    """In-memory stand-in for Firestore, with the same document layout
+
+    Every call takes a deep copy in and out so callers cannot share state
+    through it, the way they cannot with a remote database.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.profiles = {}
+        self.emails = {}
+        self.data = {}
+        self.history = {}
+        self.cohorts = {}
+
+    def get_profile(self, username):
+        with self._lock:
+            return copy.deepcopy(self.profiles.get(username))
+
+    def find_profile_by_email(self, email):
+        with self._lock:
+            username = self.emails.get(normalize_email(email))
+            if username is None:
+                return None, None
+            return username, copy.deepcopy(self.profiles[username])
+
+    def create_profile(self, username, profile):
+        with self._lock:
+            self.profiles[username] = copy.deepcopy(profile)
+            if profile.get('email'):
+                self.emails[normalize_email(profile['email'])] = username
+
+    def create_profile_unique(self, username, profile):
+        with self._lock:
+            if username in self.profiles:
+                raise UsernameTaken(username)
+            if normalize_email(profile['email']) in self.emails:
+                raise EmailTaken(profile['email'])
+            self.profiles[username] = copy.deepcopy(profile)
+            self.emails[normalize_email(profile['email'])] = username
+
+    def backfill_email_index(self):
+        return 0
+
+    def existing_profiles(self, usernames):
+        with self._lock:
+            return {username for username in usernames if username in self.profiles}
+
+    def email_owners(self, emails):
+        with self._lock:
+            return {normalize_email(e): self.emails[normalize_email(e)] for e in emails if normalize_email(e) in self.emails}
+
+    def bulk_write(self, profiles=(), documents=(), updated_at=None):
+        if batch_writes(profiles, documents) > MAX_BATCH_WRITES:
+            raise ValueError(f'A batch holds at most {MAX_BATCH_WRITES} writes')
+        with self._lock:
+            for username, profile in profiles:
+                self.profiles[username] = copy.deepcopy(profile)
+                if profile.get('email'):
+                    self.emails[normalize_email(profile['email'])] = username
+            for username, data_type, data in documents:
+                version = (self.data.get((username, data_type)) or {}).get('version', 0)
+                self.data[(username, data_type)] = copy.deepcopy({'data': data, 'updated_at': updated_at, 'version': version + 1})
+
+    def list_data(self, username):
+        with self._lock:
+            return {data_type: copy.deepcopy(document) for (user, data_type), document in self.data.items() if user == username}
+
+    def get_data(self, username, data_type):
+        with self._lock:
+            return copy.deepcopy(self.data.get((username, data_type)))
+
+    def set_data(self, username, data_type, document):
+        with self._lock:
+            self.data[(username, data_type)] = copy.deepcopy(document)
+
+    def update_data(self, username, data_type, modify, keys=None, expected_version=None, updated_at=None):
+        with self._lock:
+            document = copy.deepcopy(self.data.get((username, data_type))) or {}
+            version = document.get('version', 0)
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(version)
+            data = document.get('data') or {}
+            if keys is None:
+                values = modify(data)
+                data = values
+            else:
+                values = modify({key: data.get(key) for key in keys})
+                data.update(values)
+            self.data[(username, data_type)] = copy.deepcopy({'data': data, 'updated_at': updated_at, 'version': version + 1})
+        return version + 1, values
+
+    def list_profiles(self, fields=None, start_after=None, limit=None):
+        with self._lock:
+            usernames = sorted(u for u in self.profiles if not start_after or u > start_after)[:limit]
+            rows = [(u, copy.deepcopy(self.profiles[u])) for u in usernames]
+        for username, profile in rows:
+            if fields:
+                profile = {field: profile[field] for field in fields if field in profile}
+            yield username, profile
+
+    def increment_cohort(self, key, labels, deltas, updated_at=None):
+        with self._lock:
+            aggregate = add_nested(self.cohorts.setdefault(key, {}), copy.deepcopy(deltas))
+            aggregate.update(labels, updated_at=updated_at)
+
+    def get_cohort(self, key):
+        with self._lock:
+            return copy.deepcopy(self.cohorts.get(key))
+
+    def list_cohorts(self):
+        with self._lock:
+            rows = copy.deepcopy(sorted(self.cohorts.items()))
+        yield from rows
+
+    def replace_cohorts(self, cohorts):
+        with self._lock:
+            self.cohorts = copy.deepcopy(cohorts)
+
+    def append_history(self, username, calc_type, record):
+        self.append_history_many(username, calc_type, [record])
+
+    def append_history_many(self, username, calc_type, records):
+        with self._lock:
+            self.history.setdefault((username, calc_type), []).extend(copy.deepcopy(records))
+
+    def list_history(self, username, calc_type, before=None, limit=10):
+        with self._lock:
+            records = [r for r in self.history.get((username, calc_type), []) if not before or r['timestamp'] < before]
+        records.sort(key=lambda r: r['timestamp'], reverse=True)
+        return copy.deepcopy(records[:limit])
+
+    def trim_history(self, username, calc_type, keep):
+        with self._lock:
+            records = sorted(self.history.get((username, calc_type), []), key=lambda r: r['timestamp'], reverse=True)
+            self.history[(username, calc_type)] = records[:keep]
+        return max(len(records) - keep, 0)
+
+    def ping(self):
+        pass
+
+
+class InstrumentedStorage:
+    """Wrap a backend to add a simulated network round trip and count calls
+
+    Each backend method call sleeps latency seconds plus up to jitter
+    seconds before running, and is counted by method name.  Generators
+    (list_profiles) pay the round trip once, when they are created.
+    """
+
+    def __init__(self, backend, latency=0.0, jitter=0.0):
+        self.backend = backend
+        self.latency = latency
+        self.jitter = jitter
+        self.name = backend.name
+        self._lock = threading.Lock()
+        self.calls = Counter()
+
+    def __getattr__(self, attr):
+        value = getattr(self.backend, attr)
+        if not callable(value) or attr.startswith('_'):
+            return value
+
+        def call(*args, **kwargs):
+            with self._lock:
+                self.calls[attr] += 1
+            delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+            if delay:
+                time.sleep(delay)
+            return value(*args, **kwargs)
+        return call
+
+    def reset_calls(self):
+        """Return the call counts so far and start counting from zero"""
+        with self._lock:
+            calls, self.calls = self.calls, Counter()
+        return calls
@@ -0,0 +1,197 @@
+"""Load-test the hot endpoints against an in-memory storage stand-in
+
+Usage:
+    python -m benchmarks.run --latency 20 --concurrency 1,8,32 --requests 200 --output bench.json
+
+Each endpoint is driven through Flask's test client from a pool of threads
+at every concurrency level.  Storage calls go to MemoryStorage wrapped in
+InstrumentedStorage, so each call costs the configured simulated round trip
+and is counted.  Results are printed as a table and written as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.memory_storage import MemoryStorage, InstrumentedStorage
+
+USERNAME = 'bench'
+PASSWORD = 'bench-password'
+
+SEMESTERS = [{'sgpa': 7.5 + (i % 5) * 0.4, 'credits': 20 + i % 3} for i in range(8)]
+
+TIMETABLE = {
+    day: [
+        {'id': f'{day[:3]}-{slot}', 'startTime': f'{9 + slot:02d}:00', 'endTime': f'{10 + slot:02d}:00',
+         'subjectName': f'Subject {slot}', 'teacherName': 'Teacher', 'roomNumber': f'R{slot}', 'classType': 'lecture'}
+        for slot in range(6)
+    ]
+    for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday')
+}
+
+
+def endpoints():
+    """(name, method, path, payload, expected status, needs a session) for each benchmarked route"""
+    return [
+        ('login', 'POST', '/login', {'username': USERNAME, 'password': PASSWORD}, 302, False),
+        ('calculate_cgpa', 'POST', '/api/calculate_cgpa', {'semesters': SEMESTERS}, 200, True),
+        ('calculate_attendance', 'POST', '/api/calculate_attendance',
+         {'attended': 31, 'total': 45, 'min_required': 75, 'subject_name': 'Maths'}, 200, True),
+        ('holidays', 'GET', f'/api/holidays?year={date.today().year}', None, 200, True),
+        ('timetable', 'GET', '/api/timetable', None, 200, True),
+        ('history', 'GET', '/api/history?type=cgpa', None, 200, True),
+    ]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def seed(app_module):
+    """Create the benchmark user with a timetable and some history"""
+    storage = app_module.get_storage()
+    storage.create_profile(USERNAME, {
+        'user_id': 'bench', 'student_name': 'Bench Mark', 'username': USERNAME, 'email': 'bench@example.com',
+        'student_id': 'B1', 'phone': '0', 'college': 'College', 'course': 'Course',
+        'from_year': '2022', 'to_year': '2026', 'role': 'student',
+        'password_hash': app_module.password_hasher.hash(PASSWORD),
+        'created_at': datetime.now().isoformat()
+    })
+    storage.set_data(USERNAME, 'timetable', {'data': TIMETABLE, 'updated_at': datetime.now().isoformat(), 'version': 1})
+    start = datetime.now() - timedelta(days=30)
+    storage.append_history_many(USERNAME, 'cgpa', [
+        {'result': {'cgpa': 8.0}, 'timestamp': (start + timedelta(hours=i)).isoformat()} for i in range(40)
+    ])
+
+
+def login_client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': USERNAME, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'Benchmark login failed with status {response.status_code}')
+    return client
+
+
+def run_level(app_module, storage, endpoint, concurrency, requests):
+    """Send requests calls to one endpoint from concurrency threads"""
+    name, method, path, payload, expected, needs_session = endpoint
+    app = app_module.app
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = login_client(app) if needs_session else app.test_client()
+        return local.client
+
+    def call(_):
+        c = client() if needs_session else app.test_client()
+        start = time.perf_counter()
+        if method == 'GET':
+            response = c.get(path)
+        elif name == 'login':
+            response = c.post(path, data=payload)
+        else:
+            response = c.post(path, json=payload)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code == expected
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Sessions are set up before timing so logins are not counted against other endpoints
+        if needs_session:
+            list(pool.map(lambda _: client(), range(concurrency)))
+        app_module.history_writer.flush(30)
+        app_module.user_cache.clear()
+        storage.reset_calls()
+
+        started = time.perf_counter()
+        results = list(pool.map(call, range(requests)))
+        wall = time.perf_counter() - started
+    app_module.history_writer.flush(30)
+    calls = storage.reset_calls()
+
+    latencies = sorted(elapsed * 1000 for elapsed, _ in results)
+    return {
+        'endpoint': name,
+        'method': method,
+        'path': path,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, ok in results if not ok),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'rps': round(requests / wall, 1) if wall else 0.0,
+        'storage_calls_per_request': round(sum(calls.values()) / requests, 3),
+        'storage_calls': dict(sorted(calls.items()))
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the hot endpoints against an in-memory storage stand-in')
+    parser.add_argument('--latency', type=float, default=20.0, help='simulated storage round trip in ms (default 20)')
+    parser.add_argument('--jitter', type=float, default=5.0, help='extra random storage delay of up to this many ms (default 5)')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma separated concurrency levels (default 1,8,32)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint and level (default 200)')
+    parser.add_argument('--endpoints', default='', help='comma separated subset of endpoints to run')
+    parser.add_argument('--no-cache', action='store_true', help='disable the profile/data cache')
+    parser.add_argument('--output', default='', help='write JSON results to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.no_cache:
+        os.environ['CACHE_TTL'] = '0'
+    # Every benchmark client shares one user and address; measure the endpoints, not the limiter
+    for name in ('CALCULATE_USER', 'CALCULATE_IP', 'LOGIN_IP', 'LOGIN_ACCOUNT', 'REGISTER_IP'):
+        os.environ.setdefault(f'RATE_LIMIT_{name}', '0')
+    import app as app_module
+    from storage import set_storage
+
+    storage = InstrumentedStorage(MemoryStorage(), latency=args.latency / 1000.0, jitter=args.jitter / 1000.0)
+    set_storage(storage)
+    seed(app_module)
+
+    wanted = set(filter(None, args.endpoints.split(',')))
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+    results = []
+    for endpoint in endpoints():
+        if wanted and endpoint[0] not in wanted:
+            continue
+        for concurrency in levels:
+            result = run_level(app_module, storage, endpoint, concurrency, args.requests)
+            results.append(result)
+            print(f"{result['endpoint']:<22} c={concurrency:<4} p50={result['p50_ms']:>9.2f}ms "
+                  f"p95={result['p95_ms']:>9.2f}ms p99={result['p99_ms']:>9.2f}ms rps={result['rps']:>8.1f} "
+                  f"calls/req={result['storage_calls_per_request']:.2f} errors={result['errors']}")
+
+    report = {
+        'started_at': datetime.now().isoformat(),
+        'latency_ms': args.latency,
+        'jitter_ms': args.jitter,
+        'cache': not args.no_cache,
+        'password_hash_method': app_module.password_hasher.method,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    app_module.history_writer.close()
+    app_module.password_hasher.close()
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+import csv
+import io
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from grading import build_transcript
+from storage import MAX_BATCH_WRITES, batch_writes, normalize_email
+from timetable import DAYS, ENTRY_FIELDS, replace_schedule
+
+IMPORT_KINDS = ('profiles', 'semesters', 'timetables', 'backup')
+FORMATS = ('csv', 'ndjson', 'json')
+
+# Profile fields taken from an import row; anything else in the row is ignored
+PROFILE_FIELDS = ('student_name', 'email', 'student_id', 'phone', 'college', 'course',
+                  'from_year', 'to_year', 'role', 'created_at', 'user_id')
+
+# Errors kept in the summary; the count keeps going past it
+MAX_REPORTED_ERRORS = 100
+
+
+def _text(stream):
+    """Text view of an upload that may be binary"""
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def iter_json_array(stream, chunk_size=65536):
+    """Yield the elements of a top-level JSON array while reading it in chunks"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('JSON upload must be an array of rows')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    raise ValueError('JSON upload is truncated or malformed')
+                break  # The element continues in the next chunk
+            # A number can be cut off by the chunk boundary; only trust it once more text follows
+            if end == len(buffer) and not eof:
+                break
+            yield value
+            pos = end
+        buffer = buffer[pos:]
+        if eof:
+            raise ValueError('JSON upload is truncated or malformed')
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_rows(stream, fmt):
+    """Yield one dict per row of a CSV, NDJSON or JSON-array upload, reading it incrementally"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}")
+    text = _text(stream)
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+    elif fmt == 'ndjson':
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from iter_json_array(text)
+
+
+def _username(row):
+    username = str(row.get('username') or '').strip()
+    if not username:
+        raise ValueError('username is required')
+    return username
+
+
+def _profile(row):
+    """Profile for a row, and the plain password to hash when it has no password_hash"""
+    username = _username(row)
+    profile = {field: str(row[field]).strip() for field in PROFILE_FIELDS if row.get(field) not in (None, '')}
+    if not profile.get('email'):
+        raise ValueError('email is required')
+    password = None
+    if row.get('password_hash'):
+        profile['password_hash'] = row['password_hash']
+    elif row.get('password'):
+        password = str(row['password'])
+    else:
+        raise ValueError('password_hash (or password) is required')
+    profile.setdefault('user_id', str(uuid.uuid4()))
+    profile.setdefault('role', 'student')
+    profile.setdefault('created_at', datetime.now().isoformat())
+    profile['username'] = username
+    return profile, password
+
+
+def _transcript(rows):
+    semesters = {}
+    scale = None
+    for row in rows:
+        try:
+            number = int(row.get('semester'))
+        except (TypeError, ValueError):
+            raise ValueError('semester must be a whole number')
+        semesters.setdefault(number, []).append({key: row.get(key) for key in ('id', 'course', 'credits', 'grade')})
+        scale = scale or row.get('scale') or None
+    if min(semesters) < 1:
+        raise ValueError('semester must be 1 or more')
+    ordered = [{'courses': semesters.get(n, [])} for n in range(1, max(semesters) + 1)]
+    data = build_transcript(ordered, scale)
+    # Semesters missing from the upload are not stored as empty ones
+    return {key: value for key, value in data.items()
+            if not key.startswith('semester_') or int(key.split('_', 1)[1]) in semesters}
+
+
+def _timetable(rows):
+    days = {}
+    for row in rows:
+        day = str(row.get('day') or '').strip().lower()
+        if day not in DAYS:
+            raise ValueError(f"Unknown day '{row.get('day')}'")
+        days.setdefault(day, []).append({field: row[field] for field in ENTRY_FIELDS + ('id',) if row.get(field)})
+    return {day: replace_schedule(entries) for day, entries in days.items()}
+
+
+class Item:
+    """One unit of work: a profile or data document, ending at row `end` of the upload"""
+
+    __slots__ = ('end', 'username', 'profile', 'password', 'document')
+
+    def __init__(self, end, username, profile=None, password=None, document=None):
+        self.end = end
+        self.username = username
+        self.profile = profile
+        self.password = password
+        self.document = document
+
+
+def iter_items(rows, kind, skip_rows=0, errors=None):
+    """Turn upload rows into Items, one per row or per run of rows for the same user
+
+    semesters and timetables rows are grouped by username, so one user's
+    rows must be consecutive.  Rows that fail validation are reported to
+    errors(row number, username, message) and skipped; the first skip_rows
+    rows are passed over without being parsed.
+    """
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Unknown import kind '{kind}', expected one of {', '.join(IMPORT_KINDS)}")
+    report = errors or (lambda number, username, message: None)
+    grouped = kind in ('semesters', 'timetables')
+    build = _transcript if kind == 'semesters' else _timetable
+    data_type = 'transcript' if kind == 'semesters' else 'timetable'
+    finished = set()
+    group, group_user, group_start = [], None, None
+    number = 0
+
+    def flush(end):
+        try:
+            return Item(end, group_user, document=(data_type, build(group)))
+        except (TypeError, ValueError, AttributeError) as e:
+            report(group_start, group_user, str(e))
+            return Item(end, group_user)
+
+    for number, row in enumerate(rows, 1):
+        if number <= skip_rows:
+            continue
+        try:
+            if not isinstance(row, dict):
+                raise ValueError('Row must be an object')
+            username = _username(row)
+            if not grouped:
+                if kind == 'profiles':
+                    profile, password = _profile(row)
+                    yield Item(number, username, profile=profile, password=password)
+                elif row.get('type') == 'profile' and isinstance(row.get('profile'), dict):
+                    yield Item(number, username, profile=dict(row['profile'], username=username))
+                elif row.get('type') == 'data' and row.get('data_type') and isinstance(row.get('document'), dict):
+                    yield Item(number, username, document=(row['data_type'], row['document'].get('data')))
+                else:
+                    raise ValueError('Backup rows need type profile (with profile) or data (with data_type and document)')
+                continue
+        except (TypeError, ValueError, AttributeError) as e:
+            report(number, row.get('username') if isinstance(row, dict) else None, str(e))
+            if not group:
+                # Inside a user's rows the checkpoint must wait for that user to be written
+                yield Item(number, None)
+            continue
+
+        if username != group_user:
+            if group:
+                yield flush(number - 1)
+                finished.add(group_user)
+            if username in finished:
+                report(number, username, "Rows for this user are not consecutive; sort the upload by username")
+                group, group_user = [], None
+                yield Item(number, None)
+                continue
+            group, group_user, group_start = [], username, number
+        group.append(row)
+    if group:
+        yield flush(number)
+
+
+def _batches(items, batch_writes_limit):
+    """Group Items into batches of at most batch_writes_limit storage writes"""
+    batch, writes = [], 0
+    for item in items:
+        cost = batch_writes([(item.username, item.profile)] if item.profile else (), [item.document] if item.document else ())
+        if batch and writes + cost > batch_writes_limit:
+            yield batch
+            batch, writes = [], 0
+        batch.append(item)
+        writes += cost
+    if batch:
+        yield batch
+
+
+class BulkImport:
+    """Write Items to storage in batches, several batches at a time
+
+    At most `concurrency` batches are being written and as many more are
+    queued, so memory stays bounded whatever the upload size.  `checkpoint`
+    is the last upload row such that it and every row before it has been
+    written or rejected, which is where a resumed import starts.
+    """
+
+    def __init__(self, storage, batch_size=MAX_BATCH_WRITES, concurrency=4, overwrite=False,
+                 hasher=None, on_batch=None, progress=None):
+        self.storage = storage
+        self.hasher = hasher
+        self.batch_size = min(batch_size, MAX_BATCH_WRITES)
+        self.concurrency = max(concurrency, 1)
+        self.overwrite = overwrite
+        self.on_batch = on_batch
+        self.progress = progress
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.concurrency * 2)
+        self._done = {}
+        self._next = 0
+        # Emails claimed earlier in this import, which storage may not show yet
+        self._claimed = {}
+        self.summary = {
+            'rows': 0,
+            'checkpoint': 0,
+            'profiles_written': 0,
+            'documents_written': 0,
+            'skipped_existing': 0,
+            'batches': 0,
+            'error_count': 0,
+            'errors': []
+        }
+
+    def error(self, row, username, message):
+        with self._lock:
+            self.summary['error_count'] += 1
+            if len(self.summary['errors']) < MAX_REPORTED_ERRORS:
+                self.summary['errors'].append({'row': row, 'username': username, 'error': message})
+
+    def _write(self, batch):
+        profiles = [item for item in batch if item.profile]
+        if profiles:
+            existing = self.storage.existing_profiles([item.username for item in profiles])
+            owners = self.storage.email_owners([item.profile['email'] for item in profiles if item.profile.get('email')])
+            keep = []
+            for item in profiles:
+                email = normalize_email(item.profile.get('email'))
+                with self._lock:
+                    owner = email and (owners.get(email) or self._claimed.setdefault(email, item.username))
+                if item.username in existing and not self.overwrite:
+                    with self._lock:
+                        self.summary['skipped_existing'] += 1
+                elif owner and owner != item.username:
+                    self.error(item.end, item.username, f'Email is already registered to {owner}')
+                elif item.password and self.hasher is None:
+                    self.error(item.end, item.username, 'Plain passwords cannot be imported here; provide password_hash')
+                else:
+                    if item.password:
+                        item.profile['password_hash'] = self.hasher.hash(item.password)
+                    keep.append(item)
+            profiles = keep
+        documents = [(item.username, *item.document) for item in batch if item.document]
+        if profiles or documents:
+            self.storage.bulk_write([(item.username, item.profile) for item in profiles], documents,
+                                    updated_at=datetime.now().isoformat())
+        if self.on_batch:
+            self.on_batch({item.username for item in batch if item.username})
+        return len(profiles), len(documents)
+
+    def _run(self, sequence, batch):
+        try:
+            try:
+                profiles, documents = self._write(batch)
+            except Exception as e:
+                for item in batch:
+                    if item.profile or item.document:
+                        self.error(item.end, item.username, f'Write failed: {e}')
+                profiles = documents = 0
+            with self._lock:
+                self.summary['profiles_written'] += profiles
+                self.summary['documents_written'] += documents
+                self.summary['batches'] += 1
+                self._done[sequence] = batch[-1].end
+                # Batches can finish out of order; only advance past a contiguous prefix
+                while self._next in self._done:
+                    self.summary['checkpoint'] = self._done.pop(self._next)
+                    self._next += 1
+                snapshot = dict(self.summary)
+            if self.progress:
+                self.progress(snapshot)
+        finally:
+            self._slots.release()
+
+    def run(self, items):
+        """Write every Item and return the summary"""
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='bulk-import') as pool:
+            for sequence, batch in enumerate(_batches(items, self.batch_size)):
+                self._slots.acquire()
+                with self._lock:
+                    self.summary['rows'] = batch[-1].end
+                pool.submit(self._run, sequence, batch)
+        return self.summary
+
+
+def import_upload(storage, stream, kind, fmt, skip_rows=0, **options):
+    """Stream-parse an upload and import it; options are passed to BulkImport"""
+    job = BulkImport(storage, **options)
+    job.summary['rows'] = job.summary['checkpoint'] = skip_rows
+    rows = iter_rows(stream, fmt)
+    try:
+        job.run(iter_items(rows, kind, skip_rows, job.error))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        # The upload itself is unreadable past this point; what was written stays written
+        job.error(job.summary['rows'] + 1, None, f'Upload could not be read: {e}')
+    return job.summary
+
+
+def iter_export(storage, start_after=None, page_size=500, include_secrets=True):
+    """Yield backup rows for every user: the profile, then each data document
+
+    Profiles are listed a page at a time and each user's data documents are
+    read as their page is reached, so memory stays flat.  History records
+    are not included.
+    """
+    while True:
+        count = 0
+        for username, profile in storage.list_profiles(start_after=start_after, limit=page_size):
+            count += 1
+            start_after = username
+            if not include_secrets:
+                profile.pop('password_hash', None)
+            yield {'type': 'profile', 'username': username, 'profile': profile}
+            for data_type, document in sorted(storage.list_data(username).items()):
+                yield {'type': 'data', 'username': username, 'data_type': data_type, 'document': document}
+        if count < page_size:
+            return
+
+
+def read_checkpoint(path):
+    """Saved checkpoint dict, or {} when there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_checkpoint(path, checkpoint):
+    """Replace the checkpoint file atomically, so a crash never leaves half of one"""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
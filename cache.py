@@ -0,0 +1,135 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds
+
+    Values are deep-copied on the way in and out, so callers can mutate what
+    they get back without corrupting the cached copy.  copy=False skips that
+    for values that are never mutated.  A ttl of 0 disables the cache
+    entirely.
+
+    fill() is for read-through loads: a load that started before a write to
+    the same key can finish after it, so its result is only stored if the
+    key was not set, popped or cleared while it ran.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0, clock=time.monotonic, copy=True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.copy = copy
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Loads in flight per key, and when such a key was last changed, on one counter
+        self._loading = {}
+        self._changed = {}
+        self._cleared = 0
+        self._seq = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key, default=MISSING):
+        """Return the cached value for key, or default on a miss"""
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value) if self.copy else value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (default: the cache's), evicting the least recently used entry if full"""
+        if not self.enabled:
+            return
+        if self.copy:
+            value = copy.deepcopy(value)
+        with self._lock:
+            self._mark_changed(key)
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl):
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else min(ttl, self.ttl)), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _mark_changed(self, key):
+        if key in self._loading:
+            self._seq += 1
+            self._changed[key] = self._seq
+
+    def fill(self, key, load, ttl=None, skip=None):
+        """Return load(), storing it under key unless key changed while it ran or skip(value) is true"""
+        if not self.enabled:
+            return load()
+        with self._lock:
+            self._seq += 1
+            started = self._seq
+            self._loading[key] = self._loading.get(key, 0) + 1
+        value = MISSING
+        try:
+            value = load()
+            stored = copy.deepcopy(value) if self.copy else value
+        finally:
+            with self._lock:
+                current = max(self._changed.get(key, 0), self._cleared) < started
+                self._loading[key] -= 1
+                if not self._loading[key]:
+                    del self._loading[key]
+                    self._changed.pop(key, None)
+                if current and value is not MISSING and not (skip and skip(value)):
+                    self._store(key, stored, ttl)
+        return value
+
+    def pop(self, key):
+        """Drop key from the cache if present"""
+        with self._lock:
+            self._mark_changed(key)
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._seq += 1
+            self._cleared = self._seq
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
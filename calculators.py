@@ -0,0 +1,336 @@
+import math
+from datetime import datetime
+from fractions import Fraction
+
+import numpy as np
+
+# Upper bound on subjects accepted by one batch attendance request
+MAX_BATCH_SUBJECTS = 100
+
+# CGPA is on a 10-point scale
+MAX_SGPA = 10.0
+
+# Upper bound on hypothetical scenarios evaluated by one planning request
+MAX_SCENARIOS = 100000
+
+
+def _percent(value):
+    """Parse a percentage exactly, so 75.5 means 151/2 rather than a binary float"""
+    try:
+        percent = Fraction(str(float(value)))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('Minimum required attendance must be a number')
+    if not 0 < percent <= 100:
+        raise ValueError('Minimum required attendance must be between 0 and 100')
+    return percent
+
+
+def classes_needed(attended, total, min_required):
+    """Consecutive classes to attend before attendance reaches min_required percent
+
+    Solves 100 * (attended + x) >= p * (total + x) for the smallest integer x.
+    Returns None when the target can never be reached (p == 100 after a miss).
+    """
+    p = _percent(min_required)
+    shortfall = p * total - 100 * attended
+    if shortfall <= 0:
+        return 0
+    if p == 100:
+        return None
+    return math.ceil(shortfall / (100 - p))
+
+
+def classes_skippable(attended, total, min_required):
+    """Classes that can be missed while attendance stays at or above min_required percent
+
+    Solves 100 * attended >= p * (total + y) for the largest integer y.
+    """
+    p = _percent(min_required)
+    surplus = 100 * attended - p * total
+    if surplus <= 0:
+        return 0
+    return math.floor(surplus / p)
+
+
+def classes_skippable_within(attended, total, upcoming, min_required):
+    """Most of the next upcoming classes that can be missed with attendance at min_required percent after them
+
+    Solves 100 * (attended + upcoming - y) >= p * (total + upcoming) for the
+    largest integer 0 <= y <= upcoming.  Returns None when attendance falls
+    short even if every one of them is attended.
+    """
+    p = _percent(min_required)
+    surplus = 100 * (attended + upcoming) - p * (total + upcoming)
+    if surplus < 0:
+        return None
+    return min(upcoming, math.floor(surplus / 100))
+
+
+def attendance_result(attended, total, min_required=75, subject_name='Subject'):
+    """Validate one subject's attendance and build the API result; raises ValueError on bad input"""
+    try:
+        attended = int(attended)
+        total = int(total)
+    except (TypeError, ValueError):
+        raise ValueError('Attended and total classes must be whole numbers')
+    min_required = float(_percent(min_required))
+
+    if total <= 0:
+        raise ValueError('Total classes must be greater than 0')
+    if attended < 0:
+        raise ValueError('Attended classes cannot be negative')
+    if attended > total:
+        raise ValueError('Attended classes cannot exceed total classes')
+
+    current_percent = (attended / total) * 100
+    status = 'safe' if 100 * attended >= _percent(min_required) * total else 'at_risk'
+    future_classes = classes_needed(attended, total, min_required)
+    can_skip = classes_skippable(attended, total, min_required)
+
+    message = f"Your attendance is {'above' if status == 'safe' else 'below'} the required {min_required}%"
+    if status == 'safe':
+        recommendation = f"You can skip up to {can_skip} classes and still maintain {min_required}% attendance." if can_skip > 0 else "Keep maintaining your good attendance!"
+    elif future_classes is None:
+        recommendation = f"{min_required}% attendance can no longer be reached; attend every remaining class to stay as close as possible."
+    else:
+        recommendation = f"You need to attend the next {future_classes} classes consecutively to reach {min_required}% attendance."
+
+    return {
+        'current_percent': round(current_percent, 2),
+        'attended': attended,
+        'total': total,
+        'min_required': min_required,
+        'status': status,
+        'message': message,
+        'recommendation': recommendation,
+        'future_classes': future_classes,
+        'can_skip': can_skip,
+        'subject_name': subject_name,
+        'calculated_at': datetime.now().isoformat()
+    }
+
+
+def attendance_batch(subjects, min_required=75):
+    """Evaluate several subjects and an aggregate over all of them
+
+    Each subject may override min_required.  Raises ValueError naming the
+    first invalid subject.
+    """
+    if not subjects:
+        raise ValueError('No subjects provided')
+    if len(subjects) > MAX_BATCH_SUBJECTS:
+        raise ValueError(f'At most {MAX_BATCH_SUBJECTS} subjects can be calculated at once')
+
+    results = []
+    for i, subject in enumerate(subjects):
+        try:
+            results.append(attendance_result(
+                subject.get('attended', 0),
+                subject.get('total', 0),
+                subject.get('min_required', min_required),
+                subject.get('subject_name') or f'Subject {i + 1}'
+            ))
+        except (TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f'Subject {i + 1}: {e}')
+
+    aggregate = attendance_result(
+        sum(r['attended'] for r in results),
+        sum(r['total'] for r in results),
+        min_required,
+        'All subjects'
+    )
+    aggregate['subject_count'] = len(results)
+    aggregate['at_risk_count'] = sum(1 for r in results if r['status'] == 'at_risk')
+    aggregate['at_risk_subjects'] = [r['subject_name'] for r in results if r['status'] == 'at_risk']
+
+    return {
+        'subjects': results,
+        'aggregate': aggregate,
+        'calculated_at': datetime.now().isoformat()
+    }
+
+
+def semester_arrays(semesters):
+    """Validate semester rows into (positions, sgpa, credits) arrays
+
+    Rows with a non-positive SGPA or credit count are skipped, as the
+    calculator always has; positions are the 0-based indexes of the rows
+    that were kept.
+    """
+    if not isinstance(semesters, list):
+        raise ValueError('Semesters must be a list')
+    try:
+        values = np.array(
+            [(float(s.get('sgpa', 0)), float(s.get('credits', 0))) for s in semesters],
+            dtype=float
+        ).reshape(-1, 2)
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError('SGPA and credits must be numbers')
+    if not np.isfinite(values).all():
+        raise ValueError('SGPA and credits must be finite numbers')
+
+    sgpa, credits = values[:, 0], values[:, 1]
+    if (sgpa > MAX_SGPA).any():
+        raise ValueError(f'SGPA cannot exceed {MAX_SGPA:g}')
+    positions = np.flatnonzero((sgpa > 0) & (credits > 0))
+    return positions, sgpa[positions], credits[positions]
+
+
+def scale_conversions(cgpa):
+    """Convert CGPA (scalar or array) to the 4-point and 5-point scales"""
+    return np.maximum(0, ((cgpa - 5) * 4) / 5), cgpa / 2
+
+
+def cgpa_result(semesters):
+    """Compute CGPA from semester rows and build the API result; raises ValueError on bad input"""
+    positions, sgpa, credits = semester_arrays(semesters)
+    if positions.size == 0:
+        raise ValueError('No valid semester data found')
+
+    grade_points = sgpa * credits
+    total_credits = float(credits.sum())
+    total_grade_points = float(grade_points.sum())
+    cgpa = total_grade_points / total_credits
+    gpa_4_scale, gpa_5_scale = scale_conversions(cgpa)
+
+    return {
+        'cgpa': round(cgpa, 2),
+        'gpa_4_scale': round(float(gpa_4_scale), 2),
+        'gpa_5_scale': round(float(gpa_5_scale), 2),
+        'total_credits': total_credits,
+        'total_grade_points': round(total_grade_points, 2),
+        'semesters': [{
+            'semester': f"Semester {i + 1}",
+            'sgpa': s,
+            'credits': c,
+            'grade_points': g
+        } for i, s, c, g in zip(positions.tolist(), sgpa.tolist(), credits.tolist(), grade_points.tolist())],
+        'calculated_at': datetime.now().isoformat()
+    }
+
+
+def _credit_vector(remaining_credits):
+    try:
+        credits = np.asarray(remaining_credits, dtype=float).reshape(-1)
+    except (TypeError, ValueError):
+        raise ValueError('Remaining credits must be a list of numbers')
+    if credits.size == 0 or not np.isfinite(credits).all() or (credits <= 0).any():
+        raise ValueError('Remaining credits must be positive numbers')
+    return credits
+
+
+def _linspace(spec, name, upper=None):
+    """Expand {'start', 'stop', 'step'} (stop inclusive) or an explicit list into an array"""
+    if isinstance(spec, dict):
+        try:
+            start, stop, step = float(spec['start']), float(spec['stop']), float(spec.get('step', 0.1))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'{name} range needs numeric start, stop and step')
+        if step <= 0 or stop < start:
+            raise ValueError(f'{name} range needs step > 0 and stop >= start')
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        if count > MAX_SCENARIOS:
+            raise ValueError(f'At most {MAX_SCENARIOS} scenarios can be evaluated at once')
+        values = start + step * np.arange(count)
+    else:
+        try:
+            values = np.asarray(spec, dtype=float).reshape(-1)
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} must be a list of numbers or a start/stop/step range')
+    if values.size == 0 or not np.isfinite(values).all() or (values < 0).any():
+        raise ValueError(f'{name} values must be non-negative numbers')
+    if upper is not None and (values > upper).any():
+        raise ValueError(f'{name} values cannot exceed {upper:g}')
+    return values
+
+
+def cgpa_plan(semesters, target_cgpa=None, remaining_credits=None, scenarios=None, grid=None):
+    """Plan future semesters on top of the completed ones
+
+    target_cgpa with remaining_credits answers "what SGPA do I need in each
+    remaining semester".  scenarios is an n x k matrix of hypothetical SGPAs
+    for the k remaining semesters; grid crosses a range of next-semester
+    SGPAs with a range of credit loads.  Both are evaluated as single array
+    expressions rather than one Python iteration per scenario.
+    """
+    _, sgpa, credits = semester_arrays(semesters or [])
+    done_points = float((sgpa * credits).sum())
+    done_credits = float(credits.sum())
+    current = done_points / done_credits if done_credits else None
+
+    plan = {
+        'current_cgpa': round(current, 2) if current is not None else None,
+        'completed_credits': done_credits
+    }
+
+    if target_cgpa is not None or scenarios is not None:
+        if remaining_credits is None:
+            raise ValueError('remaining_credits is required for target and scenario planning')
+        remaining = _credit_vector(remaining_credits)
+        total_credits = done_credits + remaining.sum()
+
+    if target_cgpa is not None:
+        try:
+            target = float(target_cgpa)
+        except (TypeError, ValueError):
+            raise ValueError('Target CGPA must be a number')
+        if not 0 < target <= MAX_SGPA:
+            raise ValueError(f'Target CGPA must be between 0 and {MAX_SGPA:g}')
+        required = (target * total_credits - done_points) / remaining.sum()
+        plan['target'] = {
+            'target_cgpa': target,
+            'remaining_semesters': int(remaining.size),
+            'remaining_credits': remaining.tolist(),
+            'required_sgpa': round(float(max(required, 0.0)), 2),
+            'achievable': bool(required <= MAX_SGPA),
+            'already_secured': bool(required <= 0),
+            'max_cgpa': round(float((done_points + MAX_SGPA * remaining.sum()) / total_credits), 2),
+            'min_cgpa': round(float(done_points / total_credits), 2)
+        }
+
+    if scenarios is not None:
+        try:
+            matrix = np.asarray(scenarios, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError('Scenarios must be a list of SGPA lists')
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(-1, 1)
+        if matrix.ndim != 2 or matrix.shape[1] != remaining.size:
+            raise ValueError('Each scenario needs one SGPA per remaining semester')
+        if matrix.shape[0] > MAX_SCENARIOS:
+            raise ValueError(f'At most {MAX_SCENARIOS} scenarios can be evaluated at once')
+        if not np.isfinite(matrix).all() or (matrix < 0).any() or (matrix > MAX_SGPA).any():
+            raise ValueError(f'Scenario SGPAs must be between 0 and {MAX_SGPA:g}')
+        outcomes = (done_points + matrix @ remaining) / total_credits
+        plan['scenarios'] = _summarise(outcomes, target_cgpa)
+
+    if grid is not None:
+        if not isinstance(grid, dict):
+            raise ValueError('Grid must be an object with sgpa and credits ranges')
+        grid_sgpa = _linspace(grid.get('sgpa', {'start': 5, 'stop': MAX_SGPA, 'step': 0.5}), 'Grid SGPA', MAX_SGPA)
+        grid_credits = _linspace(grid.get('credits', [20]), 'Grid credits')
+        if grid_sgpa.size * grid_credits.size > MAX_SCENARIOS:
+            raise ValueError(f'At most {MAX_SCENARIOS} scenarios can be evaluated at once')
+        if (grid_credits == 0).any() and done_credits == 0:
+            raise ValueError('Grid credits must be positive when no semesters are completed')
+        # Rows are credit loads, columns are SGPAs
+        outcomes = (done_points + np.outer(grid_credits, grid_sgpa)) / (done_credits + grid_credits)[:, None]
+        plan['grid'] = {
+            'sgpa': np.round(grid_sgpa, 4).tolist(),
+            'credits': np.round(grid_credits, 4).tolist(),
+            **_summarise(outcomes, target_cgpa)
+        }
+
+    return plan
+
+
+def _summarise(outcomes, target_cgpa=None):
+    summary = {
+        'cgpa': np.round(outcomes, 2).tolist(),
+        'count': int(outcomes.size),
+        'min_cgpa': round(float(outcomes.min()), 2),
+        'max_cgpa': round(float(outcomes.max()), 2)
+    }
+    if target_cgpa is not None:
+        summary['meeting_target'] = int((outcomes >= float(target_cgpa)).sum())
+    return summary
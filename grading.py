@@ -0,0 +1,270 @@
+import re
+from datetime import datetime
+
+import numpy as np
+
+from calculators import scale_conversions
+
+# Grade points per letter grade for each supported university.  A grade
+# mapped to None earns no credit and is left out of both sums (withdrawals).
+GRADE_SCALES = {
+    'ktu': {
+        'name': 'APJ Abdul Kalam Technological University',
+        'max_points': 10,
+        'grades': {'S': 10, 'A+': 9, 'A': 8.5, 'B+': 8, 'B': 7.5, 'C+': 7, 'C': 6.5, 'D': 6, 'P': 5.5,
+                   'F': 0, 'FE': 0, 'I': 0}
+    },
+    'ugc': {
+        'name': 'UGC Choice Based Credit System',
+        'max_points': 10,
+        'grades': {'O': 10, 'A+': 9, 'A': 8, 'B+': 7, 'B': 6, 'C': 5, 'P': 4, 'F': 0, 'AB': 0}
+    },
+    'us4': {
+        'name': 'US 4-point scale',
+        'max_points': 4,
+        'grades': {'A+': 4.0, 'A': 4.0, 'A-': 3.7, 'B+': 3.3, 'B': 3.0, 'B-': 2.7, 'C+': 2.3, 'C': 2.0,
+                   'C-': 1.7, 'D+': 1.3, 'D': 1.0, 'F': 0, 'W': None}
+    },
+}
+DEFAULT_SCALE = 'ktu'
+
+MAX_SEMESTERS = 20
+MAX_COURSES = 2000
+MAX_COURSE_CREDITS = 50
+MAX_FIELD_LENGTH = 200
+
+_COURSE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class GradeScale:
+    """One grade table compiled into lookup arrays
+
+    Letter grades map to positions in `points` / `counted`, so a whole
+    transcript is scored with one fancy-index instead of a dict lookup and
+    branch per course.
+    """
+
+    def __init__(self, key, name, max_points, grades):
+        self.key = key
+        self.name = name
+        self.max_points = max_points
+        self.codes = tuple(grades)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.points = np.array([points or 0 for points in grades.values()], dtype=float)
+        self.counted = np.array([points is not None for points in grades.values()])
+
+    def position(self, grade):
+        """Table position of a letter grade; raises ValueError for grades the scale does not have"""
+        code = str(grade).strip().upper() if grade is not None else ''
+        if code not in self.index:
+            raise ValueError(f"Unknown grade '{grade}' for {self.name}, expected one of {', '.join(self.codes)}")
+        return self.index[code]
+
+    def contribution(self, credits, grade):
+        """(credit x points, counted credits) one course adds to its semester"""
+        i = self.position(grade)
+        if not self.counted[i]:
+            return 0.0, 0.0
+        return credits * float(self.points[i]), credits
+
+    def describe(self):
+        return {
+            'scale': self.key,
+            'name': self.name,
+            'max_points': self.max_points,
+            'grades': [{'grade': code, 'points': float(points) if counted else None}
+                       for code, points, counted in zip(self.codes, self.points.tolist(), self.counted.tolist())]
+        }
+
+
+SCALES = {key: GradeScale(key, **spec) for key, spec in GRADE_SCALES.items()}
+
+
+def get_scale(key=None):
+    key = (key or DEFAULT_SCALE).lower()
+    if key not in SCALES:
+        raise ValueError(f"Unknown grade scale '{key}', expected one of {', '.join(SCALES)}")
+    return SCALES[key]
+
+
+def validate_course(course, scale):
+    """Cleaned {'course', 'credits', 'grade'}; raises ValueError on bad input"""
+    if not isinstance(course, dict):
+        raise ValueError('Course details must be an object')
+    name = course.get('course') or ''
+    if not isinstance(name, str) or len(name) > MAX_FIELD_LENGTH:
+        raise ValueError(f'course must be text of at most {MAX_FIELD_LENGTH} characters')
+    try:
+        credits = float(course.get('credits'))
+    except (TypeError, ValueError):
+        raise ValueError('credits must be a number')
+    if not 0 < credits <= MAX_COURSE_CREDITS:
+        raise ValueError(f'credits must be between 0 and {MAX_COURSE_CREDITS}')
+    grade = scale.codes[scale.position(course.get('grade'))]
+    return {'course': name.strip(), 'credits': credits, 'grade': grade}
+
+
+def course_arrays(semesters, scale):
+    """Validate a transcript into (semester index, credits, grade position) arrays, one entry per course"""
+    if not isinstance(semesters, list) or not semesters:
+        raise ValueError('Semesters must be a non-empty list')
+    if len(semesters) > MAX_SEMESTERS:
+        raise ValueError(f'At most {MAX_SEMESTERS} semesters are supported')
+    rows = []
+    for s, semester in enumerate(semesters):
+        courses = semester.get('courses') if isinstance(semester, dict) else None
+        if not isinstance(courses, list):
+            raise ValueError(f'Semester {s + 1}: courses must be a list')
+        for c, course in enumerate(courses):
+            try:
+                cleaned = validate_course(course, scale)
+            except ValueError as e:
+                raise ValueError(f'Semester {s + 1}, course {c + 1}: {e}')
+            rows.append((s, cleaned['credits'], scale.index[cleaned['grade']]))
+    if len(rows) > MAX_COURSES:
+        raise ValueError(f'At most {MAX_COURSES} courses can be calculated at once')
+    if not rows:
+        raise ValueError('No courses provided')
+    semester_index, credits, positions = zip(*rows)
+    return np.array(semester_index), np.array(credits, dtype=float), np.array(positions)
+
+
+def semester_sums(semesters, scale):
+    """Per-semester (credit x points, counted credits) arrays for a whole transcript"""
+    semester_index, credits, positions = course_arrays(semesters, scale)
+    counted = scale.counted[positions]
+    weighted = np.where(counted, credits * scale.points[positions], 0.0)
+    counted_credits = np.where(counted, credits, 0.0)
+    size = len(semesters)
+    return (np.bincount(semester_index, weights=weighted, minlength=size),
+            np.bincount(semester_index, weights=counted_credits, minlength=size))
+
+
+def _ratio(points, credits):
+    return points / credits if credits else None
+
+
+def _summary(scale, semester_rows, total_points, total_credits):
+    cgpa = _ratio(total_points, total_credits)
+    result = {
+        'scale': scale.key,
+        'max_points': scale.max_points,
+        'cgpa': round(cgpa, 2) if cgpa is not None else None,
+        'total_credits': total_credits,
+        'total_grade_points': round(total_points, 2),
+        'semesters': semester_rows
+    }
+    if cgpa is not None and scale.max_points == 10:
+        gpa_4_scale, gpa_5_scale = scale_conversions(cgpa)
+        result['gpa_4_scale'] = round(float(gpa_4_scale), 2)
+        result['gpa_5_scale'] = round(float(gpa_5_scale), 2)
+    return result
+
+
+def transcript_result(semesters, scale_key=None):
+    """SGPA per semester and CGPA for a full course-level transcript, in one pass"""
+    scale = get_scale(scale_key)
+    points, credits = semester_sums(semesters, scale)
+    rows = []
+    for i, (semester_points, semester_credits) in enumerate(zip(points.tolist(), credits.tolist())):
+        sgpa = _ratio(semester_points, semester_credits)
+        rows.append({
+            'semester': semesters[i].get('semester') or f'Semester {i + 1}',
+            'sgpa': round(sgpa, 2) if sgpa is not None else None,
+            'credits': semester_credits,
+            'grade_points': round(semester_points, 2),
+            'courses': len(semesters[i]['courses'])
+        })
+    result = _summary(scale, rows, float(points.sum()), float(credits.sum()))
+    result['calculated_at'] = datetime.now().isoformat()
+    return result
+
+
+# Stored transcripts keep running sums next to the courses so one course
+# change is applied as a delta: data = {'scale', 'totals', 'semester_<n>'}
+# with totals and each semester holding {'grade_points', 'credits'}.
+
+def semester_key(number):
+    if not isinstance(number, int) or not 1 <= number <= MAX_SEMESTERS:
+        raise ValueError(f'Semester must be between 1 and {MAX_SEMESTERS}')
+    return f'semester_{number}'
+
+
+def check_course_id(course_id):
+    if not _COURSE_ID_RE.match(course_id or ''):
+        raise ValueError('Course id must be 1-64 letters, digits, "-" or "_"')
+    return course_id
+
+
+def _tidy(value):
+    # Keeps repeated add/subtract from accumulating float noise
+    return round(value, 9)
+
+
+def build_transcript(semesters, scale_key=None):
+    """Stored form of a full transcript, with its running sums computed in one pass"""
+    scale = get_scale(scale_key)
+    points, credits = semester_sums(semesters, scale)
+    data = {'scale': scale.key, 'totals': {'grade_points': _tidy(float(points.sum())), 'credits': _tidy(float(credits.sum()))}}
+    for i, semester in enumerate(semesters):
+        courses = {}
+        for c, course in enumerate(semester['courses']):
+            course_id = check_course_id(str(course.get('id') or f'c{c + 1}'))
+            if course_id in courses:
+                raise ValueError(f"Semester {i + 1}: duplicate course id '{course_id}'")
+            courses[course_id] = validate_course(course, scale)
+        data[semester_key(i + 1)] = {
+            'courses': courses,
+            'grade_points': _tidy(float(points[i])),
+            'credits': _tidy(float(credits[i]))
+        }
+    return data
+
+
+def apply_course_change(scale, semester, totals, course_id, course):
+    """Set (or with course=None, remove) one course and adjust the semester and total sums in O(1)
+
+    Returns the new (semester, totals).  Raises KeyError when removing a course that does not exist.
+    """
+    semester = dict(semester or {'courses': {}, 'grade_points': 0.0, 'credits': 0.0})
+    semester['courses'] = dict(semester.get('courses') or {})
+    totals = dict(totals or {'grade_points': 0.0, 'credits': 0.0})
+
+    delta_points = delta_credits = 0.0
+    previous = semester['courses'].pop(course_id, None)
+    if previous is not None:
+        points, credits = scale.contribution(previous['credits'], previous['grade'])
+        delta_points, delta_credits = -points, -credits
+    elif course is None:
+        raise KeyError(course_id)
+    if course is not None:
+        course = validate_course(course, scale)
+        points, credits = scale.contribution(course['credits'], course['grade'])
+        delta_points += points
+        delta_credits += credits
+        semester['courses'][course_id] = course
+
+    for sums in (semester, totals):
+        sums['grade_points'] = _tidy(sums.get('grade_points', 0.0) + delta_points)
+        sums['credits'] = _tidy(sums.get('credits', 0.0) + delta_credits)
+    return semester, totals
+
+
+def transcript_summary(data):
+    """SGPA/CGPA of a stored transcript straight from its running sums"""
+    scale = get_scale((data or {}).get('scale'))
+    numbers = sorted(int(key.split('_', 1)[1]) for key in (data or {}) if key.startswith('semester_'))
+    rows = []
+    for number in numbers:
+        semester = data[semester_key(number)]
+        sgpa = _ratio(semester.get('grade_points', 0.0), semester.get('credits', 0.0))
+        rows.append({
+            'semester': f'Semester {number}',
+            'number': number,
+            'sgpa': round(sgpa, 2) if sgpa is not None else None,
+            'credits': semester.get('credits', 0.0),
+            'grade_points': round(semester.get('grade_points', 0.0), 2),
+            'courses': [dict(course, id=course_id) for course_id, course in (semester.get('courses') or {}).items()]
+        })
+    totals = (data or {}).get('totals') or {}
+    return _summary(scale, rows, totals.get('grade_points', 0.0), totals.get('credits', 0.0))
@@ -0,0 +1,32 @@
+"""Gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+
+Serve the `app` that app.py builds on import; 'app:create_app()' would build
+a second one in every worker.
+
+WORKER_CLASS=gevent serves each request on a greenlet instead of an OS
+thread, so a worker blocked on Firestore round trips can hold thousands of
+open requests (needs `pip install gevent`).  The default gthread worker
+keeps one thread per in-flight request.
+
+One worker process by default: caches and rate limits live in the process,
+so scale with WORKER_THREADS or gevent first.  WEB_CONCURRENCY > 1 runs more
+workers; the app then revalidates cached documents against storage (see
+CACHE_REVALIDATE in the README).
+"""
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+threads = int(os.getenv('WORKER_THREADS', '8'))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '1000'))
+timeout = int(os.getenv('WORKER_TIMEOUT', '30'))
+# Workers create their own storage clients on first use, so preloading is fork-safe
+preload_app = True
+
+
+def post_worker_init(worker):
+    if worker_class == 'gevent':
+        # Let gRPC (Firestore) yield to the gevent hub instead of blocking the worker
+        import grpc.experimental.gevent
+        grpc.experimental.gevent.init_gevent()
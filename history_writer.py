@@ -0,0 +1,191 @@
+import logging
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """Write-behind queue for calculation history records
+
+    In 'async' mode submit() only enqueues the record and returns; a single
+    background thread drains the queue, coalesces records per (username,
+    calc_type) and hands each group to write_batch in one call.  In 'sync'
+    mode submit() writes inline, which is what the app did before.
+
+    When the queue is full the overflow policy decides what happens:
+    'sync' writes the record on the caller's thread, 'block' waits up to
+    block_timeout for room and then drops, 'drop' discards the record
+    immediately.  Every outcome is counted in stats().
+    """
+
+    MODES = ('async', 'sync')
+    OVERFLOW_POLICIES = ('sync', 'block', 'drop')
+
+    def __init__(self, write_batch, mode='async', maxsize=1000, batch_size=100,
+                 overflow='sync', block_timeout=1.0, on_written=None, on_failed=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown history write mode '{mode}', expected one of {', '.join(self.MODES)}")
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {', '.join(self.OVERFLOW_POLICIES)}")
+        self.write_batch = write_batch
+        self.mode = mode
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.on_written = on_written
+        self.on_failed = on_failed
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._closed = False
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+        self.counters = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed': 0,
+            'dropped': 0,
+            'sync_writes': 0,
+            'max_depth': 0
+        }
+
+    def submit(self, username, calc_type, record):
+        """Persist one record, in the background when running in async mode"""
+        if self.mode == 'sync' or self._closed:
+            self._write_inline(username, calc_type, [record])
+            return True
+        self._ensure_started()
+        return self._enqueue((username, calc_type, record))
+
+    def submit_many(self, username, calc_type, records):
+        """Persist several records for one user, coalesced into one batch"""
+        if not records:
+            return True
+        if self.mode == 'sync' or self._closed:
+            self._write_inline(username, calc_type, records)
+            return True
+        self._ensure_started()
+        return all([self._enqueue((username, calc_type, record)) for record in records])
+
+    def _enqueue(self, item):
+        with self._lock:
+            self._pending += 1
+        try:
+            if self.overflow == 'block':
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            self._done(1)
+            if self.overflow == 'sync':
+                self._write_inline(item[0], item[1], [item[2]])
+                return True
+            with self._lock:
+                self.counters['dropped'] += 1
+            logger.warning('History queue full, dropped record', extra={'username': item[0], 'calc_type': item[1]})
+            return False
+        with self._lock:
+            self.counters['enqueued'] += 1
+            self.counters['max_depth'] = max(self.counters['max_depth'], self._queue.qsize())
+        return True
+
+    def _write_inline(self, username, calc_type, records):
+        with self._lock:
+            self.counters['sync_writes'] += len(records)
+        self._write_group(username, calc_type, records)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                    self._thread.start()
+
+    def _reset_after_fork(self):
+        # The worker thread does not survive a fork and the parent's queue and
+        # locks may be mid-use; records queued in the parent stay the parent's
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            groups = OrderedDict()
+            for username, calc_type, record in batch:
+                groups.setdefault((username, calc_type), []).append(record)
+            for (username, calc_type), records in groups.items():
+                self._write_group(username, calc_type, records)
+            self._done(len(batch))
+
+    def _write_group(self, username, calc_type, records):
+        try:
+            self.write_batch(username, calc_type, records)
+        except Exception as e:
+            with self._lock:
+                self.counters['failed'] += len(records)
+            logger.error('Error writing history records: %s', e,
+                         extra={'username': username, 'calc_type': calc_type, 'records': len(records)})
+            if self.on_failed:
+                self.on_failed(username, calc_type, records)
+            return
+        with self._lock:
+            self.counters['written'] += len(records)
+            self.counters['batches'] += 1
+        if self.on_written:
+            self.on_written(username, calc_type, records)
+
+    def _done(self, count):
+        with self._lock:
+            self._pending -= count
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every queued record has been written; return False on timeout"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout=timeout)
+
+    def close(self, timeout=10.0):
+        """Flush outstanding records and stop the worker thread"""
+        self._closed = True
+        if self._thread is None:
+            return True
+        flushed = self.flush(timeout)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        return flushed
+
+    def stats(self):
+        """Return queue depth and write counters"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending'] = self._pending
+        stats['mode'] = self.mode
+        stats['depth'] = self._queue.qsize()
+        stats['maxsize'] = self._queue.maxsize
+        return stats
@@ -0,0 +1,208 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+from importlib.metadata import version
+
+Holiday = namedtuple('Holiday', 'date name type description')
+
+# Type and description for holiday names reported by the holidays package
+HOLIDAY_DETAILS = {
+    "new year's day": ('national', 'The first day of the Gregorian calendar year, celebrated worldwide.'),
+    'makar sankranti / pongal': ('religious', 'Hindu festival marking the transition of the sun into Capricorn.'),
+    'republic day': ('national', 'Commemorates the adoption of the Constitution of India.'),
+    'maha shivaratri': ('religious', 'Hindu festival dedicated to Lord Shiva.'),
+    'holi': ('festival', 'Festival of colors, celebrating the arrival of spring.'),
+    'eid ul-fitr': ('religious', 'Islamic festival marking the end of the holy month of Ramadan.'),
+    'palm sunday': ('religious', 'Christian feast commemorating the entry of Jesus into Jerusalem.'),
+    "dr. b. r. ambedkar's jayanti": ('national', 'Birth anniversary of Dr. B. R. Ambedkar, architect of the Indian Constitution.'),
+    'good friday': ('religious', 'Christian observance of the crucifixion of Jesus Christ.'),
+    'easter sunday': ('religious', 'Christian festival celebrating the resurrection of Jesus Christ.'),
+    'labour day': ('national', 'International Workers Day, celebrating laborers and the working class.'),
+    'eid al-adha': ('religious', 'Islamic festival of sacrifice, honouring the devotion of Ibrahim.'),
+    'feast of pentecost': ('religious', 'Christian feast marking the descent of the Holy Spirit.'),
+    'day of ashura': ('religious', 'Islamic day of remembrance observed on the tenth of Muharram.'),
+    'independence day': ('national', 'Commemorates Indias independence from British rule in 1947.'),
+    'mawlid': ('religious', 'Celebration of the birth of the Prophet Muhammad.'),
+    'gandhi jayanti': ('national', 'Birthday of Mahatma Gandhi, the Father of the Nation.'),
+    'diwali': ('festival', 'Festival of lights, one of the most important Hindu festivals.'),
+    'kerala foundation day': ('state', 'Kerala Piravi, marking the formation of the state of Kerala in 1956.'),
+    'christmas day': ('religious', 'Christian festival celebrating the birth of Jesus Christ.'),
+}
+
+# Holidays observed on the same date every year that the holidays package does not list
+RECURRING_HOLIDAYS = [
+    (1, 1, "New Year's Day"),
+]
+
+# Locally curated dates, keyed by year.  An override replaces any package
+# holiday with the same name (or the part of it before ' / ') that year.
+HOLIDAY_OVERRIDES = {
+    2025: [
+        {'date': '2025-01-14', 'name': 'Makar Sankranti', 'type': 'religious', 'description': 'Hindu festival marking the transition of the sun into Capricorn.'},
+        {'date': '2025-02-26', 'name': 'Maha Shivratri', 'type': 'religious', 'description': 'Hindu festival dedicated to Lord Shiva.'},
+        {'date': '2025-03-13', 'name': 'Holi', 'type': 'festival', 'description': 'Festival of colors, celebrating the arrival of spring.'},
+        {'date': '2025-04-13', 'name': 'Vishu', 'type': 'state', 'description': 'Malayalam New Year, celebrated with traditional rituals and feasts.'},
+        {'date': '2025-09-05', 'name': 'Onam (Thiruvonam)', 'type': 'state', 'description': 'Keralas most important festival, celebrating King Mahabalis return.'},
+        {'date': '2025-11-09', 'name': 'Diwali', 'type': 'festival', 'description': 'Festival of lights, one of the most important Hindu festivals.'},
+    ],
+}
+
+DEFAULT_TYPE = 'festival'
+
+# Changes whenever the rendered calendar could change, for response ETags
+CALENDAR_VERSION = version('holidays')
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_ESTIMATED_RE = re.compile(r'\*.*$')
+
+
+def _normalise_name(name):
+    """Strip the package's '* (*estimated)' suffix"""
+    return _ESTIMATED_RE.sub('', name).strip()
+
+
+def _name_keys(name):
+    key = name.lower()
+    return {key, key.split(' / ')[0]}
+
+
+def _tokens(text):
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+class HolidayIndex:
+    """Sorted, pre-parsed holidays for one calendar year
+
+    Dates are stored as ordinals next to the entries so month ranges and
+    "next holiday" lookups are bisects; type filters use a prebuilt
+    type -> positions map and search uses a sorted lowercase token list,
+    matching every query word as a token prefix.
+    """
+
+    def __init__(self, entries):
+        self.entries = tuple(sorted(entries, key=lambda h: (h.date, h.name)))
+        self.ordinals = [h.date.toordinal() for h in self.entries]
+        self.by_type = {}
+        token_positions = {}
+        for i, holiday in enumerate(self.entries):
+            self.by_type.setdefault(holiday.type, []).append(i)
+            for token in _tokens(f'{holiday.name} {holiday.description}'):
+                token_positions.setdefault(token, set()).add(i)
+        self.tokens = sorted(token_positions)
+        self._token_positions = [frozenset(token_positions[t]) for t in self.tokens]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def range(self, start, end):
+        """Positions of holidays with start <= date <= end"""
+        return range(bisect_left(self.ordinals, start.toordinal()), bisect_right(self.ordinals, end.toordinal()))
+
+    def month(self, year, month):
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        return self.range(date(year, month, 1), date.fromordinal(end.toordinal() - 1))
+
+    def search(self, text):
+        """Positions whose name or description has a token starting with every query word"""
+        matches = None
+        for word in _tokens(text):
+            lo = bisect_left(self.tokens, word)
+            hi = bisect_left(self.tokens, word + '\uffff', lo)
+            found = set()
+            for positions in self._token_positions[lo:hi]:
+                found |= positions
+            matches = found if matches is None else matches & found
+            if not matches:
+                return set()
+        return matches if matches is not None else set(range(len(self.entries)))
+
+    def upcoming(self, today):
+        """Position of the first holiday on or after today"""
+        return bisect_left(self.ordinals, today.toordinal())
+
+    def query(self, year, month=None, holiday_type=None, search=None):
+        """Holidays matching every given filter, in date order"""
+        positions = self.month(year, month) if month else range(len(self.entries))
+        if holiday_type:
+            wanted = set(self.by_type.get(holiday_type, ()))
+            positions = [i for i in positions if i in wanted]
+        if search:
+            wanted = self.search(search)
+            positions = [i for i in positions if i in wanted]
+        return [self.entries[i] for i in positions]
+
+
+def _holiday(day, name):
+    holiday_type, description = HOLIDAY_DETAILS.get(name.lower(), (DEFAULT_TYPE, ''))
+    return Holiday(day, name, holiday_type, description)
+
+
+def build_entries(year, country='IN', subdiv='KL'):
+    """Merge the holidays package calendar with local overrides for one year"""
+    import holidays  # Large; only loaded once a calendar is first requested
+
+    calendar = holidays.country_holidays(country, subdiv=subdiv, years=year)
+    entries = [_holiday(day, _normalise_name(name)) for day, name in calendar.items()]
+
+    names = {h.name.lower() for h in entries}
+    for month, day, name in RECURRING_HOLIDAYS:
+        if name.lower() not in names:
+            entries.append(_holiday(date(year, month, day), name))
+
+    for override in HOLIDAY_OVERRIDES.get(year, []):
+        keys = _name_keys(override['name'])
+        entries = [h for h in entries if not _name_keys(h.name) & keys]
+        entries.append(Holiday(
+            date.fromisoformat(override['date']),
+            override['name'],
+            override.get('type', DEFAULT_TYPE),
+            override.get('description', '')
+        ))
+    return entries
+
+
+@lru_cache(maxsize=32)
+def get_holiday_index(year, country='IN', subdiv='KL'):
+    """Return the index for one (country, subdivision, year), building it on first use"""
+    return HolidayIndex(build_entries(year, country, subdiv))
+
+
+def holiday_status(holiday, today):
+    """Render one holiday with its status and countdown relative to today"""
+    diff_days = (holiday.date - today).days
+    if diff_days == 0:
+        status, countdown = 'today', 'Today!'
+    elif diff_days < 0:
+        status, countdown = 'past', ''
+    else:
+        status = 'upcoming'
+        countdown = 'Tomorrow' if diff_days == 1 else f'In {diff_days} days'
+    return {
+        'date': holiday.date.isoformat(),
+        'name': holiday.name,
+        'type': holiday.type,
+        'description': holiday.description,
+        'status': status,
+        'countdown': countdown
+    }
+
+
+@lru_cache(maxsize=256)
+def list_holidays(year, month, holiday_type, search, today, country='IN', subdiv='KL'):
+    """Rendered holiday list; today is part of the key so entries roll over daily"""
+    index = get_holiday_index(year, country, subdiv)
+    return tuple(holiday_status(h, today) for h in index.query(year, month, holiday_type, search))
+
+
+def upcoming_holidays(today, limit=5, country='IN', subdiv='KL'):
+    """The next limit holidays on or after today, looking into next year if needed"""
+    upcoming = []
+    for year in (today.year, today.year + 1):
+        index = get_holiday_index(year, country, subdiv)
+        start = index.upcoming(today)
+        upcoming.extend(holiday_status(h, today) for h in index.entries[start:start + limit - len(upcoming)])
+        if len(upcoming) >= limit:
+            break
+    return upcoming
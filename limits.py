@@ -0,0 +1,184 @@
+import copy
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Concurrent calls for the same key share one execution
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and get a deep copy of its result (or its
+    exception) instead of making the same backend call again.  Nothing is
+    remembered once the call returns, so this only merges overlapping calls
+    and never serves stale data.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.calls = 0
+        self.shared = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # Calls in flight belong to threads that do not exist in the child
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn):
+        """Return (fn() or the in-flight call's result, whether it was shared)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+                leader = True
+            else:
+                flight.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._land(key, flight)
+            flight.done.set()
+            raise
+        try:
+            # No one can join once the key is gone, so the waiter count is final
+            with self._lock:
+                self._land(key, flight)
+                waiters = flight.waiters
+            # Snapshot before the leader's caller can mutate what it gets back
+            if waiters:
+                flight.result = copy.deepcopy(result)
+        finally:
+            flight.done.set()
+        return result, False
+
+    def _land(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def forget(self, key):
+        """Make later callers start a fresh call, e.g. after a write the in-flight read may predate"""
+        with self._lock:
+            self._flights.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'shared': self.shared,
+                'in_flight': len(self._flights)
+            }
+
+
+def parse_rule(rule):
+    """'<requests>/<seconds>' as (capacity, refill per second), or None when disabled ('' or '0')"""
+    rule = (rule or '').strip()
+    if rule in ('', '0'):
+        return None
+    try:
+        requests, seconds = rule.split('/', 1)
+        capacity, period = int(requests), float(seconds)
+    except ValueError:
+        raise ValueError(f"Rate limit '{rule}' must look like <requests>/<seconds>")
+    if capacity < 1 or period <= 0:
+        raise ValueError(f"Rate limit '{rule}' must allow at least 1 request over a positive period")
+    return capacity, capacity / period
+
+
+class RateLimiter:
+    """Token buckets for one rule, keyed by identity (user name, IP address, ...)
+
+    Each bucket is just (tokens, last refill time) in one LRU-ordered dict
+    shared by every thread of the worker, so the state is a couple of floats
+    per active client.  Buckets refill lazily when touched; when maxsize is
+    reached the least recently seen client is dropped, which at worst lets
+    it start again with a full bucket.
+    """
+
+    def __init__(self, name, rule, maxsize=10000, clock=time.monotonic):
+        self.name = name
+        self.rule = rule
+        parsed = parse_rule(rule)
+        self.capacity, self.refill = parsed if parsed else (0, 0.0)
+        self.maxsize = maxsize
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def take(self, key, cost=1):
+        """Spend cost tokens from key's bucket; returns 0 if allowed, else seconds until it would be"""
+        if not self.enabled or key is None:
+            return 0
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = self.capacity
+            else:
+                tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill)
+                self._buckets.move_to_end(key)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                self.allowed += 1
+                retry_after = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                self.rejected += 1
+                retry_after = (cost - tokens) / self.refill
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return retry_after
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rule': self.rule or 'off',
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+                'clients': len(self._buckets),
+                'evictions': self.evictions
+            }
+
+
+def retry_after_header(seconds):
+    """Whole seconds for a Retry-After header, never 0 for a rejected request"""
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,97 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed with extra= and is a structured field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the message and every extra= field"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Human readable line with extra= fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+FORMATTERS = {
+    'text': KeyValueFormatter,
+    'json': JsonFormatter,
+}
+
+
+def configure_logging(level='INFO', fmt='text', stream=None):
+    """Route all logging through a queue so request threads never block on output
+
+    Records are put on an unbounded queue by a QueueHandler on the root
+    logger; a QueueListener thread formats them and writes to stream
+    (stderr by default).  Calling it again reconfigures the level only.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if _listener is not None:
+        return _listener
+    if fmt not in FORMATTERS:
+        raise ValueError(f"Unknown log format '{fmt}', expected one of {', '.join(FORMATTERS)}")
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(FORMATTERS[fmt]())
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _listener = _start_listener(output)
+    atexit.register(lambda: _listener.stop())
+    if hasattr(os, 'register_at_fork'):
+        # The listener thread does not survive a fork; give each worker its own
+        os.register_at_fork(after_in_child=lambda: _restart_listener(output))
+    return _listener
+
+
+def _start_listener(output):
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def _restart_listener(output):
+    global _listener
+    _listener = _start_listener(output)
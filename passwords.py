@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug's default KDF spelled out, so stored hashes can be compared against it
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+DEFAULT_SALT_LENGTH = 16
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue stays full for longer than the caller will wait"""
+
+
+def _timed(func, *args):
+    """Run func in the worker and report how long the KDF itself took"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class PasswordHasher:
+    """Password hashing and verification off the request thread
+
+    KDF calls run in a pool of `workers` processes so they neither hold the
+    GIL nor serialize behind each other; with workers=0 they run inline.
+    At most `max_pending` calls may be queued or running, and a caller that
+    cannot get a slot within `queue_timeout` seconds gets HasherBusy.
+
+    stats() splits the time each call took into queue wait (waiting for a
+    slot and a free worker) and hash time (the KDF in the worker), which is
+    what the pool should be sized against.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, salt_length=DEFAULT_SALT_LENGTH,
+                 workers=2, max_pending=64, queue_timeout=5.0):
+        if workers < 0:
+            raise ValueError('workers must be 0 or more')
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self.max_pending = max(max_pending, 1)
+        self._executor = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+        self.counters = {
+            'hashes': 0,
+            'verifications': 0,
+            'rehashes': 0,
+            'rejected': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'queue_wait_seconds': 0.0,
+            'hash_seconds': 0.0,
+            'max_queue_wait_seconds': 0.0,
+            'max_hash_seconds': 0.0
+        }
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn, not fork: the web process has threads and open storage clients
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def _reset_after_fork(self):
+        # A forked child cannot use the parent's worker processes; start its own on first use
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def _run(self, counter, func, *args):
+        submitted = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.counters['rejected'] += 1
+            raise HasherBusy('Password hashing queue is full')
+        with self._lock:
+            self.counters['in_flight'] += 1
+            self.counters['max_in_flight'] = max(self.counters['max_in_flight'], self.counters['in_flight'])
+        try:
+            if self.workers:
+                result, hash_time = self._pool().submit(_timed, func, *args).result()
+            else:
+                result, hash_time = _timed(func, *args)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.counters['in_flight'] -= 1
+        queue_wait = max(time.perf_counter() - submitted - hash_time, 0.0)
+        with self._lock:
+            self.counters[counter] += 1
+            self.counters['queue_wait_seconds'] += queue_wait
+            self.counters['hash_seconds'] += hash_time
+            self.counters['max_queue_wait_seconds'] = max(self.counters['max_queue_wait_seconds'], queue_wait)
+            self.counters['max_hash_seconds'] = max(self.counters['max_hash_seconds'], hash_time)
+        return result
+
+    def hash(self, password):
+        """Hash a password with the configured KDF parameters"""
+        return self._run('hashes', generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        if not password_hash:
+            return False
+        return self._run('verifications', check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was made with different KDF parameters"""
+        if password_hash.count('$') < 2:
+            return True
+        method, salt, _ = password_hash.split('$', 2)
+        return method != self.method or len(salt) != self.salt_length
+
+    def verify_and_upgrade(self, password_hash, password):
+        """Check a password; return (valid, new_hash) where new_hash is set if the stored one is outdated"""
+        if not self.verify(password_hash, password):
+            return False, None
+        if not self.needs_rehash(password_hash):
+            return True, None
+        new_hash = self.hash(password)
+        with self._lock:
+            self.counters['rehashes'] += 1
+        return True, new_hash
+
+    def close(self):
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        """Return call counts, in-flight depth and queue wait vs. hash time"""
+        with self._lock:
+            stats = dict(self.counters)
+        calls = stats['hashes'] + stats['verifications']
+        stats['avg_queue_wait_seconds'] = stats['queue_wait_seconds'] / calls if calls else 0.0
+        stats['avg_hash_seconds'] = stats['hash_seconds'] / calls if calls else 0.0
+        stats['workers'] = self.workers
+        stats['max_pending'] = self.max_pending
+        stats['method'] = self.method
+        return stats
@@ -0,0 +1,149 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+
+
+class StorageUnavailable(Exception):
+    """Raised instead of returning empty data when storage cannot answer in time
+
+    retry_after is a hint in seconds for when trying again may succeed.
+    """
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(StorageUnavailable):
+    """The request's storage budget is spent"""
+
+
+class CircuitOpen(StorageUnavailable):
+    """Storage has been failing, so calls are refused without trying it"""
+
+
+# Absolute time.monotonic() by which storage calls in the current request must finish.
+# A context variable, so each thread or greenlet serving a request has its own.
+_deadline = contextvars.ContextVar('storage_deadline', default=None)
+
+
+def set_deadline(seconds):
+    """Give storage calls in the current context seconds in total; None or 0 removes the budget"""
+    _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def time_left():
+    """Seconds left of the current budget, or None without one"""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+def check_deadline():
+    """Raise DeadlineExceeded once the budget is spent; returns the seconds left, or None"""
+    left = time_left()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded('Storage deadline exceeded')
+    return left
+
+
+def call_timeout(default):
+    """Timeout for one backend call: default, capped by what is left of the budget
+
+    Raises DeadlineExceeded once the budget is spent, so no call starts that
+    could only finish after the client has been answered.
+    """
+    left = check_deadline()
+    return default if left is None else min(default, left)
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fail storage calls fast while most recent calls have been failing
+
+    Keeps the outcome of the last `window` calls.  Once at least min_calls
+    are recorded and the failing share reaches failure_ratio, the breaker
+    opens and before() raises CircuitOpen for open_seconds.  Then a single
+    trial call is let through (half open): success closes the breaker with
+    a clean window, failure opens it again.
+    """
+
+    def __init__(self, window=50, min_calls=10, failure_ratio=0.5, open_seconds=15.0, clock=time.monotonic):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._probing = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if self._probing or self._clock() >= self._opened_at + self.open_seconds:
+            return 'half_open'
+        return 'open'
+
+    def before(self):
+        """Raise CircuitOpen unless a call may go to storage now; returns whether it is the trial call"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            wait = self._opened_at + self.open_seconds - self._clock()
+            if wait <= 0 and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+        raise CircuitOpen('Storage is unavailable', retry_after=max(wait, 1.0))
+
+    def record(self, ok, trial=False):
+        """Count the outcome of a call that before() let through"""
+        with self._lock:
+            if self._opened_at is not None:
+                if not trial:
+                    return  # Started before the breaker opened
+                self._probing = False
+                if ok:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                    self._failures = 0
+                else:
+                    self._opened_at = self._clock()
+                return
+            if len(self._outcomes) == self._outcomes.maxlen and not self._outcomes[0]:
+                self._failures -= 1
+            self._outcomes.append(ok)
+            if not ok:
+                self._failures += 1
+                if (len(self._outcomes) >= self.min_calls
+                        and self._failures >= self.failure_ratio * len(self._outcomes)):
+                    self._opened_at = self._clock()
+                    self.opened += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'recent_calls': len(self._outcomes),
+                'recent_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
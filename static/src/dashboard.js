@@ -0,0 +1,887 @@
+console.log("Academic Calculator loaded with Timetable functionality");
+
+// Global variables
+let currentDayIndex = 0;
+let currentTimetable = {};
+let timetableVersion = null;
+let editingIndex = -1;
+let semesterCount = 1;
+
+const days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'];
+const dayNames = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'];
+
+// Color schemes for different subjects
+const colorSchemes = [
+    '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7',
+    '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9'
+];
+
+// Initialize the page
+document.addEventListener("DOMContentLoaded", () => {
+    console.log("DOM loaded successfully");
+
+    // Set current day to today
+    const today = new Date().getDay();
+    currentDayIndex = today === 0 ? 6 : today - 1; // Convert Sunday=0 to our array index
+
+    updateDayDisplay();
+    loadBootstrap();
+
+    // Tab switching functionality
+    const tabButtons = document.querySelectorAll(".tab-btn");
+    const tabPanes = document.querySelectorAll(".tab-pane");
+
+    tabButtons.forEach((button) => {
+        button.addEventListener("click", (e) => {
+            e.preventDefault();
+
+            const tabId = button.getAttribute("data-tab");
+            console.log("Switching to tab:", tabId);
+
+            // Remove active class from all tabs and panes
+            tabButtons.forEach((btn) => btn.classList.remove("active"));
+            tabPanes.forEach((pane) => pane.classList.remove("active"));
+
+            // Add active class to clicked tab and corresponding pane
+            button.classList.add("active");
+            const targetPane = document.getElementById(tabId);
+            if (targetPane) {
+                targetPane.classList.add("active");
+            }
+
+            // Load timetable when switching to timetable tab
+            if (tabId === 'timetable') {
+                loadTimetable();
+            }
+        });
+    });
+
+    // Form submission for timetable
+    const classForm = document.getElementById('classForm');
+    if (classForm) {
+        classForm.addEventListener('submit', function(e) {
+            e.preventDefault();
+            saveClass();
+        });
+    }
+
+    // Auto-hide flash messages
+    setTimeout(() => {
+        const flashMessages = document.getElementById("flashMessages");
+        if (flashMessages) {
+            flashMessages.style.display = "none";
+        }
+    }, 5000);
+});
+
+// Timetable Functions
+function showTimetable() {
+    // Switch to timetable tab
+    const tabButtons = document.querySelectorAll(".tab-btn");
+    const tabPanes = document.querySelectorAll(".tab-pane");
+
+    tabButtons.forEach((btn) => btn.classList.remove("active"));
+    tabPanes.forEach((pane) => pane.classList.remove("active"));
+
+    const timetableBtn = document.querySelector('[data-tab="timetable"]');
+    const timetablePane = document.getElementById('timetable');
+
+    if (timetableBtn) timetableBtn.classList.add("active");
+    if (timetablePane) timetablePane.classList.add("active");
+
+    loadTimetable();
+}
+
+// Day navigation functions
+function changeDay(direction) {
+    currentDayIndex += direction;
+    if (currentDayIndex < 0) currentDayIndex = 6;
+    if (currentDayIndex > 6) currentDayIndex = 0;
+
+    updateDayDisplay();
+    displaySchedule();
+}
+
+function updateDayDisplay() {
+    const dayName = dayNames[currentDayIndex];
+    const today = new Date();
+    const targetDate = new Date(today);
+
+    // Calculate the target date
+    const currentDay = today.getDay();
+    const targetDay = currentDayIndex === 6 ? 0 : currentDayIndex + 1; // Convert back to JS day format
+    const dayDiff = targetDay - currentDay;
+    targetDate.setDate(today.getDate() + dayDiff);
+
+    const currentDayElement = document.getElementById('currentDay');
+    const currentDateElement = document.getElementById('currentDate');
+
+    if (currentDayElement) currentDayElement.textContent = dayName;
+    if (currentDateElement) {
+        currentDateElement.textContent = targetDate.toLocaleDateString('en-GB', {
+            day: 'numeric',
+            month: 'long'
+        });
+    }
+}
+
+// Initial dashboard data: inlined by the server when available, otherwise one request
+function loadBootstrap() {
+    const inline = document.getElementById('bootstrapData');
+    if (inline) {
+        applyBootstrap(JSON.parse(inline.textContent));
+        return;
+    }
+    fetch('/api/bootstrap')
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(applyBootstrap)
+        .catch(error => {
+            console.error('Error loading dashboard data:', error);
+            loadTimetable();
+        });
+}
+
+function applyBootstrap(data) {
+    currentTimetable = data.timetable?.timetable || {};
+    timetableVersion = data.timetable?.version ?? null;
+    displaySchedule();
+
+    if (data.history) {
+        displayCGPAHistory(data.history.cgpa || []);
+        displayAttendanceHistory(data.history.attendance || []);
+    }
+    if (data.holidays?.upcoming?.length) {
+        displayHolidays(data.holidays.upcoming);
+    }
+}
+
+// Timetable management functions
+function loadTimetable() {
+    fetch('/api/timetable')
+        .then(response => response.json())
+        .then(data => {
+            currentTimetable = data.timetable || {};
+            timetableVersion = data.version ?? null;
+            displaySchedule();
+        })
+        .catch(error => {
+            console.error('Error loading timetable:', error);
+            showNotification('Error loading timetable', 'error');
+        });
+}
+
+function displaySchedule() {
+    const container = document.getElementById('scheduleContainer');
+    if (!container) return;
+
+    const currentDay = days[currentDayIndex];
+    const schedule = currentTimetable[currentDay] || [];
+
+    if (schedule.length === 0) {
+        container.innerHTML = `
+            <div class="empty-schedule">
+                <i class="fas fa-calendar-plus empty-icon"></i>
+                <p>No classes scheduled for ${dayNames[currentDayIndex]}</p>
+                <button class="btn btn-primary" onclick="openAddModal()" type="button">
+                    <i class="fas fa-plus"></i> Add Class
+                </button>
+            </div>
+        `;
+        return;
+    }
+
+    // Sort schedule by start time
+    schedule.sort((a, b) => a.startTime.localeCompare(b.startTime));
+
+    const scheduleHTML = schedule.map((classItem, index) => {
+        const color = colorSchemes[index % colorSchemes.length];
+        const startTime = formatTime(classItem.startTime);
+        const endTime = formatTime(classItem.endTime);
+
+        return `
+            <div class="schedule-item" style="background-color: ${color}" onclick="editClass(${index})">
+                <div class="schedule-number">${index + 1}</div>
+                <div class="schedule-content">
+                    <div class="schedule-time">
+                        <div class="time-start">${startTime}</div>
+                        <div class="time-end">${endTime}</div>
+                    </div>
+                    <div class="schedule-details">
+                        <div class="subject-name">${classItem.subjectName}</div>
+                        <div class="teacher-name">${classItem.teacherName || 'No teacher assigned'}</div>
+                        ${classItem.roomNumber ? `<div class="room-info"><i class="fas fa-map-marker-alt"></i> ${classItem.roomNumber}</div>` : ''}
+                        ${classItem.classType ? `<div class="class-type">${classItem.classType.charAt(0).toUpperCase() + classItem.classType.slice(1)}</div>` : ''}
+                    </div>
+                </div>
+                <div class="schedule-actions">
+                    <button class="action-btn edit-btn" onclick="event.stopPropagation(); editClass(${index})" type="button">
+                        <i class="fas fa-edit"></i>
+                    </button>
+                    <button class="action-btn delete-btn" onclick="event.stopPropagation(); deleteClass(${index})" type="button">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </div>
+            </div>
+        `;
+    }).join('');
+
+    container.innerHTML = scheduleHTML;
+}
+
+// Modal functions
+function openAddModal() {
+    editingIndex = -1;
+    const modalTitle = document.getElementById('modalTitle');
+    const classForm = document.getElementById('classForm');
+
+    if (modalTitle) modalTitle.textContent = 'Add New Class';
+    if (classForm) classForm.reset();
+
+    const modal = document.getElementById('addModal');
+    if (modal) modal.style.display = 'flex';
+}
+
+function closeAddModal() {
+    const modal = document.getElementById('addModal');
+    if (modal) modal.style.display = 'none';
+    editingIndex = -1;
+}
+
+function editClass(index) {
+    const currentDay = days[currentDayIndex];
+    const schedule = currentTimetable[currentDay] || [];
+    const classItem = schedule[index];
+
+    if (!classItem) return;
+
+    editingIndex = index;
+    const modalTitle = document.getElementById('modalTitle');
+    if (modalTitle) modalTitle.textContent = 'Edit Class';
+
+    // Fill form with existing data
+    const startTimeInput = document.getElementById('startTime');
+    const endTimeInput = document.getElementById('endTime');
+    const subjectNameInput = document.getElementById('subjectNameModal');
+    const teacherNameInput = document.getElementById('teacherName');
+    const roomNumberInput = document.getElementById('roomNumber');
+    const classTypeInput = document.getElementById('classType');
+
+    if (startTimeInput) startTimeInput.value = classItem.startTime;
+    if (endTimeInput) endTimeInput.value = classItem.endTime;
+    if (subjectNameInput) subjectNameInput.value = classItem.subjectName;
+    if (teacherNameInput) teacherNameInput.value = classItem.teacherName || '';
+    if (roomNumberInput) roomNumberInput.value = classItem.roomNumber || '';
+    if (classTypeInput) classTypeInput.value = classItem.classType || 'lecture';
+
+    const modal = document.getElementById('addModal');
+    if (modal) modal.style.display = 'flex';
+}
+
+function deleteClass(index) {
+    if (confirm('Are you sure you want to delete this class?')) {
+        const currentDay = days[currentDayIndex];
+        const classItem = (currentTimetable[currentDay] || [])[index];
+        if (!classItem) return;
+
+        saveTimetableChange('DELETE', `/api/timetable/day/${currentDay}/entries/${encodeURIComponent(classItem.id)}`)
+            .then(data => {
+                if (data) showNotification('Class deleted successfully', 'success');
+            });
+    }
+}
+
+function saveClass() {
+    const formData = {
+        startTime: document.getElementById('startTime').value,
+        endTime: document.getElementById('endTime').value,
+        subjectName: document.getElementById('subjectNameModal').value,
+        teacherName: document.getElementById('teacherName').value,
+        roomNumber: document.getElementById('roomNumber').value,
+        classType: document.getElementById('classType').value
+    };
+
+    // Validation
+    if (!formData.startTime || !formData.endTime || !formData.subjectName) {
+        showNotification('Please fill in all required fields', 'error');
+        return;
+    }
+
+    if (formData.startTime >= formData.endTime) {
+        showNotification('End time must be after start time', 'error');
+        return;
+    }
+
+    const currentDay = days[currentDayIndex];
+    const classItem = editingIndex >= 0 ? (currentTimetable[currentDay] || [])[editingIndex] : null;
+
+    // Only the changed class is sent; the server writes just this day
+    const request = classItem
+        ? saveTimetableChange('PATCH', `/api/timetable/day/${currentDay}/entries/${encodeURIComponent(classItem.id)}`, formData)
+        : saveTimetableChange('POST', `/api/timetable/day/${currentDay}/entries`, formData);
+
+    request.then(data => {
+        if (data) {
+            showNotification(classItem ? 'Class updated successfully' : 'Class added successfully', 'success');
+            closeAddModal();
+        }
+    });
+}
+
+function saveTimetableChange(method, url, body) {
+    const headers = {'Content-Type': 'application/json'};
+    if (timetableVersion !== null) {
+        // Rejected with 412 if another tab saved since we loaded
+        headers['If-Match'] = `"${timetableVersion}"`;
+    }
+
+    return fetch(url, {
+        method: method,
+        headers: headers,
+        body: body ? JSON.stringify(body) : undefined
+    })
+    .then(response => response.json().then(data => ({ status: response.status, data })))
+    .then(({ status, data }) => {
+        if (status === 412) {
+            showNotification('Timetable was changed in another tab. Showing the latest version.', 'error');
+            loadTimetable();
+            return null;
+        }
+        if (data.error) {
+            showNotification(data.error, 'error');
+            return null;
+        }
+        currentTimetable[data.day] = data.schedule;
+        timetableVersion = data.version;
+        displaySchedule();
+        return data;
+    })
+    .catch(error => {
+        console.error('Error saving timetable:', error);
+        showNotification('Error saving timetable', 'error');
+        return null;
+    });
+}
+
+// CGPA Functions
+function addSemester() {
+    semesterCount++;
+    const container = document.getElementById('semesterContainer');
+    const newSemester = document.createElement('div');
+    newSemester.className = 'semester-item';
+    newSemester.setAttribute('data-semester', semesterCount);
+    newSemester.innerHTML = `
+        <div class="semester-header">
+            <span class="semester-title">Semester ${semesterCount}</span>
+            <button class="remove-semester" onclick="removeSemester(${semesterCount})" type="button">
+                <i class="fas fa-trash"></i>
+            </button>
+        </div>
+        <div class="semester-inputs">
+            <div class="input-group">
+                <label>SGPA</label>
+                <input type="number" step="0.01" min="0" max="10" placeholder="e.g., 8.37" class="sgpa-input">
+            </div>
+            <div class="input-group">
+                <label>Credits</label>
+                <input type="number" min="0" placeholder="e.g., 23" class="credits-input">
+            </div>
+        </div>
+    `;
+    container.appendChild(newSemester);
+    updateRemoveButtons();
+}
+
+function removeSemester(semesterId) {
+    const semesterElement = document.querySelector(`[data-semester="${semesterId}"]`);
+    if (semesterElement && semesterCount > 1) {
+        semesterElement.remove();
+        semesterCount--;
+        updateRemoveButtons();
+    }
+}
+
+function updateRemoveButtons() {
+    const removeButtons = document.querySelectorAll(".remove-semester");
+    const semesterItems = document.querySelectorAll(".semester-item");
+    removeButtons.forEach((button) => {
+        button.style.display = semesterItems.length > 1 ? "block" : "none";
+    });
+}
+
+function calculateCGPA() {
+    const semesterItems = document.querySelectorAll(".semester-item");
+    const semesters = [];
+
+    semesterItems.forEach((item) => {
+        const sgpaInput = item.querySelector(".sgpa-input");
+        const creditsInput = item.querySelector(".credits-input");
+
+        if (sgpaInput && creditsInput) {
+            const sgpa = parseFloat(sgpaInput.value) || 0;
+            const credits = parseFloat(creditsInput.value) || 0;
+
+            if (sgpa > 0 && credits > 0) {
+                semesters.push({ sgpa, credits });
+            }
+        }
+    });
+
+    if (semesters.length === 0) {
+        showNotification("Please enter valid SGPA and Credits for at least one semester", "error");
+        return;
+    }
+
+    // Send data to backend
+    fetch("/api/calculate_cgpa", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ semesters }),
+    })
+        .then((response) => response.json())
+        .then((data) => {
+            if (data.error) {
+                showNotification(data.error, "error");
+            } else {
+                displayCGPAResults(data);
+                showNotification("CGPA calculated successfully!", "success");
+            }
+        })
+        .catch((error) => {
+            console.error("Error:", error);
+            showNotification("Error calculating CGPA. Please try again.", "error");
+        });
+}
+
+function displayCGPAResults(data) {
+    const resultsContainer = document.getElementById("cgpaResults");
+    if (!resultsContainer) return;
+
+    const resultsHTML = `
+        <div class="cgpa-result-card">
+            <h3>Your CGPA</h3>
+            <div class="cgpa-value">${data.cgpa || "N/A"}</div>
+            <div class="cgpa-scale">Out of 10.00</div>
+        </div>
+
+        <div class="gpa-scales">
+            <div class="gpa-scale-card">
+                <div class="scale-value">${data.gpa_4_scale || "N/A"}</div>
+                <div class="scale-label">4.0 Scale (US)</div>
+                <div class="scale-formula">Formula: (CGPA - 5) × 4 / 5</div>
+            </div>
+            <div class="gpa-scale-card">
+                <div class="scale-value">${data.gpa_5_scale || "N/A"}</div>
+                <div class="scale-label">5.0 Scale</div>
+                <div class="scale-formula">Formula: CGPA / 2</div>
+            </div>
+        </div>
+    `;
+
+    resultsContainer.innerHTML = resultsHTML;
+}
+
+function resetCGPA() {
+    const container = document.getElementById('semesterContainer');
+    if (!container) return;
+
+    container.innerHTML = `
+        <div class="semester-item" data-semester="1">
+            <div class="semester-header">
+                <span class="semester-title">Semester 1</span>
+                <button class="remove-semester" onclick="removeSemester(1)" style="display: none;" type="button">
+                    <i class="fas fa-trash"></i>
+                </button>
+            </div>
+            <div class="semester-inputs">
+                <div class="input-group">
+                    <label>SGPA</label>
+                    <input type="number" step="0.01" min="0" max="10" placeholder="e.g., 8.37" class="sgpa-input">
+                </div>
+                <div class="input-group">
+                    <label>Credits</label>
+                    <input type="number" min="0" placeholder="e.g., 23" class="credits-input">
+                </div>
+            </div>
+        </div>
+    `;
+
+    semesterCount = 1;
+
+    const resultsContainer = document.getElementById("cgpaResults");
+    if (resultsContainer) {
+        resultsContainer.innerHTML = `
+            <div class="empty-state">
+                <i class="fas fa-calculator empty-icon"></i>
+                <p>Enter your semester details and click "Calculate CGPA" to see your results</p>
+            </div>
+        `;
+    }
+}
+
+// Attendance Functions
+function calculateAttendance() {
+    const subjectName = document.getElementById("subjectName")?.value || "Subject";
+    const attended = parseInt(document.getElementById("attendedClasses")?.value) || 0;
+    const total = parseInt(document.getElementById("totalClasses")?.value) || 0;
+    const minRequired = parseFloat(document.getElementById("minRequired")?.value) || 75;
+
+    if (total <= 0) {
+        showNotification("Please enter valid attendance data", "error");
+        return;
+    }
+
+    fetch("/api/calculate_attendance", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify({
+            subject_name: subjectName,
+            attended: attended,
+            total: total,
+            min_required: minRequired,
+        }),
+    })
+        .then((response) => response.json())
+        .then((data) => {
+            if (data.error) {
+                showNotification(data.error, "error");
+            } else {
+                displayAttendanceResults(data);
+            }
+        })
+        .catch((error) => {
+            console.error("Error:", error);
+            showNotification("Error calculating attendance. Please try again.", "error");
+        });
+}
+
+function displayAttendanceResults(data) {
+    const resultsContainer = document.getElementById("attendanceResults");
+    if (!resultsContainer) return;
+
+    const statusClass = data.status === "safe" ? "safe" : "at-risk";
+
+    const resultsHTML = `
+        <div class="attendance-result-card ${statusClass}">
+            <h3>Current Attendance</h3>
+            <div class="attendance-percentage">${data.current_percent || 0}%</div>
+            <div class="attendance-info">${data.attended || 0} out of ${data.total || 0} classes</div>
+        </div>
+
+        <div class="recommendation-card ${statusClass}">
+            <div class="recommendation-message"><strong>${data.message || "No message"}</strong></div>
+            <div class="recommendation-text">${data.recommendation || "No recommendation"}</div>
+        </div>
+    `;
+
+    resultsContainer.innerHTML = resultsHTML;
+}
+
+function saveAttendanceRecord() {
+    const subjectName = document.getElementById("subjectName")?.value;
+    const total = parseInt(document.getElementById("totalClasses")?.value) || 0;
+
+    if (!subjectName || total <= 0) {
+        showNotification("Please enter valid attendance data", "error");
+        return;
+    }
+
+    calculateAttendance();
+    showNotification("Attendance record saved successfully!", "success");
+
+    const subjectInput = document.getElementById("subjectName");
+    if (subjectInput) {
+        subjectInput.value = "";
+    }
+}
+
+function resetAttendance() {
+    const elements = ["subjectName", "attendedClasses", "totalClasses"];
+
+    elements.forEach((id) => {
+        const element = document.getElementById(id);
+        if (element) element.value = "";
+    });
+
+    const minRequiredElement = document.getElementById("minRequired");
+    if (minRequiredElement) minRequiredElement.value = "75";
+
+    const resultsContainer = document.getElementById("attendanceResults");
+    if (resultsContainer) {
+        resultsContainer.innerHTML = `
+            <div class="empty-state">
+                <i class="fas fa-book-open empty-icon"></i>
+                <p>Enter your attendance details to see your status and recommendations</p>
+            </div>
+        `;
+    }
+}
+
+// Holiday Functions
+function loadHolidays() {
+    console.log("Loading holidays...");
+    const container = document.getElementById("holidaysContainer");
+
+    if (!container) {
+        console.error("Holidays container not found");
+        return;
+    }
+
+    container.innerHTML = `
+        <div class="loading-state">
+            <i class="fas fa-spinner fa-spin"></i>
+            <p>Loading holidays...</p>
+        </div>
+    `;
+
+    fetch("/api/holidays")
+        .then((response) => response.json())
+        .then((data) => {
+            displayHolidays(data);
+        })
+        .catch((error) => {
+            console.error("Error loading holidays:", error);
+            container.innerHTML = `
+                <div class="empty-state">
+                    <i class="fas fa-exclamation-triangle empty-icon"></i>
+                    <p>Error loading holidays. Please try again later.</p>
+                </div>
+            `;
+        });
+}
+
+function displayHolidays(holidays) {
+    const container = document.getElementById("holidaysContainer");
+    if (!container) return;
+
+    if (!holidays || holidays.length === 0) {
+        container.innerHTML = `
+            <div class="empty-state">
+                <i class="fas fa-calendar empty-icon"></i>
+                <p>No holidays found</p>
+            </div>
+        `;
+        return;
+    }
+
+    const holidaysHTML = holidays
+        .map(
+            (holiday) => `
+            <div class="holiday-card ${holiday.status || "upcoming"}">
+                <div class="holiday-header">
+                    <div class="holiday-date">${formatDate(holiday.date)}</div>
+                    <div class="holiday-type ${holiday.type}">${holiday.type.charAt(0).toUpperCase() + holiday.type.slice(1)}</div>
+                </div>
+                <div class="holiday-name">${holiday.name}</div>
+                <div class="holiday-description">${holiday.description}</div>
+                ${holiday.countdown ? `<div class="holiday-countdown ${holiday.status || "upcoming"}">${holiday.countdown}</div>` : ""}
+            </div>
+        `,
+        )
+        .join("");
+
+    container.innerHTML = holidaysHTML;
+}
+
+// History Functions
+function loadHistory() {
+    console.log("Loading history...");
+    const cgpaContainer = document.getElementById("cgpaHistory");
+    const attendanceContainer = document.getElementById("attendanceHistory");
+
+    if (cgpaContainer) {
+        cgpaContainer.innerHTML = `
+            <div class="loading-state">
+                <i class="fas fa-spinner fa-spin"></i>
+                <p>Loading CGPA history...</p>
+            </div>
+        `;
+    }
+
+    if (attendanceContainer) {
+        attendanceContainer.innerHTML = `
+            <div class="loading-state">
+                <i class="fas fa-spinner fa-spin"></i>
+                <p>Loading attendance history...</p>
+            </div>
+        `;
+    }
+
+    fetch("/api/history")
+        .then((response) => response.json())
+        .then((data) => {
+            displayCGPAHistory(data.cgpa || []);
+            displayAttendanceHistory(data.attendance || []);
+        })
+        .catch((error) => {
+            console.error("Error loading history:", error);
+
+            if (cgpaContainer) {
+                cgpaContainer.innerHTML = `
+                    <div class="empty-state">
+                        <i class="fas fa-calculator empty-icon"></i>
+                        <p>No CGPA calculations yet</p>
+                    </div>
+                `;
+            }
+
+            if (attendanceContainer) {
+                attendanceContainer.innerHTML = `
+                    <div class="empty-state">
+                        <i class="fas fa-book-open empty-icon"></i>
+                        <p>No attendance records yet</p>
+                    </div>
+                `;
+            }
+        });
+}
+
+function displayCGPAHistory(history) {
+    const container = document.getElementById("cgpaHistory");
+    if (!container) return;
+
+    if (!history || history.length === 0) {
+        container.innerHTML = `
+            <div class="empty-state">
+                <i class="fas fa-calculator empty-icon"></i>
+                <p>No CGPA calculations yet</p>
+            </div>
+        `;
+        return;
+    }
+
+    const historyHTML = history
+        .map(
+            (record) => `
+            <div class="history-card cgpa">
+                <div class="history-header">
+                    <div class="history-date">${formatDate(record.timestamp)}</div>
+                </div>
+                <div class="history-value cgpa">CGPA: ${record.result?.cgpa || "N/A"}</div>
+                <div class="history-details">${record.result?.total_credits || 0} credits • ${record.result?.semesters?.length || 0} semesters</div>
+            </div>
+        `,
+        )
+        .join("");
+
+    container.innerHTML = historyHTML;
+}
+
+function displayAttendanceHistory(history) {
+    const container = document.getElementById("attendanceHistory");
+    if (!container) return;
+
+    if (!history || history.length === 0) {
+        container.innerHTML = `
+            <div class="empty-state">
+                <i class="fas fa-book-open empty-icon"></i>
+                <p>No attendance records yet</p>
+            </div>
+        `;
+        return;
+    }
+
+    const historyHTML = history
+        .map(
+            (record) => `
+            <div class="history-card attendance">
+                <div class="history-header">
+                    <div class="history-date">${formatDate(record.timestamp)}</div>
+                </div>
+                <div class="history-value attendance">${record.result?.current_percent || "N/A"}%</div>
+                <div class="history-details">
+                    ${record.result?.subject_name || "Unknown"} • ${record.result?.attended || 0}/${record.result?.total || 0} classes
+                </div>
+            </div>
+        `,
+        )
+        .join("");
+
+    container.innerHTML = historyHTML;
+}
+
+// Utility Functions
+function formatTime(timeString) {
+    const [hours, minutes] = timeString.split(':');
+    const hour = parseInt(hours);
+    const ampm = hour >= 12 ? 'PM' : 'AM';
+    const displayHour = hour % 12 || 12;
+    return `${displayHour.toString().padStart(2, '0')}:${minutes} ${ampm}`;
+}
+
+function formatDate(dateString) {
+    try {
+        if (!dateString) return "Invalid Date";
+        const date = new Date(dateString);
+        if (isNaN(date.getTime())) {
+            return "Invalid Date";
+        }
+        return date.toLocaleDateString("en-IN", {
+            weekday: "short",
+            year: "numeric",
+            month: "short",
+            day: "numeric",
+        });
+    } catch (error) {
+        console.error("Error formatting date:", error);
+        return "Invalid Date";
+    }
+}
+
+function showNotification(message, type = "success") {
+    try {
+        const notification = document.createElement("div");
+        notification.className = `flash-message flash-${type}`;
+        notification.innerHTML = `
+            ${message}
+            <button onclick="this.parentElement.remove()" class="flash-close" type="button">&times;</button>
+        `;
+
+        let container = document.getElementById("flashMessages");
+        if (!container) {
+            container = document.createElement("div");
+            container.id = "flashMessages";
+            document.body.appendChild(container);
+        }
+
+        container.appendChild(notification);
+
+        setTimeout(() => {
+            if (notification.parentElement) {
+                notification.remove();
+            }
+        }, 5000);
+    } catch (error) {
+        console.error("Error showing notification:", error);
+    }
+}
+
+// Close modal when clicking outside
+window.onclick = function(event) {
+    const modal = document.getElementById('addModal');
+    if (event.target === modal) {
+        closeAddModal();
+    }
+}
+
+// Error prevention
+window.addEventListener('error', function(e) {
+    console.error('Error caught and prevented:', e.error);
+    e.preventDefault();
+    return false;
+});
+
+window.addEventListener('unhandledrejection', function(e) {
+    console.error('Promise rejection caught and prevented:', e.reason);
+    e.preventDefault();
+});
+
+console.log("All functions loaded successfully including Timetable!");
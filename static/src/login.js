@@ -0,0 +1,86 @@
+function toggleForms(formToShow) {
+    if (formToShow === 'loginForm') {
+        document.getElementById('loginForm').style.display = 'block';
+        document.getElementById('registerForm').style.display = 'none';
+    } else {
+        document.getElementById('loginForm').style.display = 'none';
+        document.getElementById('registerForm').style.display = 'block';
+    }
+}
+
+// Validate year selection
+document.getElementById('reg_from_year').addEventListener('change', function() {
+    const fromYear = parseInt(this.value);
+    const toYearSelect = document.getElementById('reg_to_year');
+    const toYearOptions = toYearSelect.querySelectorAll('option');
+
+    // Enable/disable to_year options based on from_year
+    toYearOptions.forEach(option => {
+        if (option.value && parseInt(option.value) <= fromYear) {
+            option.disabled = true;
+            option.style.color = '#ccc';
+        } else {
+            option.disabled = false;
+            option.style.color = '#4b5563';
+        }
+    });
+
+    // Reset to_year if it's now invalid
+    if (toYearSelect.value && parseInt(toYearSelect.value) <= fromYear) {
+        toYearSelect.value = '';
+    }
+});
+
+// Form validation
+document.addEventListener('DOMContentLoaded', function() {
+    const regForm = document.querySelector('#registerForm form');
+    if (regForm) {
+        regForm.addEventListener('submit', function(e) {
+            const password = document.getElementById('reg_password').value;
+            const confirmPassword = document.getElementById('reg_confirm_password').value;
+
+            if (password !== confirmPassword) {
+                e.preventDefault();
+                alert('Passwords do not match!');
+                return;
+            }
+
+            // Validate year range
+            const fromYear = parseInt(document.getElementById('reg_from_year').value);
+            const toYear = parseInt(document.getElementById('reg_to_year').value);
+
+            if (fromYear && toYear && fromYear >= toYear) {
+                e.preventDefault();
+                alert('To Year must be after From Year!');
+                return;
+            }
+
+            // Validate phone number (basic)
+            const phone = document.getElementById('reg_phone').value;
+            const phoneRegex = /^[+]?[\d\s\-()]{10,}$/;
+            if (!phoneRegex.test(phone)) {
+                e.preventDefault();
+                alert('Please enter a valid phone number!');
+                return;
+            }
+        });
+    }
+});
+
+// Auto-format phone number
+document.getElementById('reg_phone').addEventListener('input', function(e) {
+    let value = e.target.value.replace(/\D/g, '');
+    if (value.length >= 10) {
+        value = value.substring(0, 10);
+        e.target.value = value.replace(/(\d{3})(\d{3})(\d{4})/, '$1-$2-$3');
+    }
+});
+
+// Prevent form submission on Enter key in select fields
+document.querySelectorAll('select').forEach(select => {
+    select.addEventListener('keydown', function(e) {
+        if (e.key === 'Enter') {
+            e.preventDefault();
+        }
+    });
+});
@@ -0,0 +1,1067 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+from resilience import StorageUnavailable, DeadlineExceeded, CircuitBreaker, call_timeout, check_deadline, time_left, backoff_delay
+
+
+class AlreadyExists(Exception):
+    """Raised when a unique key is already claimed"""
+
+
+class UsernameTaken(AlreadyExists):
+    pass
+
+
+class EmailTaken(AlreadyExists):
+    pass
+
+
+def normalize_email(email):
+    """Key under which an email is claimed; emails are unique case-insensitively"""
+    return (email or '').strip().lower()
+
+
+class VersionConflict(Exception):
+    """Raised when a conditional write finds the document at a different version"""
+
+    def __init__(self, current_version):
+        super().__init__(f'Document is at version {current_version}')
+        self.current_version = current_version
+
+
+# Most writes Firestore accepts in one batch commit
+MAX_BATCH_WRITES = 500
+
+
+def add_nested(target, deltas):
+    """Add nested numeric deltas into target in place"""
+    for key, value in deltas.items():
+        if isinstance(value, dict):
+            add_nested(target.setdefault(key, {}), value)
+        else:
+            target[key] = target.get(key, 0) + value
+    return target
+
+
+def batch_writes(profiles=(), documents=()):
+    """Write operations bulk_write needs: a profile with an email also claims it in the index"""
+    return sum(2 if profile.get('email') else 1 for _, profile in profiles) + len(documents)
+
+
+class StorageBackend:
+    """Interface shared by every storage engine
+
+    Profiles live under /users/students/profiles/<username> and per-user data
+    documents (cgpa, attendance, timetable, calculations) under
+    /users/students/profiles/<username>/data/<data_type>.  Data documents are
+    stored as {'data': ..., 'updated_at': ..., 'version': ...}; version is
+    bumped by every update_data call.
+    """
+
+    name = 'base'
+
+    def get_profile(self, username):
+        """Return the profile dict for username, or None"""
+        raise NotImplementedError
+
+    def find_profile_by_email(self, email):
+        """Return (username, profile) for the first profile with email, or (None, None)"""
+        raise NotImplementedError
+
+    def create_profile(self, username, profile):
+        """Create or overwrite the profile for username and claim its email"""
+        raise NotImplementedError
+
+    def create_profile_unique(self, username, profile):
+        """Atomically create a new profile and claim its email in the email index
+
+        Raises UsernameTaken or EmailTaken, writing nothing, if either key is
+        already claimed.
+        """
+        raise NotImplementedError
+
+    def backfill_email_index(self):
+        """Claim the email of every profile created before the email index existed; returns the count"""
+        raise NotImplementedError
+
+    def existing_profiles(self, usernames):
+        """The subset of usernames that already have a profile, in one round trip"""
+        raise NotImplementedError
+
+    def email_owners(self, emails):
+        """{normalized email: username} for those of emails already claimed, in one round trip"""
+        raise NotImplementedError
+
+    def bulk_write(self, profiles=(), documents=(), updated_at=None):
+        """Write many profiles and data documents as one atomic batch
+
+        profiles is [(username, profile)], overwriting the profile and
+        claiming its email; documents is [(username, data_type, data)],
+        replacing each document's data and bumping its version.  At most
+        MAX_BATCH_WRITES operations (see batch_writes) are accepted at once.
+        """
+        raise NotImplementedError
+
+    def list_data(self, username):
+        """Return {data_type: document} for every data document of username"""
+        raise NotImplementedError
+
+    def get_data(self, username, data_type):
+        """Return the stored data document for username/data_type, or None"""
+        raise NotImplementedError
+
+    def set_data(self, username, data_type, document):
+        """Overwrite the data document for username/data_type"""
+        raise NotImplementedError
+
+    def get_data_fields(self, username, data_type, keys):
+        """Return {'data': {key: value}, 'updated_at', 'version'} for only the given keys of data, or None"""
+        document = self.get_data(username, data_type)
+        if document is None:
+            return None
+        data = document.get('data') or {}
+        return {
+            'data': {key: data.get(key) for key in keys},
+            'updated_at': document.get('updated_at'),
+            'version': document.get('version', 0)
+        }
+
+    def update_data(self, username, data_type, modify, keys=None, expected_version=None, updated_at=None):
+        """Atomically read, modify and write a data document, bumping its version
+
+        With keys, modify receives {key: current value} for just those keys of
+        data and returns the new values; only those keys are written.  Without
+        keys it receives the whole data dict and returns its replacement.
+        Raises VersionConflict when expected_version is given and differs from
+        the stored version.  Returns (new_version, written values).
+        """
+        raise NotImplementedError
+
+    def list_profiles(self, fields=None, start_after=None, limit=None):
+        """Yield (username, profile) pairs ordered by username
+
+        fields limits each profile to those keys, start_after skips every
+        username up to and including it, and limit caps the number of rows.
+        """
+        raise NotImplementedError
+
+    def increment_cohort(self, key, labels, deltas, updated_at=None):
+        """Add nested numeric deltas to a cohort aggregate without reading it, creating it if needed"""
+        raise NotImplementedError
+
+    def get_cohort(self, key):
+        """Return one cohort aggregate, or None"""
+        raise NotImplementedError
+
+    def list_cohorts(self):
+        """Yield (key, aggregate) for every cohort"""
+        raise NotImplementedError
+
+    def replace_cohorts(self, cohorts):
+        """Replace every cohort aggregate with {key: aggregate}"""
+        raise NotImplementedError
+
+    def append_history(self, username, calc_type, record):
+        """Append one calculation record ({'result', 'timestamp'}) without reading existing history"""
+        raise NotImplementedError
+
+    def append_history_many(self, username, calc_type, records):
+        """Append several records for one user and type in a single write"""
+        for record in records:
+            self.append_history(username, calc_type, record)
+
+    def list_history(self, username, calc_type, before=None, limit=10):
+        """Return up to limit records older than the before timestamp, newest first"""
+        raise NotImplementedError
+
+    def trim_history(self, username, calc_type, keep):
+        """Delete all but the newest keep records and return how many were removed"""
+        raise NotImplementedError
+
+    def ping(self):
+        """Make one cheap round trip to the backend; raises if it is unreachable"""
+        raise NotImplementedError
+
+    def is_transient(self, error):
+        """Whether error means the backend failed (worth retrying a read) rather than answered"""
+        return isinstance(error, (DeadlineExceeded, TimeoutError, ConnectionError))
+
+    def close(self):
+        """Release any resources held by the backend"""
+
+
+def firebase_config_from_env():
+    """Build the service account dict from FIREBASE_* environment variables"""
+    private_key = os.getenv("FIREBASE_PRIVATE_KEY")
+    if not private_key:
+        raise RuntimeError("FIREBASE_PRIVATE_KEY is not set")
+    return {
+        "type": os.getenv("FIREBASE_TYPE"),
+        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+        "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+        "private_key": private_key.replace("\\n", "\n"),
+        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+        "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+        "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
+        "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
+        "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_CERT_URL"),
+        "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_CERT_URL"),
+        "universe_domain": os.getenv("FIREBASE_UNIVERSE_DOMAIN")
+    }
+
+
+class FirestoreStorage(StorageBackend):
+    """Storage backed by Cloud Firestore"""
+
+    name = 'firestore'
+
+    def __init__(self, client=None, timeout=10.0):
+        if client is None:
+            # Imported here: firebase_admin pulls in gRPC, which is slow to load and not fork-safe
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+
+            # One firebase app per process, so a forked worker never reuses its parent's gRPC channel
+            app_name = f'cgpa-{os.getpid()}'
+            try:
+                firebase_app = firebase_admin.get_app(app_name)
+            except ValueError:
+                cred = credentials.Certificate(firebase_config_from_env())
+                firebase_app = firebase_admin.initialize_app(cred, name=app_name)
+            client = firestore.client(firebase_app)
+        self.db = client
+        self.timeout = timeout
+
+    def _rpc(self):
+        """Per-call options: what is left of the request's budget as the timeout, and no
+        client library retries, which could outlast it (GuardedStorage retries reads)"""
+        return {'timeout': call_timeout(self.timeout), 'retry': None}
+
+    def _profiles(self):
+        """Get Firebase reference for the profiles collection"""
+        return self.db.collection('users').document('students').collection('profiles')
+
+    def _profile_ref(self, username):
+        """Get Firebase reference for user profile"""
+        return self._profiles().document(username)
+
+    def _data_ref(self, username):
+        """Get Firebase reference for user data (cgpa, attendance, timetable)"""
+        return self._profile_ref(username).collection('data')
+
+    def _history_ref(self, username, calc_type):
+        """Get Firebase reference for the append-only history of one calculation type"""
+        return self._data_ref(username).document('calculations').collection(calc_type)
+
+    def get_profile(self, username):
+        doc = self._profile_ref(username).get(**self._rpc())
+        if doc.exists:
+            return doc.to_dict()
+        return None
+
+    def _email_ref(self, email):
+        """Get Firebase reference for the email -> username index entry"""
+        return (self.db.collection('users').document('students').collection('emails')
+                .document(quote(normalize_email(email), safe='@+')))
+
+    def find_profile_by_email(self, email):
+        doc = self._email_ref(email).get(**self._rpc())
+        if doc.exists:
+            username = doc.to_dict().get('username')
+            profile = self.get_profile(username)
+            if profile is not None:
+                return username, profile
+        # Profiles created before the email index existed
+        query = self._profiles().where('email', '==', email).limit(1)
+        for doc in query.get(**self._rpc()):
+            return doc.id, doc.to_dict()
+        return None, None
+
+    def create_profile(self, username, profile):
+        batch = self.db.batch()
+        batch.set(self._profile_ref(username), profile)
+        if profile.get('email'):
+            batch.set(self._email_ref(profile['email']), {'username': username})
+        batch.commit(**self._rpc())
+
+    def create_profile_unique(self, username, profile):
+        from google.api_core.exceptions import AlreadyExists as DocumentExists, Conflict
+
+        # create() fails if the document exists and a batch commits atomically,
+        # so both keys are checked and claimed in a single round trip
+        batch = self.db.batch()
+        batch.create(self._profile_ref(username), profile)
+        batch.create(self._email_ref(profile['email']), {'username': username})
+        try:
+            batch.commit(**self._rpc())
+        except (DocumentExists, Conflict):
+            # Only the failure path pays for finding out which key was taken
+            if self._profile_ref(username).get(field_paths=['username'], **self._rpc()).exists:
+                raise UsernameTaken(username)
+            raise EmailTaken(profile['email'])
+
+    def backfill_email_index(self, batch_size=MAX_BATCH_WRITES):
+        claimed = 0
+        pending = {}
+        for username, profile in self.list_profiles(fields=['email']):
+            email = normalize_email(profile.get('email'))
+            # Profiles are listed by username, so the first one to use an email keeps it
+            if email and email not in pending:
+                pending[email] = username
+            if len(pending) == batch_size:
+                claimed += self._claim_emails(pending)
+                pending = {}
+        if pending:
+            claimed += self._claim_emails(pending)
+        return claimed
+
+    def _claim_emails(self, pending):
+        """Claim the unclaimed ones of {email: username} in one batch; returns how many were claimed
+
+        Only "already exists" is expected (a registration claimed an email
+        since the lookup); any other error is raised, so an incomplete
+        backfill never looks like a finished one.
+        """
+        from google.api_core.exceptions import AlreadyExists as DocumentExists, Conflict
+
+        owners = self.email_owners(list(pending))
+        unclaimed = {email: username for email, username in pending.items() if email not in owners}
+        if not unclaimed:
+            return 0
+        batch = self.db.batch()
+        for email, username in unclaimed.items():
+            batch.create(self._email_ref(email), {'username': username})
+        try:
+            batch.commit(**self._rpc())
+            return len(unclaimed)
+        except (DocumentExists, Conflict):
+            pass
+        # The batch is all or nothing; claim its emails one at a time to skip the taken ones
+        claimed = 0
+        for email, username in unclaimed.items():
+            try:
+                self._email_ref(email).create({'username': username}, **self._rpc())
+                claimed += 1
+            except (DocumentExists, Conflict):
+                pass
+        return claimed
+
+    def existing_profiles(self, usernames):
+        refs = [self._profile_ref(username) for username in usernames]
+        return {doc.id for doc in self.db.get_all(refs, field_paths=['username'], **self._rpc()) if doc.exists}
+
+    def email_owners(self, emails):
+        refs = [self._email_ref(email) for email in emails]
+        owners = {}
+        for doc in self.db.get_all(refs, **self._rpc()):
+            if doc.exists:
+                owners[unquote(doc.id)] = doc.to_dict().get('username')
+        return owners
+
+    def bulk_write(self, profiles=(), documents=(), updated_at=None):
+        from google.cloud import firestore
+
+        if batch_writes(profiles, documents) > MAX_BATCH_WRITES:
+            raise ValueError(f'A batch holds at most {MAX_BATCH_WRITES} writes')
+        batch = self.db.batch()
+        for username, profile in profiles:
+            batch.set(self._profile_ref(username), profile)
+            if profile.get('email'):
+                batch.set(self._email_ref(profile['email']), {'username': username})
+        for username, data_type, data in documents:
+            # Listing the fields replaces data whole and keeps counting versions from the stored one
+            batch.set(
+                self._data_ref(username).document(data_type),
+                {'data': data, 'updated_at': updated_at, 'version': firestore.Increment(1)},
+                merge=['data', 'updated_at', 'version']
+            )
+        batch.commit(**self._rpc())
+
+    def list_data(self, username):
+        # The calculations document only anchors the history subcollections
+        return {doc.id: doc.to_dict() for doc in self._data_ref(username).stream(**self._rpc()) if doc.id != 'calculations'}
+
+    def get_data(self, username, data_type):
+        doc = self._data_ref(username).document(data_type).get(**self._rpc())
+        if doc.exists:
+            return doc.to_dict()
+        return None
+
+    def set_data(self, username, data_type, document):
+        self._data_ref(username).document(data_type).set(document, **self._rpc())
+
+    def get_data_fields(self, username, data_type, keys):
+        field_paths = [f'data.{key}' for key in keys] + ['updated_at', 'version']
+        doc = self._data_ref(username).document(data_type).get(field_paths=field_paths, **self._rpc())
+        if not doc.exists:
+            return None
+        document = doc.to_dict()
+        data = document.get('data') or {}
+        return {
+            'data': {key: data.get(key) for key in keys},
+            'updated_at': document.get('updated_at'),
+            'version': document.get('version', 0)
+        }
+
+    def update_data(self, username, data_type, modify, keys=None, expected_version=None, updated_at=None):
+        from google.cloud import firestore
+
+        ref = self._data_ref(username).document(data_type)
+        field_paths = None if keys is None else [f'data.{key}' for key in keys] + ['version']
+
+        @firestore.transactional
+        def run(transaction):
+            doc = ref.get(field_paths=field_paths, transaction=transaction, **self._rpc())
+            document = doc.to_dict() if doc.exists else {}
+            version = document.get('version', 0)
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(version)
+            data = document.get('data') or {}
+            if keys is None:
+                values = modify(data)
+                transaction.set(ref, {'data': values, 'updated_at': updated_at, 'version': version + 1})
+            else:
+                values = modify({key: data.get(key) for key in keys})
+                if doc.exists:
+                    # Field paths replace each listed key whole (a merge would keep removed map
+                    # entries) and leave the document's other keys alone
+                    changes = {f'data.{key}': value for key, value in values.items()}
+                    changes.update({'updated_at': updated_at, 'version': version + 1})
+                    transaction.update(ref, changes)
+                else:
+                    transaction.set(ref, {'data': values, 'updated_at': updated_at, 'version': version + 1})
+            return version + 1, values
+
+        return run(self.db.transaction())
+
+    def list_profiles(self, fields=None, start_after=None, limit=None):
+        query = self._profiles().order_by('username')
+        if fields:
+            # Projection: only these fields are sent over the wire
+            query = query.select(list(fields))
+        if start_after:
+            query = query.start_after({'username': start_after})
+        if limit:
+            query = query.limit(limit)
+        for doc in query.stream():
+            yield doc.id, doc.to_dict()
+
+    def _cohorts(self):
+        """Get Firebase reference for the cohort aggregates collection"""
+        return self.db.collection('analytics').document('cohorts').collection('groups')
+
+    def increment_cohort(self, key, labels, deltas, updated_at=None):
+        from google.cloud import firestore
+
+        def increments(values):
+            return {k: increments(v) if isinstance(v, dict) else firestore.Increment(v) for k, v in values.items()}
+
+        # Increment transforms are applied server side, so concurrent writers never conflict
+        self._cohorts().document(key).set(dict(labels, updated_at=updated_at, **increments(deltas)), merge=True, **self._rpc())
+
+    def get_cohort(self, key):
+        doc = self._cohorts().document(key).get(**self._rpc())
+        return doc.to_dict() if doc.exists else None
+
+    def list_cohorts(self):
+        for doc in self._cohorts().stream():
+            yield doc.id, doc.to_dict()
+
+    def replace_cohorts(self, cohorts):
+        batch = self.db.batch()
+        writes = 0
+        for doc in self._cohorts().select([]).stream():
+            if doc.id not in cohorts:
+                batch.delete(doc.reference)
+                writes += 1
+        for key, aggregate in cohorts.items():
+            batch.set(self._cohorts().document(key), aggregate)
+            writes += 1
+            if writes >= MAX_BATCH_WRITES:
+                batch.commit(**self._rpc())
+                batch = self.db.batch()
+                writes = 0
+        batch.commit(**self._rpc())
+
+    def _history_record_ref(self, username, calc_type, record):
+        # Timestamp-prefixed ids keep records in write order and never collide
+        record_id = f"{record['timestamp']}_{uuid.uuid4().hex[:8]}"
+        return self._history_ref(username, calc_type).document(record_id)
+
+    def append_history(self, username, calc_type, record):
+        self._history_record_ref(username, calc_type, record).set(record, **self._rpc())
+
+    def append_history_many(self, username, calc_type, records):
+        # A Firestore batch holds at most 500 writes
+        for start in range(0, len(records), 500):
+            batch = self.db.batch()
+            for record in records[start:start + 500]:
+                batch.set(self._history_record_ref(username, calc_type, record), record)
+            batch.commit(**self._rpc())
+
+    def list_history(self, username, calc_type, before=None, limit=10):
+        query = self._history_ref(username, calc_type)
+        if before:
+            query = query.where('timestamp', '<', before)
+        query = query.order_by('timestamp', direction='DESCENDING').limit(limit)
+        return [doc.to_dict() for doc in query.stream(**self._rpc())]
+
+    def trim_history(self, username, calc_type, keep):
+        query = (self._history_ref(username, calc_type)
+                 .order_by('timestamp', direction='DESCENDING')
+                 .offset(keep)
+                 .select([]))
+        removed = 0
+        batch = self.db.batch()
+        for doc in query.stream(**self._rpc()):
+            batch.delete(doc.reference)
+            removed += 1
+            if removed % 500 == 0:
+                batch.commit(**self._rpc())
+                batch = self.db.batch()
+        if removed % 500:
+            batch.commit(**self._rpc())
+        return removed
+
+    def ping(self):
+        self.db.collection('users').document('students').get(field_paths=[], **self._rpc())
+
+    def is_transient(self, error):
+        from google.api_core import exceptions
+
+        return super().is_transient(error) or isinstance(error, (
+            exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.InternalServerError,
+            exceptions.TooManyRequests, exceptions.GatewayTimeout, exceptions.RetryError
+        ))
+
+
+class SQLiteStorage(StorageBackend):
+    """Storage backed by a local SQLite database in WAL mode
+
+    Connections are opened lazily and kept in a fixed-size pool shared by all
+    request threads, so each request borrows an already-open connection
+    instead of paying the connect and PRAGMA cost.
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS profiles ('
+        ' username TEXT PRIMARY KEY,'
+        ' email TEXT,'
+        ' doc TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS profiles_email ON profiles (email)',
+        'CREATE TABLE IF NOT EXISTS emails ('
+        ' email TEXT PRIMARY KEY,'
+        ' username TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS user_data ('
+        ' username TEXT NOT NULL,'
+        ' data_type TEXT NOT NULL,'
+        ' doc TEXT NOT NULL,'
+        ' PRIMARY KEY (username, data_type))',
+        'CREATE TABLE IF NOT EXISTS history ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+        ' username TEXT NOT NULL,'
+        ' calc_type TEXT NOT NULL,'
+        ' timestamp TEXT NOT NULL,'
+        ' record TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS history_user_type_time ON history (username, calc_type, timestamp)',
+        'CREATE TABLE IF NOT EXISTS cohorts ('
+        ' key TEXT PRIMARY KEY,'
+        ' doc TEXT NOT NULL)',
+    )
+
+    def __init__(self, path, pool_size=5, timeout=30.0):
+        if path == ':memory:':
+            raise ValueError("SQLiteStorage needs a file path; ':memory:' is not shared between pooled connections")
+        self.path = path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._opened = 0
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+        with self._connection() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection, opening a new one while under pool_size
+
+        Waiting for a connection or a lock is capped by what is left of the request's budget.
+        """
+        timeout = call_timeout(self.timeout)
+        conn = None
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._opened < self._pool_size:
+                    self._opened += 1
+                    conn = self._connect()
+            if conn is None:
+                conn = self._pool.get(timeout=timeout)
+        limited = timeout < self.timeout
+        try:
+            if limited:
+                conn.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+            yield conn
+        finally:
+            try:
+                if limited:
+                    conn.execute(f'PRAGMA busy_timeout = {int(self.timeout * 1000)}')
+            finally:
+                self._pool.put(conn)
+
+    def get_profile(self, username):
+        with self._connection() as conn:
+            row = conn.execute('SELECT doc FROM profiles WHERE username = ?', (username,)).fetchone()
+        return json.loads(row['doc']) if row else None
+
+    def find_profile_by_email(self, email):
+        with self._connection() as conn:
+            row = conn.execute(
+                'SELECT p.username, p.doc FROM emails e JOIN profiles p ON p.username = e.username WHERE e.email = ?',
+                (normalize_email(email),)
+            ).fetchone()
+            if row is None:
+                # Profiles created before the email index existed
+                row = conn.execute('SELECT username, doc FROM profiles WHERE email = ? LIMIT 1', (email,)).fetchone()
+        if row:
+            return row['username'], json.loads(row['doc'])
+        return None, None
+
+    def create_profile(self, username, profile):
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO profiles (username, email, doc) VALUES (?, ?, ?)',
+                    (username, profile.get('email'), json.dumps(profile))
+                )
+                if profile.get('email'):
+                    conn.execute(
+                        'INSERT OR REPLACE INTO emails (email, username) VALUES (?, ?)',
+                        (normalize_email(profile['email']), username)
+                    )
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def create_profile_unique(self, username, profile):
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                try:
+                    conn.execute(
+                        'INSERT INTO profiles (username, email, doc) VALUES (?, ?, ?)',
+                        (username, profile.get('email'), json.dumps(profile))
+                    )
+                except sqlite3.IntegrityError:
+                    raise UsernameTaken(username)
+                try:
+                    conn.execute(
+                        'INSERT INTO emails (email, username) VALUES (?, ?)',
+                        (normalize_email(profile['email']), username)
+                    )
+                except sqlite3.IntegrityError:
+                    raise EmailTaken(profile['email'])
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def backfill_email_index(self):
+        with self._connection() as conn:
+            # Only an email that is already claimed is skipped; any other failure raises
+            cursor = conn.execute(
+                'INSERT INTO emails (email, username)'
+                ' SELECT lower(trim(email)), username FROM profiles'
+                ' WHERE email IS NOT NULL AND email != \'\' ORDER BY username'
+                ' ON CONFLICT (email) DO NOTHING'
+            )
+        return cursor.rowcount
+
+    def _select_in(self, sql, values):
+        # Chunked to stay under SQLite's bound-parameter limit
+        values = list(values)
+        rows = []
+        with self._connection() as conn:
+            for start in range(0, len(values), 500):
+                chunk = values[start:start + 500]
+                rows.extend(conn.execute(sql.format(', '.join('?' * len(chunk))), chunk).fetchall())
+        return rows
+
+    def existing_profiles(self, usernames):
+        return {row[0] for row in self._select_in('SELECT username FROM profiles WHERE username IN ({})', usernames)}
+
+    def email_owners(self, emails):
+        rows = self._select_in('SELECT email, username FROM emails WHERE email IN ({})', {normalize_email(e) for e in emails})
+        return {row[0]: row[1] for row in rows}
+
+    def bulk_write(self, profiles=(), documents=(), updated_at=None):
+        if batch_writes(profiles, documents) > MAX_BATCH_WRITES:
+            raise ValueError(f'A batch holds at most {MAX_BATCH_WRITES} writes')
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO profiles (username, email, doc) VALUES (?, ?, ?)',
+                    [(username, profile.get('email'), json.dumps(profile)) for username, profile in profiles]
+                )
+                conn.executemany(
+                    'INSERT OR REPLACE INTO emails (email, username) VALUES (?, ?)',
+                    [(normalize_email(profile['email']), username) for username, profile in profiles if profile.get('email')]
+                )
+                conn.executemany(
+                    'INSERT INTO user_data (username, data_type, doc) VALUES (?, ?, ?)'
+                    ' ON CONFLICT (username, data_type) DO UPDATE SET doc = json_set(excluded.doc, \'$.version\','
+                    ' COALESCE(json_extract(user_data.doc, \'$.version\'), 0) + 1)',
+                    [(username, data_type, json.dumps({'data': data, 'updated_at': updated_at, 'version': 1}))
+                     for username, data_type, data in documents]
+                )
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def list_data(self, username):
+        with self._connection() as conn:
+            rows = conn.execute('SELECT data_type, doc FROM user_data WHERE username = ?', (username,)).fetchall()
+        return {row['data_type']: json.loads(row['doc']) for row in rows}
+
+    def get_data(self, username, data_type):
+        with self._connection() as conn:
+            row = conn.execute(
+                'SELECT doc FROM user_data WHERE username = ? AND data_type = ?', (username, data_type)
+            ).fetchone()
+        return json.loads(row['doc']) if row else None
+
+    def set_data(self, username, data_type, document):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO user_data (username, data_type, doc) VALUES (?, ?, ?)',
+                (username, data_type, json.dumps(document))
+            )
+
+    def update_data(self, username, data_type, modify, keys=None, expected_version=None, updated_at=None):
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT doc FROM user_data WHERE username = ? AND data_type = ?', (username, data_type)
+                ).fetchone()
+                document = json.loads(row['doc']) if row else {}
+                version = document.get('version', 0)
+                if expected_version is not None and expected_version != version:
+                    raise VersionConflict(version)
+                data = document.get('data') or {}
+                if keys is None:
+                    values = modify(data)
+                    data = values
+                else:
+                    values = modify({key: data.get(key) for key in keys})
+                    data.update(values)
+                conn.execute(
+                    'INSERT OR REPLACE INTO user_data (username, data_type, doc) VALUES (?, ?, ?)',
+                    (username, data_type, json.dumps({'data': data, 'updated_at': updated_at, 'version': version + 1}))
+                )
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        return version + 1, values
+
+    def list_profiles(self, fields=None, start_after=None, limit=None):
+        if fields:
+            # Extract only the requested fields instead of decoding whole profiles
+            columns = ', '.join('json_extract(doc, ?)' for _ in fields)
+            params = [f'$.{field}' for field in fields]
+        else:
+            columns = 'doc'
+            params = []
+        sql = f'SELECT username, {columns} FROM profiles'
+        if start_after:
+            sql += ' WHERE username > ?'
+            params.append(start_after)
+        sql += ' ORDER BY username'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self._connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        for row in rows:
+            if fields:
+                yield row[0], {field: value for field, value in zip(fields, tuple(row)[1:]) if value is not None}
+            else:
+                yield row[0], json.loads(row[1])
+
+    def increment_cohort(self, key, labels, deltas, updated_at=None):
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT doc FROM cohorts WHERE key = ?', (key,)).fetchone()
+                aggregate = add_nested(json.loads(row['doc']) if row else {}, deltas)
+                aggregate.update(labels, updated_at=updated_at)
+                conn.execute('INSERT OR REPLACE INTO cohorts (key, doc) VALUES (?, ?)', (key, json.dumps(aggregate)))
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def get_cohort(self, key):
+        with self._connection() as conn:
+            row = conn.execute('SELECT doc FROM cohorts WHERE key = ?', (key,)).fetchone()
+        return json.loads(row['doc']) if row else None
+
+    def list_cohorts(self):
+        with self._connection() as conn:
+            rows = conn.execute('SELECT key, doc FROM cohorts ORDER BY key').fetchall()
+        for row in rows:
+            yield row['key'], json.loads(row['doc'])
+
+    def replace_cohorts(self, cohorts):
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM cohorts')
+                conn.executemany('INSERT INTO cohorts (key, doc) VALUES (?, ?)',
+                                 [(key, json.dumps(aggregate)) for key, aggregate in cohorts.items()])
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def append_history(self, username, calc_type, record):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO history (username, calc_type, timestamp, record) VALUES (?, ?, ?, ?)',
+                (username, calc_type, record['timestamp'], json.dumps(record))
+            )
+
+    def append_history_many(self, username, calc_type, records):
+        with self._connection() as conn:
+            conn.execute('BEGIN')
+            try:
+                conn.executemany(
+                    'INSERT INTO history (username, calc_type, timestamp, record) VALUES (?, ?, ?, ?)',
+                    [(username, calc_type, record['timestamp'], json.dumps(record)) for record in records]
+                )
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def list_history(self, username, calc_type, before=None, limit=10):
+        sql = 'SELECT record FROM history WHERE username = ? AND calc_type = ?'
+        params = [username, calc_type]
+        if before:
+            sql += ' AND timestamp < ?'
+            params.append(before)
+        sql += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+        params.append(limit)
+        with self._connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [json.loads(row['record']) for row in rows]
+
+    def trim_history(self, username, calc_type, keep):
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'DELETE FROM history WHERE id IN ('
+                ' SELECT id FROM history WHERE username = ? AND calc_type = ?'
+                ' ORDER BY timestamp DESC, id DESC LIMIT -1 OFFSET ?)',
+                (username, calc_type, keep)
+            )
+        return cursor.rowcount
+
+    def is_transient(self, error):
+        # A full pool or a lock held past the timeout; other errors are answers, not outages
+        if isinstance(error, sqlite3.OperationalError):
+            return 'locked' in str(error) or 'busy' in str(error)
+        return super().is_transient(error) or isinstance(error, queue.Empty)
+
+    def ping(self):
+        with self._connection() as conn:
+            conn.execute('SELECT 1').fetchone()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class GuardedStorage:
+    """Wrap a backend so its calls fail explicitly and quickly instead of hanging
+
+    Every interface call is checked against the request's deadline budget
+    (see resilience.set_deadline) before it starts.  Reads that fail with a
+    transient error are retried with jittered backoff while the budget
+    allows; writes are not, since one that timed out may still have been
+    applied.  A circuit breaker shared by all calls refuses them while
+    storage keeps failing.  Failures surface as StorageUnavailable, never as
+    empty results.  Generators (list_profiles, list_cohorts) feed long
+    exports and pass through unguarded.
+    """
+
+    # Calls that change nothing, so repeating one after a failure is safe
+    READS = frozenset({
+        'get_profile', 'find_profile_by_email', 'existing_profiles', 'email_owners', 'list_data',
+        'get_data', 'get_data_fields', 'get_cohort', 'list_history', 'ping'
+    })
+    STREAMS = frozenset({'list_profiles', 'list_cohorts'})
+
+    def __init__(self, backend, breaker=None, retries=2, backoff=0.05, max_backoff=1.0):
+        self.backend = backend
+        self.name = backend.name
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.retried = 0
+        self.failed = 0
+
+    def __getattr__(self, attr):
+        value = getattr(self.backend, attr)
+        if attr in self.STREAMS or attr.startswith('_') or not hasattr(StorageBackend, attr) or attr in ('close', 'is_transient'):
+            return value
+        attempts = 1 + (self.retries if attr in self.READS else 0)
+
+        def call(*args, **kwargs):
+            for attempt in range(attempts):
+                check_deadline()
+                trial = self.breaker.before()
+                try:
+                    result = value(*args, **kwargs)
+                except Exception as e:
+                    transient = self.backend.is_transient(e)
+                    self.breaker.record(not transient, trial)
+                    if not transient:
+                        raise
+                    delay = backoff_delay(attempt, self.backoff, self.max_backoff)
+                    left = time_left()
+                    if (attempt + 1 == attempts or isinstance(e, DeadlineExceeded)
+                            or (left is not None and left <= delay)):
+                        with self._lock:
+                            self.failed += 1
+                        if isinstance(e, StorageUnavailable):
+                            raise
+                        raise StorageUnavailable(f'Storage {attr} failed: {e}') from e
+                    with self._lock:
+                        self.retried += 1
+                    time.sleep(delay)
+                else:
+                    self.breaker.record(True, trial)
+                    return result
+        return call
+
+    def stats(self):
+        with self._lock:
+            counts = {'retried': self.retried, 'failed': self.failed}
+        return dict(self.breaker.stats(), **counts)
+
+
+BACKENDS = {
+    'firestore': FirestoreStorage,
+    'sqlite': SQLiteStorage,
+}
+
+SETTINGS = ('STORAGE_BACKEND', 'SQLITE_PATH', 'SQLITE_POOL_SIZE', 'STORAGE_TIMEOUT', 'STORAGE_RETRIES',
+            'STORAGE_BREAKER_RATIO', 'STORAGE_BREAKER_MIN_CALLS', 'STORAGE_BREAKER_OPEN_SECONDS')
+
+_storage = None
+_storage_lock = threading.Lock()
+_settings = {}
+
+
+def configure_storage(config):
+    """Take STORAGE_BACKEND / SQLITE_* settings from config instead of the environment
+
+    Only affects backends created afterwards, i.e. on first use in each process.
+    """
+    _settings.update({key: config[key] for key in SETTINGS if config.get(key) is not None})
+
+
+def _setting(key, default):
+    return _settings.get(key, os.getenv(key, default))
+
+
+def create_storage(backend=None):
+    """Create a storage backend from STORAGE_BACKEND / SQLITE_* settings"""
+    backend = (backend or _setting('STORAGE_BACKEND', 'firestore')).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+    timeout = float(_setting('STORAGE_TIMEOUT', '10'))
+    if backend == 'sqlite':
+        return SQLiteStorage(
+            _setting('SQLITE_PATH', 'cgpa.db'),
+            pool_size=int(_setting('SQLITE_POOL_SIZE', '5')),
+            timeout=timeout
+        )
+    return FirestoreStorage(timeout=timeout)
+
+
+def guard_storage(backend):
+    """Wrap a backend in GuardedStorage with the STORAGE_RETRIES / STORAGE_BREAKER_* settings"""
+    breaker = CircuitBreaker(
+        min_calls=int(_setting('STORAGE_BREAKER_MIN_CALLS', '10')),
+        failure_ratio=float(_setting('STORAGE_BREAKER_RATIO', '0.5')),
+        open_seconds=float(_setting('STORAGE_BREAKER_OPEN_SECONDS', '15'))
+    )
+    return GuardedStorage(backend, breaker=breaker, retries=int(_setting('STORAGE_RETRIES', '2')))
+
+
+def get_storage():
+    """Return the process-wide storage backend, creating it on first use"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = guard_storage(create_storage())
+    return _storage
+
+
+def storage_status():
+    """Configured backend name and whether this process has created its client yet"""
+    storage = _storage
+    return {
+        'backend': storage.name if storage is not None else _setting('STORAGE_BACKEND', 'firestore').lower(),
+        'connected': storage is not None,
+        'circuit': storage.stats() if isinstance(storage, GuardedStorage) else None
+    }
+
+
+def _reset_after_fork():
+    # The parent's clients, connections and locks are not safe to use in the
+    # child; drop them without closing and let the child connect on first use
+    global _storage, _storage_lock
+    _storage = None
+    _storage_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def set_storage(backend):
+    """Replace the process-wide storage backend, e.g. with a stand-in for benchmarks"""
+    global _storage
+    with _storage_lock:
+        _storage = guard_storage(backend)
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import uuid
+
+import pytest
+
+# app.py reads its settings at import time: a throwaway SQLite database, inline password
+# hashing and no rate limits, since every test client shares one address
+os.environ.update({
+    'STORAGE_BACKEND': 'sqlite',
+    'SQLITE_PATH': os.path.join(tempfile.mkdtemp(), 'test.db'),
+    'PASSWORD_HASH_WORKERS': '0',
+    'RATE_LIMIT_CALCULATE_USER': '0',
+    'RATE_LIMIT_CALCULATE_IP': '0',
+    'RATE_LIMIT_LOGIN_IP': '0',
+    'RATE_LIMIT_LOGIN_ACCOUNT': '0',
+    'RATE_LIMIT_REGISTER_IP': '0',
+})
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only moves when a test moves it"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app
+    return app
+
+
+def logged_in_client(app_module, role='student'):
+    client = app_module.app.test_client()
+    username = f'{role}-{uuid.uuid4().hex[:8]}'
+    form = dict(student_name='Student', username=username, email=f'{username}@example.com', student_id='1',
+                phone='1', college='College', course='B.Tech', from_year='2022', to_year='2026',
+                password='secret1', confirm_password='secret1')
+    assert client.post('/register', data=form).status_code == 302
+    if role == 'admin':
+        result = app_module.app.test_cli_runner().invoke(args=['grant-admin', username])
+        assert result.exit_code == 0, result.output
+    assert client.post('/login', data={'username': username, 'password': 'secret1'}).status_code == 302
+    client.username = username
+    return client
+
+
+@pytest.fixture
+def client(app_module):
+    """Test client logged in as a newly registered student"""
+    return logged_in_client(app_module)
+
+
+@pytest.fixture
+def admin_client(app_module):
+    """Test client logged in as a newly registered admin"""
+    return logged_in_client(app_module, 'admin')
@@ -0,0 +1,57 @@
+import json
+
+
+def assert_cannot_list_users(client):
+    for query in ('', '?format=csv', '?format=ndjson'):
+        response = client.get('/admin/users' + query)
+        assert response.status_code == 403
+        assert response.get_json() == {'error': 'Admin access required'}
+
+
+def test_students_cannot_list_users(client):
+    assert_cannot_list_users(client)
+
+
+def test_a_role_sent_at_registration_does_not_unlock_the_user_list(app_module):
+    client = app_module.app.test_client()
+    form = dict(student_name='Eve', username='eve', email='eve@example.com', student_id='1', phone='1',
+                college='College', course='B.Tech', from_year='2022', to_year='2026',
+                password='secret1', confirm_password='secret1', role='admin')
+    client.post('/register', data=form)
+    client.post('/login', data={'username': 'eve', 'password': 'secret1'})
+    assert_cannot_list_users(client)
+
+
+def test_revoked_admins_cannot_list_users(admin_client, app_module):
+    assert admin_client.get('/admin/users').status_code == 200
+    result = app_module.app.test_cli_runner().invoke(args=['grant-admin', '--revoke', admin_client.username])
+    assert result.exit_code == 0, result.output
+    assert_cannot_list_users(admin_client)
+
+
+def test_admins_can_list_users(admin_client, client):
+    response = admin_client.get('/admin/users?format=ndjson')
+    assert response.status_code == 200
+    usernames = {json.loads(line)['username'] for line in response.get_data(as_text=True).splitlines()}
+    assert {admin_client.username, client.username} <= usernames
+
+
+def test_registering_with_an_admin_role_does_not_grant_it(app_module):
+    client = app_module.app.test_client()
+    form = dict(student_name='Mallory', username='mallory', email='mallory@example.com', student_id='1',
+                phone='1', college='College', course='B.Tech', from_year='2022', to_year='2026',
+                password='secret1', confirm_password='secret1', role='admin')
+    assert client.post('/register', data=form).status_code == 302
+    assert client.post('/login', data={'username': 'mallory', 'password': 'secret1'}).status_code == 302
+    assert app_module.get_storage().get_profile('mallory')['role'] == 'student'
+
+    for method, path in [('GET', '/admin/export'), ('POST', '/admin/import?kind=profiles&overwrite=1'),
+                         ('GET', '/admin/analytics')]:
+        response = client.open(path, method=method, data=b'{}')
+        assert response.status_code == 403, path
+
+
+def test_admin_usernames_allow_list(client, app_module, monkeypatch):
+    assert client.get('/admin/analytics').status_code == 403
+    monkeypatch.setattr(app_module, 'ADMIN_USERNAMES', frozenset({client.username}))
+    assert client.get('/admin/analytics').status_code != 403
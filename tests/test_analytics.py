@@ -0,0 +1,33 @@
+import uuid
+
+from analytics import cohort_key, rebuild_cohorts, summarize
+
+
+def test_rebuild_matches_incremental_aggregates_for_a_batch(app_module):
+    client = app_module.app.test_client()
+    username = f'student-{uuid.uuid4().hex[:8]}'
+    college = f'College {username}'
+    form = dict(student_name='Student', username=username, email=f'{username}@example.com', student_id='1',
+                phone='1', college=college, course='B.Tech', from_year='2022', to_year='2026',
+                password='secret1', confirm_password='secret1')
+    client.post('/register', data=form)
+    client.post('/login', data={'username': username, 'password': 'secret1'})
+
+    subjects = [{'subject_name': 'Maths', 'attended': 30, 'total': 40},
+                {'subject_name': 'Physics', 'attended': 20, 'total': 40},
+                {'subject_name': 'Chemistry', 'attended': 40, 'total': 40}]
+    assert client.post('/api/calculate_attendance/batch', json={'subjects': subjects}).status_code == 200
+    app_module.history_writer.flush(5)
+    app_module.cohort_analytics.flush(5)
+
+    storage = app_module.get_storage()
+    key = cohort_key(college, 'B.Tech', '2026')
+    incremental = summarize(storage.get_cohort(key))
+    assert incremental['attendance']['mean_percent'] == 75.0
+    assert incremental['attendance']['at_risk'] == 1
+
+    rebuild_cohorts(storage)
+    rebuilt = summarize(storage.get_cohort(key))
+    for aggregate in (incremental, rebuilt):
+        aggregate.pop('updated_at')
+    assert rebuilt == incremental
@@ -0,0 +1,83 @@
+from datetime import date
+
+from attendance import OccurrenceIndex, occurrence_id, projection, subject_key, validate_term
+
+
+def make_term(start, end, **extra):
+    return validate_term(dict({'start': start, 'end': end}, **extra))
+
+
+TIMETABLE = {
+    'monday': [{'id': 'mon-math', 'subjectName': 'Maths', 'startTime': '09:00', 'endTime': '10:00'}],
+    'wednesday': [{'id': 'wed-math', 'subjectName': 'maths ', 'startTime': '09:00', 'endTime': '10:00'},
+                  {'id': 'wed-phy', 'subjectName': 'Physics', 'startTime': '10:00', 'endTime': '11:00'}]
+}
+
+
+def test_index_counts_meetings_and_skips_no_class_dates():
+    term = make_term('2025-06-02', '2025-06-15', no_class_dates=['2025-06-09'])
+    index = OccurrenceIndex(TIMETABLE, term)
+    maths, physics = subject_key('Maths'), subject_key('Physics')
+    # Mondays 2 and 9 (closed), Wednesdays 4 and 11
+    assert index.total(maths) == 3
+    assert index.total(physics) == 2
+    assert index.held(maths, date(2025, 6, 4)) == 2
+    assert index.between(maths, date(2025, 6, 4), date(2025, 6, 15)) == 1
+    assert index.slot_subject(date(2025, 6, 4), 'wed-phy') == physics
+
+
+def test_slot_subject_rejects_days_the_slot_does_not_meet():
+    term = make_term('2025-06-02', '2025-06-15', no_class_dates=['2025-06-09'])
+    index = OccurrenceIndex(TIMETABLE, term)
+    for day, slot in [(date(2025, 6, 9), 'mon-math'), (date(2025, 6, 3), 'mon-math'), (date(2025, 6, 16), 'mon-math')]:
+        try:
+            index.slot_subject(day, slot)
+        except KeyError:
+            continue
+        raise AssertionError(f'{slot} should not meet on {day}')
+
+
+def test_missed_classes_lower_the_projection():
+    term = make_term('2025-06-02', '2025-06-15', no_class_dates=['2025-06-09'], min_required=75)
+    index = OccurrenceIndex(TIMETABLE, term)
+    key = subject_key('Physics')
+    data = {'term': term, key: {'name': 'Physics', 'attended': 0, 'missed': 1,
+                                'marks': {occurrence_id(date(2025, 6, 4), 'wed-phy'): 'missed'}}}
+    result = projection(index, data, date(2025, 6, 5))
+    physics = next(s for s in result['subjects'] if s['key'] == key)
+    assert physics['current_percent'] == 0
+    assert physics['remaining'] == 1
+    assert physics['risk'] == 'cannot_recover'
+    assert 'Physics' in result['aggregate']['at_risk_subjects']
+
+
+def test_fully_attended_subject_is_safe_once_the_term_has_ended():
+    term = make_term('2025-06-02', '2025-10-31')
+    index = OccurrenceIndex({'monday': TIMETABLE['monday']}, term)
+    result = projection(index, {'term': term}, date(2025, 11, 5))
+    maths = result['subjects'][0]
+    assert maths['remaining'] == 0
+    assert maths['current_percent'] == 100
+    assert maths['risk'] == 'safe'
+    assert result['aggregate']['at_risk_subjects'] == []
+
+
+def test_subject_with_no_classes_to_spare_is_at_risk():
+    term = make_term('2025-06-02', '2025-06-29', min_required=75)
+    index = OccurrenceIndex({'monday': TIMETABLE['monday']}, term)
+    key = subject_key('Maths')
+    # 4 Mondays; one already missed leaves exactly 75% with every other one attended
+    data = {'term': term, key: {'name': 'Maths', 'attended': 0, 'missed': 1,
+                                'marks': {occurrence_id(date(2025, 6, 2), 'mon-math'): 'missed'}}}
+    maths = projection(index, data, date(2025, 6, 3))['subjects'][0]
+    assert maths['can_skip'] == 0
+    assert maths['risk'] == 'at_risk'
+
+
+def test_projection_up_to_a_date():
+    term = make_term('2025-06-02', '2025-06-29', min_required=75)
+    index = OccurrenceIndex({'monday': TIMETABLE['monday']}, term)
+    maths = projection(index, {'term': term}, date(2025, 6, 10), until=date(2025, 6, 23))['subjects'][0]
+    # 2 and 9 June attended; 16 and 23 June are left, and one of them can be missed
+    assert maths['by_date'] == {'date': '2025-06-23', 'classes': 2, 'can_skip': 1}
+    assert maths['can_skip'] == 1
@@ -0,0 +1,91 @@
+import io
+import json
+import threading
+
+from bulk import BulkImport, iter_items, import_upload, read_checkpoint, write_checkpoint
+from storage import SQLiteStorage
+
+
+def upload(*rows):
+    return io.BytesIO(''.join(json.dumps(row) + '\n' for row in rows).encode('utf-8'))
+
+
+def profile_row(username, **extra):
+    return dict({'username': username, 'email': f'{username}@example.com', 'password_hash': 'x'}, **extra)
+
+
+ROWS = [profile_row('u1'), profile_row('u2'), {'username': 'u3'}, profile_row('u4'), profile_row('u5')]
+
+
+def test_import_reports_bad_rows_and_checkpoints_past_them(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'import.db'))
+    summary = import_upload(storage, upload(*ROWS), 'profiles', 'ndjson', batch_size=4)
+    assert summary['checkpoint'] == summary['rows'] == 5
+    assert summary['profiles_written'] == 4
+    assert summary['errors'] == [{'row': 3, 'username': 'u3', 'error': 'email is required'}]
+    assert storage.existing_profiles(['u1', 'u2', 'u3', 'u4', 'u5']) == {'u1', 'u2', 'u4', 'u5'}
+
+
+def test_resume_starts_after_the_checkpoint(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'import.db'))
+    import_upload(storage, upload(*ROWS[:2]), 'profiles', 'ndjson')
+
+    summary = import_upload(storage, upload(*ROWS), 'profiles', 'ndjson', skip_rows=3)
+    assert summary['checkpoint'] == 5
+    assert summary['profiles_written'] == 2
+    assert summary['error_count'] == 0
+    assert storage.existing_profiles(['u3', 'u4', 'u5']) == {'u4', 'u5'}
+
+
+def test_grouped_rows_checkpoint_after_the_whole_user():
+    slot = {'startTime': '09:00', 'endTime': '10:00'}
+    rows = [dict(slot, username='a', day='monday', subjectName='Maths'),
+            dict(slot, username='a', day='tuesday', subjectName='Physics'),
+            dict(slot, username='b', day='monday', subjectName='Maths')]
+    items = list(iter_items(rows, 'timetables'))
+    assert [(item.end, item.username) for item in items] == [(2, 'a'), (3, 'b')]
+    assert sorted(items[0].document[1]) == ['monday', 'tuesday']
+
+
+class SlowFirstBatch:
+    """Storage stand-in whose first batch only finishes after a later one has"""
+
+    def __init__(self):
+        self.later_batch_done = threading.Event()
+        self.written = []
+
+    def existing_profiles(self, usernames):
+        return set()
+
+    def email_owners(self, emails):
+        return {}
+
+    def bulk_write(self, profiles=(), documents=(), updated_at=None):
+        if profiles[0][0] == 'u1':
+            assert self.later_batch_done.wait(5)
+        self.written.extend(username for username, _ in profiles)
+
+
+def test_checkpoint_only_covers_batches_finished_in_order():
+    storage = SlowFirstBatch()
+    checkpoints = []
+
+    def progress(summary):
+        checkpoints.append(summary['checkpoint'])
+        storage.later_batch_done.set()
+
+    # One profile (two writes) per batch, both batches written at once
+    job = BulkImport(storage, batch_size=2, concurrency=2, progress=progress)
+    summary = job.run(iter_items(ROWS[:2], 'profiles'))
+    assert checkpoints == [0, 2]
+    assert summary['checkpoint'] == 2
+    assert storage.written == ['u2', 'u1']
+
+
+def test_checkpoint_file_round_trip(tmp_path):
+    path = str(tmp_path / 'upload.checkpoint.json')
+    assert read_checkpoint(path) == {}
+    write_checkpoint(path, {'checkpoint': 3})
+    write_checkpoint(path, {'checkpoint': 5})
+    assert read_checkpoint(path) == {'checkpoint': 5}
+    assert not (tmp_path / 'upload.checkpoint.json.tmp').exists()
@@ -0,0 +1,159 @@
+import threading
+
+from cache import MISSING, TTLCache
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=10, clock=clock)
+    cache.set('a', 1)
+    clock.now = 9.9
+    assert cache.get('a') == 1
+    clock.now = 10
+    assert cache.get('a') is MISSING
+    assert cache.stats()['expirations'] == 1
+
+
+def test_per_entry_ttl_is_capped_by_the_cache_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=10, clock=clock)
+    cache.set('short', 1, ttl=2)
+    cache.set('long', 1, ttl=60)
+    clock.now = 2
+    assert cache.get('short') is MISSING
+    clock.now = 10
+    assert cache.get('long') is MISSING
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is MISSING
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_values_are_copied_unless_disabled():
+    cache = TTLCache()
+    value = {'records': [1]}
+    cache.set('a', value)
+    value['records'].append(2)
+    cache.get('a')['records'].append(3)
+    assert cache.get('a') == {'records': [1]}
+
+    shared = TTLCache(copy=False)
+    shared.set('a', value)
+    assert shared.get('a') is value
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = TTLCache(ttl=0)
+    cache.set('a', 1)
+    assert cache.get('a') is MISSING
+    assert cache.get('a', None) is None
+    assert len(cache) == 0
+
+
+def test_fill_caches_what_it_loaded():
+    cache = TTLCache()
+    assert cache.fill('a', lambda: 1) == 1
+    assert cache.get('a') == 1
+    assert cache.fill('b', lambda: None, skip=lambda value: value is None) is None
+    assert cache.get('b') is MISSING
+
+
+def test_fill_does_not_overwrite_a_write_made_while_it_loaded():
+    cache = TTLCache()
+
+    def load_then_write(change):
+        def load():
+            change()
+            return 'old'
+        return load
+
+    for change in (lambda: cache.set('a', 'new'), lambda: cache.pop('a'), cache.clear):
+        assert cache.fill('a', load_then_write(change)) == 'old'
+        assert cache.get('a') in ('new', MISSING)
+        cache.clear()
+    # Nothing about finished loads is kept
+    assert cache._loading == {} and cache._changed == {}
+
+
+def test_failed_fill_leaves_the_cache_alone():
+    cache = TTLCache()
+
+    def fail():
+        raise RuntimeError('storage down')
+
+    try:
+        cache.fill('a', fail)
+    except RuntimeError:
+        pass
+    assert cache.get('a') is MISSING
+    assert cache._loading == {}
+
+
+class SlowReads:
+    """Storage wrapper whose next get_data for a user blocks until released"""
+
+    def __init__(self, storage, username):
+        self.storage = storage
+        self.username = username
+        self.reading = threading.Event()
+        self.release = threading.Event()
+
+    def get_data(self, username, data_type):
+        document = self.storage.get_data(username, data_type)
+        if username == self.username and not self.reading.is_set():
+            self.reading.set()
+            assert self.release.wait(5)
+        return document
+
+    def __getattr__(self, attr):
+        return getattr(self.storage, attr)
+
+
+def test_slow_read_does_not_cache_over_a_newer_write(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'CACHE_REVALIDATE', False)
+    client.post('/api/timetable', json={'timetable': {}})
+    app_module.user_cache.clear()
+    slow = SlowReads(app_module.get_storage(), client.username)
+    monkeypatch.setattr(app_module, 'get_storage', lambda: slow)
+
+    reader = threading.Thread(target=app_module.get_user_document, args=(client.username, 'timetable'))
+    reader.start()
+    assert slow.reading.wait(5)
+    version = app_module.save_user_data(client.username, 'timetable', {'monday': []})
+    slow.release.set()
+    reader.join(5)
+
+    document = app_module.get_user_document(client.username, 'timetable')
+    assert document['version'] == version
+    assert document['data'] == {'monday': []}
+
+
+def write_elsewhere(app_module, username, timetable):
+    """Store a new timetable version the way another worker would, leaving this worker's cache alone"""
+    storage = app_module.get_storage()
+    document = storage.get_data(username, 'timetable')
+    storage.set_data(username, 'timetable', dict(document, data=timetable, version=document['version'] + 1))
+
+
+def test_cached_documents_are_revalidated(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'CACHE_REVALIDATE', True)
+    etag = client.post('/api/timetable', json={'timetable': {}}).headers['ETag']
+    write_elsewhere(app_module, client.username, {'monday': [{'subjectName': 'Maths'}]})
+
+    assert client.get('/api/timetable', headers={'If-None-Match': etag}).status_code == 200
+    response = client.get('/api/timetable/day/monday')
+    assert response.get_json()['version'] == 2
+    assert [entry['subjectName'] for entry in response.get_json()['schedule']] == ['Maths']
+
+
+def test_without_revalidation_a_worker_serves_its_cached_copy(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'CACHE_REVALIDATE', False)
+    etag = client.post('/api/timetable', json={'timetable': {}}).headers['ETag']
+    write_elsewhere(app_module, client.username, {'monday': [{'subjectName': 'Maths'}]})
+
+    assert client.get('/api/timetable', headers={'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,89 @@
+import pytest
+
+from calculators import (attendance_batch, attendance_result, cgpa_plan, cgpa_result, classes_needed,
+                         classes_skippable, classes_skippable_within)
+
+COMPLETED = [{'sgpa': 8, 'credits': 20}]
+
+
+def test_classes_needed_and_skippable():
+    assert classes_needed(60, 100, 75) == 60
+    assert classes_needed(75, 100, 75) == 0
+    assert classes_needed(99, 100, 100) is None
+    assert classes_skippable(80, 100, 75) == 6
+    assert classes_skippable(70, 100, 75) == 0
+
+
+def test_fractional_percentages_are_exact():
+    # 151/200 is exactly 75.5%, which a binary float comparison can get wrong
+    assert classes_needed(151, 200, 75.5) == 0
+    assert classes_skippable(151, 200, 75.5) == 0
+    assert attendance_result(151, 200, 75.5)['status'] == 'safe'
+
+
+def test_classes_skippable_within():
+    assert classes_skippable_within(30, 40, 20, 75) == 5
+    assert classes_skippable_within(10, 40, 20, 75) is None
+    assert classes_skippable_within(40, 40, 0, 75) == 0
+
+
+@pytest.mark.parametrize('attended, total', [(5, 0), (-1, 10), (11, 10), ('x', 10)])
+def test_attendance_result_rejects_bad_input(attended, total):
+    with pytest.raises(ValueError):
+        attendance_result(attended, total)
+
+
+def test_attendance_batch_aggregates_every_subject():
+    result = attendance_batch([
+        {'subject_name': 'Maths', 'attended': 30, 'total': 40},
+        {'subject_name': 'Physics', 'attended': 20, 'total': 40},
+        {'attended': 40, 'total': 40, 'min_required': 100}
+    ])
+    assert [s['subject_name'] for s in result['subjects']] == ['Maths', 'Physics', 'Subject 3']
+    aggregate = result['aggregate']
+    assert (aggregate['attended'], aggregate['total']) == (90, 120)
+    assert aggregate['at_risk_subjects'] == ['Physics']
+
+    with pytest.raises(ValueError, match='Subject 2'):
+        attendance_batch([{'attended': 1, 'total': 1}, {'attended': 2, 'total': 1}])
+
+
+def test_cgpa_result_skips_empty_semesters():
+    result = cgpa_result([{'sgpa': 8, 'credits': 20}, {'sgpa': 0, 'credits': 20}, {'sgpa': 9, 'credits': 20}])
+    assert result['cgpa'] == 8.5
+    assert result['total_credits'] == 40
+    assert [s['semester'] for s in result['semesters']] == ['Semester 1', 'Semester 3']
+
+    with pytest.raises(ValueError):
+        cgpa_result([{'sgpa': 11, 'credits': 20}])
+
+
+def test_plan_for_a_target():
+    target = cgpa_plan(COMPLETED, target_cgpa=8.5, remaining_credits=[20, 20])['target']
+    assert target['required_sgpa'] == 8.75
+    assert target['achievable'] and not target['already_secured']
+    assert (target['min_cgpa'], target['max_cgpa']) == (2.67, 9.33)
+
+    assert not cgpa_plan(COMPLETED, target_cgpa=9.5, remaining_credits=[20])['target']['achievable']
+    assert cgpa_plan(COMPLETED, target_cgpa=2, remaining_credits=[20])['target']['already_secured']
+
+
+def test_plan_scenarios_and_grid():
+    plan = cgpa_plan(COMPLETED, target_cgpa=8.5, remaining_credits=[20, 20], scenarios=[[10, 10], [6, 6]],
+                     grid={'sgpa': [6, 10], 'credits': [20, 40]})
+    assert plan['scenarios']['cgpa'] == [9.33, 6.67]
+    assert plan['scenarios']['meeting_target'] == 1
+    # Rows are credit loads, columns are SGPAs
+    assert plan['grid']['cgpa'] == [[7.0, 9.0], [6.67, 9.33]]
+    assert plan['grid']['count'] == 4
+
+
+@pytest.mark.parametrize('options', [
+    {'target_cgpa': 8},
+    {'target_cgpa': 8, 'remaining_credits': [20], 'scenarios': [[8, 8]]},
+    {'remaining_credits': [20], 'scenarios': [[11]]},
+    {'grid': {'sgpa': {'start': 5, 'stop': 4}}},
+])
+def test_plan_rejects_bad_input(options):
+    with pytest.raises(ValueError):
+        cgpa_plan(COMPLETED, **options)
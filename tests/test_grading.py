@@ -0,0 +1,55 @@
+import pytest
+
+from grading import apply_course_change, build_transcript, get_scale, transcript_result, transcript_summary
+
+SEMESTERS = [
+    {'courses': [{'id': 'ma101', 'course': 'Maths', 'credits': 3, 'grade': 'S'},
+                 {'id': 'ph101', 'course': 'Physics', 'credits': 4, 'grade': 'a'}]},
+    {'courses': [{'id': 'cs201', 'course': 'Programming', 'credits': 4, 'grade': 'B+'}]}
+]
+
+
+def test_ktu_transcript():
+    result = transcript_result(SEMESTERS)
+    assert result['scale'] == 'ktu'
+    assert [s['sgpa'] for s in result['semesters']] == [9.14, 8.0]
+    assert result['cgpa'] == 8.73
+    assert result['total_credits'] == 11
+    assert 'gpa_4_scale' in result
+
+
+def test_grades_without_points_are_left_out():
+    result = transcript_result([{'courses': [{'credits': 3, 'grade': 'A'}, {'credits': 3, 'grade': 'W'}]}], 'us4')
+    assert result['cgpa'] == 4.0
+    assert result['total_credits'] == 3
+    assert 'gpa_4_scale' not in result
+
+
+@pytest.mark.parametrize('semesters, scale', [
+    ([{'courses': [{'credits': 3, 'grade': 'S'}]}], 'us4'),
+    ([{'courses': [{'credits': 0, 'grade': 'S'}]}], 'ktu'),
+    ([{'courses': []}], 'ktu'),
+    (SEMESTERS, 'unknown'),
+])
+def test_bad_transcripts_are_rejected(semesters, scale):
+    with pytest.raises(ValueError):
+        transcript_result(semesters, scale)
+
+
+def test_course_changes_keep_the_running_sums_exact():
+    data = build_transcript(SEMESTERS)
+    assert transcript_summary(data)['cgpa'] == transcript_result(SEMESTERS)['cgpa']
+
+    scale = get_scale(data['scale'])
+    data['semester_2'], data['totals'] = apply_course_change(
+        scale, data['semester_2'], data['totals'], 'cs201', {'course': 'Programming', 'credits': 4, 'grade': 'S'})
+    data['semester_1'], data['totals'] = apply_course_change(scale, data['semester_1'], data['totals'], 'ph101', None)
+
+    expected = transcript_result([{'courses': [SEMESTERS[0]['courses'][0]]},
+                                  {'courses': [dict(SEMESTERS[1]['courses'][0], grade='S')]}])
+    summary = transcript_summary(data)
+    assert summary['cgpa'] == expected['cgpa'] == 10.0
+    assert summary['total_credits'] == expected['total_credits']
+
+    with pytest.raises(KeyError):
+        apply_course_change(scale, data['semester_1'], data['totals'], 'missing', None)
@@ -0,0 +1,37 @@
+def test_history_timestamps_are_distinct_and_increasing(app_module):
+    first = app_module.history_timestamps(3)
+    second = app_module.history_timestamps(2)
+    stamps = first + second
+    assert stamps == sorted(stamps)
+    assert len(set(stamps)) == len(stamps)
+
+
+def test_paging_through_a_batch_returns_every_record(app_module, client):
+    subjects = [{'subject_name': f'S{i}', 'attended': 30, 'total': 40} for i in range(5)]
+    assert client.post('/api/calculate_attendance/batch', json={'subjects': subjects}).status_code == 200
+    app_module.history_writer.flush(5)
+    app_module.user_cache.clear()
+
+    seen, before = [], None
+    while True:
+        url = '/api/history?type=attendance&limit=2' + (f'&before={before}' if before else '')
+        page = client.get(url).json
+        # Each page lists its records oldest first
+        seen += [record['result']['subject_name'] for record in reversed(page['attendance'])]
+        before = page['next_before']['attendance']
+        if not before:
+            break
+    assert seen == ['S4', 'S3', 'S2', 'S1', 'S0']
+
+
+def test_records_of_a_batch_share_a_batch_id(app_module, client):
+    subjects = [{'subject_name': f'S{i}', 'attended': 30, 'total': 40} for i in range(3)]
+    client.post('/api/calculate_attendance/batch', json={'subjects': subjects})
+    client.post('/api/calculate_attendance', json={'subject_name': 'Single', 'attended': 1, 'total': 2})
+    app_module.history_writer.flush(5)
+
+    records = app_module.get_storage().list_history(client.username, 'attendance', limit=10)
+    assert len({record['timestamp'] for record in records}) == 4
+    single, *batch = records
+    assert single['batch'] == single['timestamp']
+    assert {record['batch'] for record in batch} == {batch[-1]['timestamp']}
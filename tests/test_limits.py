@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from limits import RateLimiter, SingleFlight, parse_rule, retry_after_header
+
+
+def test_parse_rule():
+    assert parse_rule('30/60') == (30, 0.5)
+    assert parse_rule('') is None
+    assert parse_rule('0') is None
+    for rule in ('30', 'a/b', '0/60', '10/0'):
+        with pytest.raises(ValueError):
+            parse_rule(rule)
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    limiter = RateLimiter('test', '3/6', clock=clock)
+    assert [limiter.take('a') for _ in range(3)] == [0, 0, 0]
+    assert limiter.take('a') == 2.0
+    assert limiter.take('b') == 0
+
+    clock.now = 1
+    assert limiter.take('a') == 1.0
+    clock.now = 2
+    assert limiter.take('a') == 0
+    assert limiter.stats()['rejected'] == 2
+
+
+def test_bucket_never_holds_more_than_its_capacity(clock):
+    limiter = RateLimiter('test', '2/2', clock=clock)
+    limiter.take('a')
+    clock.now = 100
+    assert [limiter.take('a') for _ in range(3)] == [0, 0, 1.0]
+
+
+def test_least_recently_seen_client_is_dropped(clock):
+    limiter = RateLimiter('test', '1/60', maxsize=2, clock=clock)
+    for key in ('a', 'b', 'c'):
+        limiter.take(key)
+    assert limiter.stats()['evictions'] == 1
+    # a starts again with a full bucket; c is still limited
+    assert limiter.take('a') == 0
+    assert limiter.take('c') > 0
+
+
+def test_disabled_limiter_allows_everything():
+    limiter = RateLimiter('test', '0')
+    assert not limiter.enabled
+    assert all(limiter.take('a') == 0 for _ in range(100))
+
+
+def test_retry_after_header_rounds_up():
+    assert retry_after_header(0.2) == '1'
+    assert retry_after_header(2.1) == '3'
+
+
+def run_with_follower(flight, key, leader_fn):
+    """Start a call for key, let a second caller join it while it runs, and return both outcomes"""
+    release = threading.Event()
+    outcomes = {}
+
+    def call():
+        release.wait(5)
+        return leader_fn()
+
+    def leader():
+        try:
+            outcomes['leader'] = flight.do(key, call)
+        except Exception as e:
+            outcomes['leader'] = e
+
+    def follower():
+        try:
+            outcomes['follower'] = flight.do(key, lambda: 'own call')
+        except Exception as e:
+            outcomes['follower'] = e
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    while not flight.stats()['in_flight']:
+        pass
+    threads.append(threading.Thread(target=follower))
+    threads[1].start()
+    while not flight.stats()['shared']:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    outcomes = run_with_follower(flight, 'k', lambda: {'value': [1]})
+    assert outcomes['leader'] == ({'value': [1]}, False)
+    assert outcomes['follower'] == ({'value': [1]}, True)
+    assert outcomes['leader'][0] is not outcomes['follower'][0]
+    assert flight.stats() == {'calls': 1, 'shared': 1, 'in_flight': 0}
+
+
+def test_waiters_get_the_leaders_exception():
+    def fail():
+        raise RuntimeError('boom')
+
+    outcomes = run_with_follower(SingleFlight(), 'k', fail)
+    assert isinstance(outcomes['leader'], RuntimeError)
+    assert outcomes['follower'] is outcomes['leader']
+
+
+def test_forget_starts_a_fresh_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    thread = threading.Thread(target=flight.do, args=('k', lambda: release.wait(5)))
+    thread.start()
+    while not flight.stats()['in_flight']:
+        pass
+    flight.forget('k')
+    assert flight.do('k', lambda: 'fresh') == ('fresh', False)
+    release.set()
+    thread.join(5)
+    assert flight.stats()['shared'] == 0
@@ -0,0 +1,143 @@
+import contextvars
+
+import pytest
+
+from resilience import (CircuitBreaker, CircuitOpen, DeadlineExceeded, StorageUnavailable, backoff_delay,
+                        call_timeout, set_deadline, time_left)
+from storage import GuardedStorage, StorageBackend
+
+
+def in_own_context(fn):
+    """Run fn with its own copy of the context, so a deadline it sets does not leak into other tests"""
+    return contextvars.copy_context().run(fn)
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(window=10, min_calls=4, failure_ratio=0.5, open_seconds=10, clock=clock)
+    for ok in (True, True, False, False):
+        breaker.record(ok, breaker.before())
+    return breaker
+
+
+def test_breaker_opens_once_enough_calls_fail(clock):
+    breaker = CircuitBreaker(window=10, min_calls=4, failure_ratio=0.5, open_seconds=10, clock=clock)
+    for ok in (False, True, True):
+        breaker.record(ok, breaker.before())
+    assert breaker.state == 'closed'
+    breaker.record(False, breaker.before())
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.before()
+    assert raised.value.retry_after == 10
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_half_open_breaker_lets_one_trial_call_through(clock):
+    breaker = open_breaker(clock)
+    clock.now = 10
+    assert breaker.state == 'half_open'
+    assert breaker.before() is True
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+
+    breaker.record(False, trial=True)
+    assert breaker.state == 'open'
+    clock.now = 20
+    breaker.record(True, trial=breaker.before())
+    assert breaker.state == 'closed'
+    assert breaker.stats()['recent_calls'] == 0
+    assert breaker.before() is False
+
+
+def test_calls_started_before_the_breaker_opened_are_ignored(clock):
+    breaker = open_breaker(clock)
+    breaker.record(True)
+    assert breaker.state == 'open'
+
+
+def test_deadline_budget():
+    def check():
+        assert time_left() is None
+        assert call_timeout(10) == 10
+        set_deadline(5)
+        assert 4 < call_timeout(10) <= 5
+        set_deadline(-1)
+        with pytest.raises(DeadlineExceeded):
+            call_timeout(10)
+        set_deadline(None)
+        assert time_left() is None
+
+    in_own_context(check)
+    assert time_left() is None
+
+
+def test_backoff_delay_is_capped():
+    assert all(0 <= backoff_delay(attempt, 0.05, 1.0) <= min(1.0, 0.05 * 2 ** attempt) for attempt in range(10))
+
+
+class FlakyBackend(StorageBackend):
+    name = 'flaky'
+
+    def __init__(self, failures=0, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def get_profile(self, username):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error('storage is down')
+        return {'username': username}
+
+    def create_profile(self, username, profile):
+        self.calls += 1
+        raise TimeoutError('write timed out')
+
+
+def test_reads_are_retried_on_transient_errors():
+    storage = GuardedStorage(FlakyBackend(failures=2), retries=2, backoff=0)
+    assert storage.get_profile('a') == {'username': 'a'}
+    assert storage.stats()['retried'] == 2
+
+    storage = GuardedStorage(FlakyBackend(failures=3), retries=2, backoff=0)
+    with pytest.raises(StorageUnavailable):
+        storage.get_profile('a')
+    assert storage.backend.calls == 3
+    assert storage.stats()['failed'] == 1
+
+
+def test_writes_are_not_retried():
+    storage = GuardedStorage(FlakyBackend(), retries=2, backoff=0)
+    with pytest.raises(StorageUnavailable):
+        storage.create_profile('a', {})
+    assert storage.backend.calls == 1
+
+
+def test_other_errors_pass_through_without_retrying():
+    storage = GuardedStorage(FlakyBackend(failures=1, error=KeyError), retries=2, backoff=0)
+    with pytest.raises(KeyError):
+        storage.get_profile('a')
+    assert storage.backend.calls == 1
+    assert storage.stats()['recent_failures'] == 0
+
+
+def test_open_breaker_refuses_calls_without_reaching_storage():
+    breaker = CircuitBreaker(min_calls=1, failure_ratio=1)
+    storage = GuardedStorage(FlakyBackend(failures=1), breaker=breaker, retries=0)
+    with pytest.raises(StorageUnavailable):
+        storage.get_profile('a')
+    with pytest.raises(CircuitOpen):
+        storage.get_profile('a')
+    assert storage.backend.calls == 1
+
+
+def test_spent_deadline_stops_calls_before_they_start():
+    storage = GuardedStorage(FlakyBackend(), retries=2, backoff=0)
+
+    def call():
+        set_deadline(-1)
+        storage.get_profile('a')
+
+    with pytest.raises(DeadlineExceeded):
+        in_own_context(call)
+    assert storage.backend.calls == 0
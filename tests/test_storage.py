@@ -0,0 +1,105 @@
+import json
+
+import pytest
+from google.api_core.exceptions import AlreadyExists, PermissionDenied
+
+from storage import FirestoreStorage, SQLiteStorage
+
+PROFILES = [('ann', 'ann@example.com'), ('bob', 'Shared@example.com'), ('cat', 'shared@example.com'),
+            ('dan', 'dan@example.com'), ('eve', ''), ('fay', 'fay@example.com')]
+
+
+def test_sqlite_backfill_claims_each_email_once(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'backfill.db'))
+    storage.create_profile_unique('ann', {'username': 'ann', 'email': 'ann@example.com'})
+    with storage._connection() as conn:
+        conn.executemany('INSERT INTO profiles (username, email, doc) VALUES (?, ?, ?)',
+                         [(username, email, json.dumps({'username': username, 'email': email}))
+                          for username, email in PROFILES[1:]])
+    assert storage.backfill_email_index() == 3
+    assert storage.email_owners(['shared@example.com', 'dan@example.com', 'ann@example.com']) == {
+        'shared@example.com': 'bob', 'dan@example.com': 'dan', 'ann@example.com': 'ann'}
+    assert storage.backfill_email_index() == 0
+
+
+class FakeRef:
+    def __init__(self, db, email):
+        self.db = db
+        self.email = email
+
+    def create(self, data, **options):
+        self.db.commit([(self, data)])
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def create(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self, **options):
+        self.db.commit(self.writes)
+
+
+class FakeFirestore:
+    """Just enough of a Firestore client for the email index: all-or-nothing batches of create()"""
+
+    def __init__(self, claimed=None):
+        self.emails = dict(claimed or {})
+        self.commits = 0
+        self.fail_with = None
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def commit(self, writes):
+        self.commits += 1
+        if self.fail_with:
+            raise self.fail_with
+        if any(ref.email in self.emails for ref, _ in writes):
+            raise AlreadyExists('Document already exists')
+        self.emails.update((ref.email, data['username']) for ref, data in writes)
+
+
+class FakeFirestoreStorage(FirestoreStorage):
+    def __init__(self, db, hidden=()):
+        super().__init__(client=db)
+        # Claims the owner lookup does not see yet, like a registration racing the backfill
+        self.hidden = set(hidden)
+
+    def _email_ref(self, email):
+        return FakeRef(self.db, email)
+
+    def list_profiles(self, fields=None, start_after=None, limit=None):
+        for username, email in PROFILES:
+            yield username, {'email': email}
+
+    def email_owners(self, emails):
+        return {email: self.db.emails[email] for email in emails if email in self.db.emails and email not in self.hidden}
+
+
+def test_firestore_backfill_claims_in_batches():
+    db = FakeFirestore({'ann@example.com': 'ann'})
+    storage = FakeFirestoreStorage(db)
+    assert storage.backfill_email_index(batch_size=2) == 3
+    assert db.emails == {'ann@example.com': 'ann', 'shared@example.com': 'bob',
+                         'dan@example.com': 'dan', 'fay@example.com': 'fay'}
+    # One commit per batch of two (ann/shared, shared/dan, fay); emails already claimed are
+    # found by the lookup, so no batch fails and nothing is claimed one at a time
+    assert db.commits == 3
+
+
+def test_firestore_backfill_skips_emails_claimed_during_it():
+    db = FakeFirestore({'dan@example.com': 'dan'})
+    storage = FakeFirestoreStorage(db, hidden={'dan@example.com'})
+    assert storage.backfill_email_index() == 3
+    assert db.emails['fay@example.com'] == 'fay'
+
+
+def test_firestore_backfill_raises_other_errors():
+    db = FakeFirestore()
+    db.fail_with = PermissionDenied('Missing or insufficient permissions')
+    with pytest.raises(PermissionDenied):
+        FakeFirestoreStorage(db).backfill_email_index()
@@ -0,0 +1,24 @@
+def test_day_timetable_fills_the_cache_and_is_counted(client, app_module):
+    timetable = {'monday': [{'subjectName': 'Maths', 'startTime': '09:00', 'endTime': '10:00'}]}
+    assert client.post('/api/timetable', json={'timetable': timetable}).status_code == 200
+    app_module.user_cache.clear()
+    calls = app_module.storage_helper_calls.value(helper='get_user_document', outcome='ok')
+
+    response = client.get('/api/timetable/day/Monday')
+    assert response.status_code == 200
+    assert [entry['subjectName'] for entry in response.get_json()['schedule']] == ['Maths']
+    assert app_module.storage_helper_calls.value(helper='get_user_document', outcome='ok') == calls + 1
+    cached = app_module.user_cache.get((client.username, 'timetable'))
+    assert cached['data'] == timetable
+
+    assert client.get('/api/timetable/day/monday', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_timetable_revalidates_with_a_version_read(client, app_module):
+    response = client.post('/api/timetable', json={'timetable': {}})
+    app_module.user_cache.clear()
+    calls = app_module.storage_helper_calls.value(helper='get_user_data_version', outcome='ok')
+
+    response = client.get('/api/timetable', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert app_module.storage_helper_calls.value(helper='get_user_data_version', outcome='ok') == calls + 1
@@ -0,0 +1,24 @@
+def test_course_edit_responds_from_what_it_wrote(client, app_module):
+    semesters = [{'courses': [{'id': 'ma101', 'credits': 4, 'grade': 'S'}]},
+                 {'courses': [{'id': 'cs201', 'credits': 4, 'grade': 'B'}]}]
+    response = client.put('/api/transcript', json={'semesters': semesters})
+    assert response.status_code == 200, response.get_json()
+    reads = app_module.storage_helper_calls.value(helper='get_user_document', outcome='ok')
+
+    response = client.put('/api/transcript/semesters/2/courses/cs201', json={'credits': 4, 'grade': 'S'},
+                          headers={'If-Match': response.headers['ETag']})
+    assert response.status_code == 200, response.get_json()
+    payload = response.get_json()
+    assert payload['cgpa'] == 10.0
+    assert [s['number'] for s in payload['semesters']] == [2]
+    assert app_module.storage_helper_calls.value(helper='get_user_document', outcome='ok') == reads
+
+    stored = client.get('/api/transcript')
+    assert stored.headers['ETag'] == response.headers['ETag']
+    assert stored.get_json()['cgpa'] == 10.0
+    assert [s['number'] for s in stored.get_json()['semesters']] == [1, 2]
+
+
+def test_deleting_a_missing_course_is_404(client):
+    client.put('/api/transcript', json={'semesters': [{'courses': [{'id': 'ma101', 'credits': 4, 'grade': 'S'}]}]})
+    assert client.delete('/api/transcript/semesters/1/courses/nope').status_code == 404
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import uuid
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Fields a timetable slot may carry, as sent by the dashboard
+ENTRY_FIELDS = ('startTime', 'endTime', 'subjectName', 'teacherName', 'roomNumber', 'classType')
+REQUIRED_FIELDS = ('startTime', 'endTime', 'subjectName')
+MAX_FIELD_LENGTH = 200
+
+
+class EntryNotFound(KeyError):
+    """Raised when a slot id does not exist in the day's schedule"""
+
+
+def entry_id(entry):
+    """Stable id for a slot; slots saved before ids existed get one derived from their content"""
+    if entry.get('id'):
+        return entry['id']
+    content = json.dumps({k: entry.get(k) for k in ENTRY_FIELDS}, sort_keys=True)
+    return 'legacy-' + hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+
+
+def with_entry_ids(schedule):
+    """Copy of a day's schedule where every slot carries a unique id"""
+    seen = set()
+    result = []
+    for entry in schedule or []:
+        slot_id = base_id = entry_id(entry)
+        copies = 1
+        while slot_id in seen:
+            copies += 1
+            slot_id = f'{base_id}-{copies}'
+        seen.add(slot_id)
+        result.append(dict(entry, id=slot_id))
+    return result
+
+
+def validate_entry(entry, partial=False):
+    """Return the cleaned slot fields; raises ValueError on bad input"""
+    if not isinstance(entry, dict):
+        raise ValueError('Class details must be an object')
+    cleaned = {}
+    for field in ENTRY_FIELDS:
+        if field not in entry:
+            continue
+        value = entry[field]
+        if value is None:
+            value = ''
+        if not isinstance(value, str) or len(value) > MAX_FIELD_LENGTH:
+            raise ValueError(f'{field} must be text of at most {MAX_FIELD_LENGTH} characters')
+        cleaned[field] = value.strip()
+    if not partial:
+        missing = [field for field in REQUIRED_FIELDS if not cleaned.get(field)]
+        if missing:
+            raise ValueError('Please fill in all required fields: ' + ', '.join(missing))
+    return cleaned
+
+
+def _check_times(entry):
+    if entry.get('startTime') and entry.get('endTime') and entry['startTime'] >= entry['endTime']:
+        raise ValueError('End time must be after start time')
+
+
+def add_entry(schedule, entry):
+    """New schedule with entry appended under a fresh id"""
+    entry = validate_entry(entry)
+    _check_times(entry)
+    entry['id'] = uuid.uuid4().hex[:12]
+    return with_entry_ids(schedule) + [entry]
+
+
+def update_entry(schedule, slot_id, changes):
+    """New schedule with the slot's fields updated"""
+    changes = validate_entry(changes, partial=True)
+    schedule = with_entry_ids(schedule)
+    for entry in schedule:
+        if entry['id'] == slot_id:
+            entry.update(changes)
+            for field in REQUIRED_FIELDS:
+                if not entry.get(field):
+                    raise ValueError(f'{field} cannot be empty')
+            _check_times(entry)
+            return schedule
+    raise EntryNotFound(slot_id)
+
+
+def delete_entry(schedule, slot_id):
+    """New schedule without the slot"""
+    schedule = with_entry_ids(schedule)
+    for i, entry in enumerate(schedule):
+        if entry['id'] == slot_id:
+            return schedule[:i] + schedule[i + 1:]
+    raise EntryNotFound(slot_id)
+
+
+def replace_schedule(schedule):
+    """Validate a whole day's schedule, keeping existing slot ids"""
+    if not isinstance(schedule, list):
+        raise ValueError('Schedule must be a list of classes')
+    cleaned = []
+    for entry in schedule:
+        slot = validate_entry(entry)
+        _check_times(slot)
+        if entry.get('id'):
+            slot['id'] = str(entry['id'])
+        cleaned.append(slot)
+    return with_entry_ids(cleaned)